@@ -1,9 +1,16 @@
 import matplotlib.pyplot as plt
+import os
 import re
 import numpy as np
 import pandas as pd
 import sqlite3
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from demux_reader import CATEGORICAL_COLUMNS, read_demultiplex_stats
+
+# (index, index2) pairs of the unknown barcodes counted as PhiX reads
+PHIX_INDEX_PAIRS = [("TGCCGTGGAT", "GATATAGAGT"), ("GATATAGAGT", "GATATAGAGT")]
 
 def get_pool_strings(file_name):
     """
@@ -68,13 +75,13 @@ def calculate_metrics_old(demux_stats, top_unknown_barcodes):
     # Check for the column for Q30 bases and sum accordingly
     if "# of >= Q30 Bases (PF)" in demux_stats.columns:
         run_yield = int(demux_stats["# of >= Q30 Bases (PF)"].sum())
-        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# of >= Q30 Bases (PF)"].sum())
+        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# of >= Q30 Bases (PF)"].sum())
     else:
         run_yield = int(demux_stats["# Reads"].sum())
-        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# Reads"].sum())
+        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# Reads"].sum())
 
     total_reads = int(demux_stats["# Reads"].sum())
-    total_reads_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# Reads"].sum())
+    total_reads_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# Reads"].sum())
 
     if top_unknown_barcodes is not None:
         phiX_condition1 = (top_unknown_barcodes["index"] == "TGCCGTGGAT") & (top_unknown_barcodes["index2"] == "GATATAGAGT")
@@ -109,56 +116,35 @@ def calculate_metrics_old(demux_stats, top_unknown_barcodes):
     }
 
 def read_dataframes(run_path, skip_undetermined=False):
-    # Define the stop condition
-    stop_condition = lambda line: "[Top Unknown Barcodes]" in line
-
-    # Initialize lists to collect lines
-    lines_before_top_unknown_barcodes_string = []
-    lines_after_top_unknown_barcodes_string = []
-
-    # Use a flag to track which part of the file is being read
-    reading_before = True
-
-    with open(run_path, 'r') as file:
-        for line in file:
-            if skip_undetermined and "Undetermined" in line:
-                continue  # Skip lines containing "Undetermined"
-            if stop_condition(line):
-                reading_before = False
-                continue  # Skip the line containing the stop condition itself
-            if reading_before:
-                if line.strip():  # Avoid adding blank lines
-                    lines_before_top_unknown_barcodes_string.append(line)
-            else:
-                if line.strip():  # Avoid adding blank lines
-                    lines_after_top_unknown_barcodes_string.append(line)
+    """
+    Reads the demux stats and top unknown barcodes tables from a Demultiplex_Stats.csv file.
 
-    # Create a pandas DataFrame from the collected lines before the stop condition
-    if lines_before_top_unknown_barcodes_string:
-        demux_stats = pd.read_csv(StringIO(''.join(lines_before_top_unknown_barcodes_string)))
-    else:
-        demux_stats = pd.DataFrame()  # Create an empty DataFrame if no lines are collected
+    Parameters:
+    run_path (str): The path to the Demultiplex_Stats.csv file.
+    skip_undetermined (bool): Drop the rows whose SampleID contains "Undetermined".
 
-    # Create a pandas DataFrame from the collected lines after the stop condition
-    if lines_after_top_unknown_barcodes_string:
-        top_unknown_barcodes = pd.read_csv(StringIO(''.join(lines_after_top_unknown_barcodes_string)))
-    else:
-        top_unknown_barcodes = pd.DataFrame()  # Create an empty DataFrame if no lines are collected
+    Returns:
+    tuple: The demux stats and top unknown barcodes DataFrames. Either is empty if the
+           corresponding table is missing from the file.
+    """
+    demux_stats, top_unknown_barcodes = read_demultiplex_stats(run_path, skip_undetermined=skip_undetermined)
+
+    if top_unknown_barcodes is None:
+        top_unknown_barcodes = pd.DataFrame()
 
-    # Return both DataFrames
     return demux_stats, top_unknown_barcodes
 
 def calculate_metrics(demux_stats, top_unknown_barcodes=None):
     # Check for the column for Q30 bases and sum accordingly
     if "# of >= Q30 Bases (PF)" in demux_stats.columns:
         run_yield = int(demux_stats["# of >= Q30 Bases (PF)"].sum())
-        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# of >= Q30 Bases (PF)"].sum())
+        run_yield_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# of >= Q30 Bases (PF)"].sum())
     else:
         run_yield = 0  # Set to 0 if the column is not present
         run_yield_excluding_undetermined = 0  # Set to 0 if the column is not present
 
     total_reads = int(demux_stats["# Reads"].sum())
-    total_reads_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# Reads"].sum())
+    total_reads_excluding_undetermined = int(demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# Reads"].sum())
 
     if top_unknown_barcodes is not None and not top_unknown_barcodes.empty:
         phiX_condition1 = (top_unknown_barcodes["index"] == "TGCCGTGGAT") & (top_unknown_barcodes["index2"] == "GATATAGAGT")
@@ -214,6 +200,144 @@ def format_metrics(metrics):
     formatted_metrics['plate_with_fewest_reads_in_a_lane'] = metrics['plate_with_fewest_reads_in_a_lane']
     return formatted_metrics
 
+def read_runs(run_paths, run_ids=None, skip_undetermined=False, max_workers=8):
+    """
+    Reads the Demultiplex_Stats.csv files of many runs and concatenates them, keyed by run.
+
+    Parameters:
+    run_paths (list of str): Paths to the Demultiplex_Stats.csv files.
+    run_ids (list of str, optional): An identifier for each run. Defaults to the file paths.
+    skip_undetermined (bool): Drop the rows whose SampleID contains "Undetermined".
+    max_workers (int): Number of files read concurrently.
+
+    Returns:
+    tuple: The concatenated demux stats and top unknown barcodes DataFrames, each with a
+           categorical 'run_id' column.
+    """
+    run_paths = list(run_paths)
+    run_ids = list(run_ids) if run_ids is not None else run_paths
+    if len(run_ids) != len(run_paths):
+        raise ValueError("run_ids must have one entry per run path.")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        runs = list(executor.map(lambda path: read_demultiplex_stats(path, skip_undetermined=skip_undetermined), run_paths))
+
+    def concat_runs(frames):
+        keyed = [(run_id, frame) for run_id, frame in zip(run_ids, frames) if frame is not None and not frame.empty]
+        if not keyed:
+            return pd.DataFrame({'run_id': pd.Categorical([], categories=pd.unique(pd.Series(run_ids)))})
+        combined = pd.concat([frame for _, frame in keyed], keys=[run_id for run_id, _ in keyed],
+                             names=['run_id', None]).reset_index(level='run_id').reset_index(drop=True)
+        combined['run_id'] = pd.Categorical(combined['run_id'], categories=pd.unique(pd.Series(run_ids)))
+        # Categories differ between files, so concat falls back to object columns
+        for column in CATEGORICAL_COLUMNS:
+            if column in combined.columns:
+                combined[column] = combined[column].astype('category')
+        return combined
+
+    demux_stats = concat_runs([demux for demux, _ in runs])
+    top_unknown_barcodes = concat_runs([top for _, top in runs])
+    return demux_stats, top_unknown_barcodes
+
+def calculate_metrics_for_runs(demux_stats, top_unknown_barcodes=None):
+    """
+    Calculates the calculate_metrics values for every run in concatenated demux stats with a
+    single grouped aggregation.
+
+    Parameters:
+    demux_stats (pd.DataFrame): Demux stats for many runs with a 'run_id' column, as returned by read_runs.
+    top_unknown_barcodes (pd.DataFrame, optional): Top unknown barcodes with a 'run_id' column.
+
+    Returns:
+    pd.DataFrame: One row per run_id with the calculate_metrics keys as columns, plus
+                  'sample_with_fewest_reads' and 'fewest_read_count'.
+    """
+    run_ids = demux_stats['run_id']
+    if isinstance(run_ids.dtype, pd.CategoricalDtype):
+        run_index = pd.Index(run_ids.cat.categories, name='run_id')
+    else:
+        run_index = pd.Index(pd.unique(run_ids), name='run_id')
+
+    count_columns = ['run_yield', 'run_yield_excluding_undetermined', 'total_reads',
+                     'total_reads_excluding_undetermined', 'assumed_phiX_reads']
+    output_columns = count_columns + ['percent_phix_assumed', 'plate_with_fewest_reads_in_a_lane',
+                                      'sample_with_fewest_reads', 'fewest_read_count']
+
+    if demux_stats.empty or '# Reads' not in demux_stats.columns:
+        # No run had any rows (read_runs then only returns run_id); report every run as empty
+        metrics = pd.DataFrame(0, index=run_index, columns=count_columns, dtype='int64')
+        metrics['percent_phix_assumed'] = 0.0
+        metrics['plate_with_fewest_reads_in_a_lane'] = "No data available"
+        metrics['sample_with_fewest_reads'] = pd.Series(np.nan, index=run_index, dtype=object)
+        metrics['fewest_read_count'] = np.nan
+        return metrics[output_columns]
+
+    reads = demux_stats['# Reads']
+    if "# of >= Q30 Bases (PF)" in demux_stats.columns:
+        q30_bases = demux_stats["# of >= Q30 Bases (PF)"].fillna(0)
+    else:
+        q30_bases = pd.Series(0, index=demux_stats.index)
+    undetermined = demux_stats['SampleID'].str.contains("Undetermined", na=False)
+
+    per_row = pd.DataFrame({
+        'run_id': run_ids,
+        'run_yield': q30_bases,
+        'run_yield_excluding_undetermined': q30_bases.where(~undetermined, 0),
+        'total_reads': reads,
+        'total_reads_excluding_undetermined': reads.where(~undetermined, 0),
+        'reads': reads,
+    })
+    metrics = per_row.groupby('run_id', observed=True, sort=False).agg(
+        run_yield=('run_yield', 'sum'),
+        run_yield_excluding_undetermined=('run_yield_excluding_undetermined', 'sum'),
+        total_reads=('total_reads', 'sum'),
+        total_reads_excluding_undetermined=('total_reads_excluding_undetermined', 'sum'),
+        fewest_reads_row=('reads', 'idxmin'),
+    ).reindex(run_index)
+
+    if top_unknown_barcodes is not None and not top_unknown_barcodes.empty:
+        phix = pd.Series(False, index=top_unknown_barcodes.index)
+        for index, index2 in PHIX_INDEX_PAIRS:
+            phix |= (top_unknown_barcodes['index'] == index) & (top_unknown_barcodes['index2'] == index2)
+        assumed_phix_reads = top_unknown_barcodes['# Reads'].where(phix, 0) \
+            .groupby(top_unknown_barcodes['run_id'], observed=True).sum()
+        metrics['assumed_phiX_reads'] = assumed_phix_reads.reindex(run_index)
+    else:
+        metrics['assumed_phiX_reads'] = 0
+
+    metrics[count_columns] = metrics[count_columns].fillna(0).astype('int64')
+    metrics['percent_phix_assumed'] = (metrics['assumed_phiX_reads'] / metrics['total_reads'].where(metrics['total_reads'] != 0)).fillna(0)
+
+    # Look up the sample behind each run's minimum '# Reads' row
+    fewest_rows = metrics['fewest_reads_row'].dropna().astype('int64')
+    fewest = demux_stats.loc[fewest_rows.values, ['SampleID', '# Reads']].set_axis(fewest_rows.index)
+    metrics['sample_with_fewest_reads'] = fewest['SampleID'].astype(object)
+    metrics['fewest_read_count'] = fewest['# Reads']
+    metrics['plate_with_fewest_reads_in_a_lane'] = [
+        f"{sample_id}: {count:,.0f}" if pd.notna(count) else "No data available"
+        for sample_id, count in zip(metrics['sample_with_fewest_reads'], metrics['fewest_read_count'])
+    ]
+
+    return metrics[output_columns]
+
+def calculate_metrics_batch(run_paths, run_ids=None, skip_undetermined=False, max_workers=8):
+    """
+    Reads many Demultiplex_Stats.csv files and calculates the QC metrics for all of them at once.
+
+    Parameters:
+    run_paths (list of str): Paths to the Demultiplex_Stats.csv files.
+    run_ids (list of str, optional): An identifier for each run. Defaults to the file paths.
+    skip_undetermined (bool): Drop the rows whose SampleID contains "Undetermined".
+    max_workers (int): Number of files read concurrently.
+
+    Returns:
+    pd.DataFrame: One row of metrics per run, indexed by run_id. Rows can be passed to
+                  format_metrics with row.to_dict().
+    """
+    demux_stats, top_unknown_barcodes = read_runs(run_paths, run_ids=run_ids, skip_undetermined=skip_undetermined,
+                                                  max_workers=max_workers)
+    return calculate_metrics_for_runs(demux_stats, top_unknown_barcodes)
+
 def plot_reads_vs_sampleID_reversed(demux_stats, save_dir, pool_string):
     # Convert '# Reads' values to millions for the pivot table
     demux_stats['# Reads in Millions'] = demux_stats['# Reads'] / 1e6
@@ -223,7 +347,7 @@ def plot_reads_vs_sampleID_reversed(demux_stats, save_dir, pool_string):
     demux_stats['Lane'] = demux_stats['Lane'].dropna().astype(int)
     
     # Create the pivot table using the converted values
-    pivot_table = demux_stats.pivot_table(index='SampleID', columns='Lane', values='# Reads in Millions', fill_value=0)
+    pivot_table = demux_stats.pivot_table(index='SampleID', columns='Lane', values='# Reads in Millions', fill_value=0, observed=True)
     
     # Ensure columns are integers
     pivot_table.columns = pivot_table.columns.astype(int)
@@ -337,16 +461,20 @@ def extract_samples_from_files(dataframe, files):
     
     return extracted_dfs
 
-def setup_database(db_name):
-    """
-    Sets up the SQLite database with the necessary table.
-    
-    Parameters:
-    db_name (str): The name or path of the SQLite database file.
-    """
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute('''
+# Samples that are not listed in any pool file are stored under this pool name
+UNASSIGNED_POOL = 'unassigned'
+
+# Demultiplex_Stats columns kept per sample, and their names in the sample_metrics table
+SAMPLE_METRIC_COLUMNS = {
+    '# Reads': 'reads',
+    '# Perfect Index Reads': 'perfect_index_reads',
+    '# One Mismatch Index Reads': 'one_mismatch_index_reads',
+    '# of >= Q30 Bases (PF)': 'q30_bases',
+    'Mean Quality Score (PF)': 'mean_quality',
+}
+
+def _migration_pool_metrics(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS pool_metrics (
             pool TEXT PRIMARY KEY,
             total_reads INTEGER,
@@ -354,41 +482,165 @@ def setup_database(db_name):
             fewest_read_count INTEGER
         )
     ''')
-    conn.commit()
-    conn.close()
 
-def add_column_if_not_exists(db_name):
+def _migration_percent_phix(conn):
+    # Databases patched by the old add_column_if_not_exists already have the column
+    columns = [info[1] for info in conn.execute('PRAGMA table_info(pool_metrics)')]
+    if 'percent_phix_assumed' not in columns:
+        conn.execute('ALTER TABLE pool_metrics ADD COLUMN percent_phix_assumed REAL')
+
+def _migration_run_lane_sample_metrics(conn):
+    conn.execute('''
+        CREATE TABLE runs (
+            run_id TEXT PRIMARY KEY,
+            run_date TEXT NOT NULL,
+            source_file TEXT,
+            run_yield INTEGER,
+            total_reads INTEGER,
+            total_reads_excluding_undetermined INTEGER,
+            assumed_phix_reads INTEGER,
+            percent_phix_assumed REAL,
+            loaded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE lane_metrics (
+            run_id TEXT NOT NULL,
+            pool TEXT NOT NULL,
+            lane INTEGER NOT NULL,
+            run_date TEXT NOT NULL,
+            total_reads INTEGER,
+            q30_bases INTEGER,
+            sample_count INTEGER,
+            sample_with_fewest_reads TEXT,
+            fewest_read_count INTEGER,
+            PRIMARY KEY (run_id, pool, lane)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE sample_metrics (
+            run_id TEXT NOT NULL,
+            pool TEXT NOT NULL,
+            lane INTEGER NOT NULL,
+            run_date TEXT NOT NULL,
+            sample_id TEXT,
+            sample_project TEXT,
+            index_sequence TEXT,
+            reads INTEGER,
+            perfect_index_reads INTEGER,
+            one_mismatch_index_reads INTEGER,
+            q30_bases INTEGER,
+            mean_quality REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX runs_run_date ON runs (run_date)')
+    conn.execute('CREATE INDEX lane_metrics_pool_date ON lane_metrics (pool, run_date, lane)')
+    conn.execute('CREATE INDEX lane_metrics_lane_date ON lane_metrics (lane, run_date)')
+    conn.execute('CREATE INDEX sample_metrics_run ON sample_metrics (run_id)')
+    conn.execute('CREATE INDEX sample_metrics_pool_lane_date ON sample_metrics (pool, lane, run_date)')
+    conn.execute('CREATE INDEX sample_metrics_sample_date ON sample_metrics (sample_id, run_date)')
+
+# Schema migrations, applied in order. PRAGMA user_version records how many have been applied,
+# so new migrations must only ever be appended.
+MIGRATIONS = [
+    _migration_pool_metrics,
+    _migration_percent_phix,
+    _migration_run_lane_sample_metrics,
+]
+
+def migrate_database(conn):
     """
-    Checks if the 'percent_phix_assumed' column exists in the 'pool_metrics' table of the specified SQLite database.
-    Adds the column if it does not exist.
+    Brings a metrics database up to the latest schema by applying the pending MIGRATIONS.
+
+    Each migration runs in its own transaction together with the user_version bump, so a
+    failed migration leaves the database at the previous version.
+
+    Parameters:
+    conn (sqlite3.Connection): An open connection to the metrics database.
+
+    Returns:
+    int: The schema version after migrating.
+    """
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Read the version inside the write lock so concurrent writers never apply a migration twice
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.commit()
+                return version
+            MIGRATIONS[version](conn)
+            conn.execute(f'PRAGMA user_version = {version + 1}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def connect_metrics_db(db_name):
+    """
+    Opens a metrics database and migrates it to the latest schema. The connection can be
+    passed in place of db_name to the functions below to reuse it across calls.
 
     Parameters:
     db_name (str): The name or path of the SQLite database file.
+
+    Returns:
+    sqlite3.Connection: The open connection.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
+    # Transactions are managed explicitly with BEGIN/COMMIT
+    conn = sqlite3.connect(db_name, isolation_level=None, timeout=30)
+    migrate_database(conn)
+    return conn
+
+@contextmanager
+def _metrics_connection(db):
+    """Yields db if it is already a connection, otherwise opens (and later closes) db_name."""
+    if isinstance(db, sqlite3.Connection):
+        yield db
+        return
+    conn = connect_metrics_db(db)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def _transaction(conn):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
 
-    # Execute PRAGMA to check for existing columns in the table
-    cursor.execute('''
-        PRAGMA table_info(pool_metrics)
-    ''')
-    columns = [info[1] for info in cursor.fetchall()]
+def _records(frame):
+    """DataFrame rows as tuples of plain Python values, with missing values as None."""
+    values = frame.astype(object).where(frame.notna(), None)
+    return list(values.itertuples(index=False, name=None))
 
-    # Check if 'percent_phix_assumed' column is missing and add it
-    if 'percent_phix_assumed' not in columns:
-        cursor.execute('''
-            ALTER TABLE pool_metrics ADD COLUMN percent_phix_assumed REAL
-        ''')
-        print("Column 'percent_phix_assumed' added.")
-    else:
-        print("Column 'percent_phix_assumed' already exists.")
+def setup_database(db_name):
+    """
+    Sets up the SQLite database with the necessary tables, migrating older databases.
+    
+    Parameters:
+    db_name (str): The name or path of the SQLite database file.
+    """
+    with _metrics_connection(db_name):
+        pass
 
-    # Commit changes and close the connection
-    conn.commit()
-    conn.close()
+def add_column_if_not_exists(db_name):
+    """
+    Ensures the 'percent_phix_assumed' column exists in the 'pool_metrics' table of the specified SQLite database.
+    The column is now added by a schema migration; this runs any pending migrations.
+
+    Parameters:
+    db_name (str): The name or path of the SQLite database file.
+    """
+    with _metrics_connection(db_name) as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
 
-    print("Database update complete.")
+    print(f"Database update complete (schema version {version}).")
 
 
 def extract_numeric_value(reads_pf_string):
@@ -403,65 +655,213 @@ def extract_numeric_value(reads_pf_string):
     """
     return int(re.sub(r'[^\d]', '', reads_pf_string))
 
+def _fewest_reads(metrics):
+    """The (sample, read count) with the fewest reads from a calculate_metrics result."""
+    if metrics.get('sample_with_fewest_reads') is not None:
+        return metrics['sample_with_fewest_reads'], int(metrics['fewest_read_count'])
+
+    # Plain calculate_metrics results only have the formatted "sample: 1,234" string
+    match = re.match(r'(.+): ([\d,]+)', metrics.get('plate_with_fewest_reads_in_a_lane') or '')
+    if match:
+        return match.group(1), int(match.group(2).replace(',', ''))
+    return None, None
+
 def write_to_broad_metrics_db(pool_strings, all_formatted_metrics, db_name):
     """
     Writes the pool names and their corresponding total reads to a SQLite database.
     If a pool already exists, it updates the total reads instead of adding a new entry.
     Extracts and stores additional information about the plate with the fewest reads.
-    Prints the pool name with the fewest reads in a lane and total reads.
+    All pools are written with one executemany in a single transaction.
 
     Parameters:
     pool_strings (list of str): List of pool names.
     all_formatted_metrics (list of dict): List of dictionaries containing metrics for each pool.
-    db_name (str): The name or path of the SQLite database file.
+    db_name (str or sqlite3.Connection): The name or path of the SQLite database file, or an open connection.
     """
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-
-    # Iterate over the pool_strings and all_formatted_metrics
+    rows = []
     for pool, metrics in zip(pool_strings, all_formatted_metrics):
-        #total_reads_string = metrics.get('total_reads')
-        #total_reads = extract_numeric_value(total_reads_string)
-        total_reads = metrics.get('total_reads')
-        pool_with_fewest_reads = metrics.get('plate_with_fewest_reads_in_a_lane')
-
-        # Extract plate_with_fewest_reads and fewest_read_count using regex
-        match = re.match(r'(.+): ([\d,]+)', pool_with_fewest_reads)
-        if match:
-            plate_with_fewest_reads = match.group(1)
-            fewest_read_count = int(match.group(2).replace(',', ''))
-        else:
-            plate_with_fewest_reads = None
-            fewest_read_count = None
-
-        cursor.execute('''
-            INSERT INTO pool_metrics (pool, total_reads, plate_with_fewest_reads, fewest_read_count)
-            VALUES (?, ?, ?, ?)
+        plate_with_fewest_reads, fewest_read_count = _fewest_reads(metrics)
+        percent_phix_assumed = metrics.get('percent_phix_assumed')
+        if isinstance(percent_phix_assumed, str):
+            percent_phix_assumed = None
+        rows.append((pool, metrics.get('total_reads'), plate_with_fewest_reads, fewest_read_count,
+                     percent_phix_assumed))
+
+    with _metrics_connection(db_name) as conn, _transaction(conn):
+        conn.executemany('''
+            INSERT INTO pool_metrics (pool, total_reads, plate_with_fewest_reads, fewest_read_count, percent_phix_assumed)
+            VALUES (?, ?, ?, ?, ?)
             ON CONFLICT(pool) DO UPDATE SET
             total_reads=excluded.total_reads,
             plate_with_fewest_reads=excluded.plate_with_fewest_reads,
-            fewest_read_count=excluded.fewest_read_count
-        ''', (pool, total_reads, plate_with_fewest_reads, fewest_read_count))
-
-    conn.commit()
-    conn.close()
+            fewest_read_count=excluded.fewest_read_count,
+            percent_phix_assumed=excluded.percent_phix_assumed
+        ''', rows)
 
     print(f"The database, {db_name}, has been updated.")
 
+def build_sample_and_lane_metrics(demux_stats, pool_samples=None):
+    """
+    Splits a run's demux stats into per-sample and per-lane metrics, assigning every sample to a pool.
+
+    Parameters:
+    demux_stats (pd.DataFrame): The demux stats DataFrame of one run.
+    pool_samples (dict, optional): Maps each pool name to its SampleIDs, e.g.
+        {pool: read_file_to_list(pool_file)}. Other samples go to UNASSIGNED_POOL.
+
+    Returns:
+    tuple: The sample metrics and lane metrics DataFrames, with the sample_metrics and
+           lane_metrics column names (without run_id and run_date).
+    """
+    sample_pool = {sample_id: pool for pool, sample_ids in (pool_samples or {}).items() for sample_id in sample_ids}
+    sample_ids = demux_stats['SampleID'].astype(object)
+
+    samples = pd.DataFrame({
+        'pool': sample_ids.map(sample_pool).fillna(UNASSIGNED_POOL),
+        'lane': demux_stats['Lane'] if 'Lane' in demux_stats.columns else 1,
+        'sample_id': sample_ids,
+        'sample_project': demux_stats['Sample_Project'].astype(object) if 'Sample_Project' in demux_stats.columns else None,
+        'index_sequence': demux_stats['Index'].astype(object) if 'Index' in demux_stats.columns else None,
+    })
+    for column, name in SAMPLE_METRIC_COLUMNS.items():
+        samples[name] = demux_stats[column] if column in demux_stats.columns else np.nan
+
+    if samples.empty:
+        lanes = pd.DataFrame(columns=['pool', 'lane', 'total_reads', 'q30_bases', 'sample_count',
+                                      'sample_with_fewest_reads', 'fewest_read_count'])
+        return samples, lanes
+
+    lanes = samples.groupby(['pool', 'lane'], sort=True).agg(
+        total_reads=('reads', 'sum'),
+        q30_bases=('q30_bases', 'sum'),
+        sample_count=('sample_id', 'count'),
+        fewest_reads_row=('reads', 'idxmin'),
+    )
+    fewest = samples.loc[lanes.pop('fewest_reads_row').to_numpy(), ['sample_id', 'reads']]
+    lanes['sample_with_fewest_reads'] = fewest['sample_id'].to_numpy()
+    lanes['fewest_read_count'] = fewest['reads'].to_numpy()
+    return samples, lanes.reset_index()
+
+def write_run_metrics(db, run_id, demux_stats, top_unknown_barcodes=None, pool_samples=None,
+                      run_date=None, source_file=None):
+    """
+    Stores the run, per-lane and per-sample metrics of one run, replacing any earlier copy of
+    the run. Everything is written with executemany in a single transaction.
+
+    Parameters:
+    db (str or sqlite3.Connection): The name or path of the SQLite database file, or an open connection.
+    run_id (str): An identifier for the run, e.g. the flowcell ID.
+    demux_stats (pd.DataFrame): The demux stats DataFrame of the run.
+    top_unknown_barcodes (pd.DataFrame, optional): The top unknown barcodes DataFrame of the run.
+    pool_samples (dict, optional): Maps each pool name to its SampleIDs.
+    run_date (str, optional): The run date as YYYY-MM-DD. Defaults to the modification date of
+        source_file, or today.
+    source_file (str, optional): The Demultiplex_Stats.csv the metrics were read from.
+    """
+    if run_date is None:
+        timestamp = os.path.getmtime(source_file) if source_file and os.path.exists(source_file) else None
+        run_date = (datetime.fromtimestamp(timestamp) if timestamp else datetime.now()).strftime('%Y-%m-%d')
+
+    metrics = calculate_metrics(demux_stats, top_unknown_barcodes)
+    samples, lanes = build_sample_and_lane_metrics(demux_stats, pool_samples)
+    samples.insert(0, 'run_id', run_id)
+    samples.insert(3, 'run_date', run_date)
+    lanes.insert(0, 'run_id', run_id)
+    lanes.insert(3, 'run_date', run_date)
+
+    with _metrics_connection(db) as conn, _transaction(conn):
+        for table in ('sample_metrics', 'lane_metrics', 'runs'):
+            conn.execute(f'DELETE FROM {table} WHERE run_id = ?', (run_id,))
+        conn.execute('''
+            INSERT INTO runs (run_id, run_date, source_file, run_yield, total_reads,
+                              total_reads_excluding_undetermined, assumed_phix_reads, percent_phix_assumed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (run_id, run_date, source_file, metrics['run_yield'], metrics['total_reads'],
+              metrics['total_reads_excluding_undetermined'], metrics['assumed_phiX_reads'],
+              metrics['percent_phix_assumed']))
+        conn.executemany(f'INSERT INTO lane_metrics ({", ".join(lanes.columns)}) VALUES ({", ".join("?" * len(lanes.columns))})',
+                         _records(lanes))
+        conn.executemany(f'INSERT INTO sample_metrics ({", ".join(samples.columns)}) VALUES ({", ".join("?" * len(samples.columns))})',
+                         _records(samples))
+
+def query_pool_trend(db, pool_prefix='SALK', since=None):
+    """
+    Returns the reads of every pool whose name starts with pool_prefix, one row per run, in date order.
+
+    Parameters:
+    db (str or sqlite3.Connection): The name or path of the SQLite database file, or an open connection.
+    pool_prefix (str): The pool name prefix, e.g. 'SALK' for the whole SALK series.
+    since (str, optional): Only runs on or after this date (YYYY-MM-DD).
+
+    Returns:
+    pd.DataFrame: run_date, run_id, pool, total_reads, q30_bases, lanes and the fewest reads in any lane.
+    """
+    # A range on pool lets the (pool, run_date) index serve the prefix match
+    upper_bound = pool_prefix[:-1] + chr(ord(pool_prefix[-1]) + 1) if pool_prefix else '\U0010ffff'
+    with _metrics_connection(db) as conn:
+        return pd.read_sql_query('''
+            SELECT run_date, run_id, pool, SUM(total_reads) AS total_reads, SUM(q30_bases) AS q30_bases,
+                   COUNT(*) AS lanes, MIN(fewest_read_count) AS fewest_read_count
+            FROM lane_metrics
+            WHERE pool >= ? AND pool < ? AND run_date >= ?
+            GROUP BY run_id, pool
+            ORDER BY run_date, pool
+        ''', conn, params=(pool_prefix, upper_bound, since or ''))
+
+def query_lane_history(db, pool=None, lane=None, since=None):
+    """
+    Returns the per-lane metrics history, optionally for one pool and/or lane, in date order.
+
+    Parameters:
+    db (str or sqlite3.Connection): The name or path of the SQLite database file, or an open connection.
+    pool (str, optional): Only this pool.
+    lane (int, optional): Only this lane.
+    since (str, optional): Only runs on or after this date (YYYY-MM-DD).
+
+    Returns:
+    pd.DataFrame: The matching lane_metrics rows.
+    """
+    conditions, params = ['run_date >= ?'], [since or '']
+    if pool is not None:
+        conditions.append('pool = ?')
+        params.append(pool)
+    if lane is not None:
+        conditions.append('lane = ?')
+        params.append(int(lane))
+
+    with _metrics_connection(db) as conn:
+        return pd.read_sql_query(f'''
+            SELECT * FROM lane_metrics
+            WHERE {' AND '.join(conditions)}
+            ORDER BY run_date, pool, lane
+        ''', conn, params=params)
+
+def query_sample_history(db, sample_id):
+    """
+    Returns every stored lane of a sample across runs, in date order.
+
+    Parameters:
+    db (str or sqlite3.Connection): The name or path of the SQLite database file, or an open connection.
+    sample_id (str): The SampleID.
+
+    Returns:
+    pd.DataFrame: The matching sample_metrics rows.
+    """
+    with _metrics_connection(db) as conn:
+        return pd.read_sql_query('''
+            SELECT * FROM sample_metrics WHERE sample_id = ? ORDER BY run_date, lane
+        ''', conn, params=(sample_id,))
+
 def query_database(db_name):
     """
     Queries the SQLite database to print all records in the pool_metrics table.
     
     Parameters:
-    db_name (str): The name of the SQLite database file.
-    """
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM pool_metrics')
-    rows = cursor.fetchall()
-    for row in rows:
-        print(row)
-    conn.close()
+    db_name (str or sqlite3.Connection): The name of the SQLite database file, or an open connection.
+    """
+    with _metrics_connection(db_name) as conn:
+        for row in conn.execute('SELECT * FROM pool_metrics'):
+            print(row)
 
 # Main execution block
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import re
+from demux_reader import read_demultiplex_stats
 
 def get_pool_string(file):
     pool_string = re.search(r'SALK\d+', file).group()
@@ -9,16 +10,17 @@ def get_pool_string(file):
 def read_dataframes(file_path):
     """
     Reads two tables from a CSV file into pandas dataframes.
-    Adjusts for the structure observed in the CSV file.
+    The boundary between the tables is found by the shared Demultiplex_Stats reader.
     """
-    demux_stats = pd.read_csv(file_path, nrows=128)  # Adjusted to read only relevant rows for the first table
-    top_unknown_barcodes = pd.read_csv(file_path, skiprows=131)  # Starts reading from the actual data of the second table
+    demux_stats, top_unknown_barcodes = read_demultiplex_stats(file_path)
+    if top_unknown_barcodes is None:
+        top_unknown_barcodes = pd.DataFrame(columns=["Lane", "index", "index2", "# Reads"])
 
     return demux_stats, top_unknown_barcodes
 
 def calculate_metrics(demux_stats, top_unknown_barcodes):
     run_yield = demux_stats["# of >= Q30 Bases (PF)"].sum()
-    run_yield_excluding_undetermined = demux_stats[~demux_stats["SampleID"].fillna('').str.contains("Undetermined")]["# of >= Q30 Bases (PF)"].sum()
+    run_yield_excluding_undetermined = demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# of >= Q30 Bases (PF)"].sum()
     total_reads = demux_stats["# Reads"].sum()
     phiX_condition1 = (top_unknown_barcodes["index"] == "TGCCGTGGAT") & (top_unknown_barcodes["index2"] == "GATATAGAGT")
     phiX_condition2 = (top_unknown_barcodes["index"] == "GATATAGAGT") & (top_unknown_barcodes["index2"] == "GATATAGAGT")
@@ -43,7 +45,7 @@ def format_metrics(metrics):
     return formatted_metrics
 
 def plot_reads_vs_sampleID_reversed(demux_stats, pool_string):
-    pivot_table = demux_stats.pivot_table(index='SampleID', columns='Lane', values='# Reads', fill_value=0)
+    pivot_table = demux_stats.pivot_table(index='SampleID', columns='Lane', values='# Reads', fill_value=0, observed=True)
     pivot_table.plot(kind='barh', figsize=(10, 6))  
     plt.title('Reads PF for Each Plate in Each Lane')
     plt.ylabel('SampleID')
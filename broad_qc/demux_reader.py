@@ -0,0 +1,228 @@
+import hashlib
+import io
+import os
+import tempfile
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+TOP_UNKNOWN_BARCODES_MARKER = b"[Top Unknown Barcodes]"
+
+# Text columns that repeat heavily across lanes and are stored as categories
+CATEGORICAL_COLUMNS = ['SampleID', 'Sample_Project', 'Index', 'index', 'index2']
+
+# Parsed tables are cached here as Feather files, keyed by the source file's path, size and mtime
+CACHE_DIR = os.environ.get('DEMUX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'demux_stats'))
+CACHE_MAX_BYTES = int(os.environ.get('DEMUX_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+def find_section_offsets(buffer):
+    """
+    Finds the byte offsets of the two tables in a Demultiplex_Stats.csv buffer.
+
+    Parameters:
+    buffer (bytes): The full contents of the file.
+
+    Returns:
+    tuple: A tuple containing:
+        - The offset one past the last non-empty byte of the demux stats table (int).
+        - The offset of the first byte after the "[Top Unknown Barcodes]" line (int), or None if
+          the file has no top unknown barcodes section.
+    """
+    marker_offset = buffer.find(TOP_UNKNOWN_BARCODES_MARKER)
+    if marker_offset == -1:
+        demux_end = len(buffer)
+        top_unknown_start = None
+    else:
+        # The demux table ends at the start of the marker line
+        demux_end = buffer.rfind(b"\n", 0, marker_offset) + 1
+        line_end = buffer.find(b"\n", marker_offset)
+        top_unknown_start = len(buffer) if line_end == -1 else line_end + 1
+
+    # Walk back over the blank lines separating the two tables
+    while demux_end > 0 and buffer[demux_end - 1] in b"\r\n \t":
+        demux_end -= 1
+
+    return demux_end, top_unknown_start
+
+def _tidy_frame(frame):
+    """
+    Drops the empty rows and unnamed empty columns left by trailing commas and
+    narrows the Lane and count columns to integers when no values are missing.
+    """
+    frame = frame.dropna(how='all')
+    empty_columns = [column for column in frame.columns
+                     if str(column).startswith('Unnamed:') and frame[column].isna().all()]
+    frame = frame.drop(columns=empty_columns).reset_index(drop=True)
+
+    if 'Lane' in frame.columns and frame['Lane'].notna().all():
+        frame['Lane'] = frame['Lane'].astype('int16')
+
+    # Count columns are read as floats when an empty row was present
+    for column in frame.columns:
+        if (str(column).startswith('# ') and frame[column].dtype == 'float64'
+                and frame[column].notna().all()):
+            frame[column] = frame[column].astype('int64')
+
+    for column in frame.select_dtypes('category').columns:
+        frame[column] = frame[column].cat.remove_unused_categories()
+
+    return frame
+
+def _parse_section(handle, nrows, categorical):
+    dtype = {column: 'category' for column in CATEGORICAL_COLUMNS} if categorical else None
+    try:
+        frame = pd.read_csv(handle, nrows=nrows, dtype=dtype, skip_blank_lines=False)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+    return _tidy_frame(frame)
+
+def _parse_demultiplex_stats(file_path, categorical):
+    with open(file_path, 'rb') as file:
+        buffer = file.read()
+
+    demux_end, top_unknown_start = find_section_offsets(buffer)
+    handle = io.BytesIO(buffer)
+
+    if demux_end > 0:
+        # Every line after the header is a row; blank lines come back as empty rows and are dropped
+        demux_rows = buffer.count(b"\n", 0, demux_end)
+        demux_stats = _parse_section(handle, demux_rows, categorical)
+    else:
+        demux_stats = pd.DataFrame()
+
+    if top_unknown_start is None:
+        top_unknown_barcodes = None
+    else:
+        handle.seek(top_unknown_start)
+        top_unknown_barcodes = _parse_section(handle, None, categorical)
+
+    return demux_stats, top_unknown_barcodes
+
+def _cache_paths(file_path, categorical, cache_dir):
+    stat = os.stat(file_path)
+    key_source = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{int(categorical)}"
+    key = hashlib.sha1(key_source.encode()).hexdigest()
+    return (os.path.join(cache_dir, f"{key}.demux.feather"),
+            os.path.join(cache_dir, f"{key}.top.feather"))
+
+def _write_feather(frame, path):
+    # A unique temporary file per writer, so threads caching the same file never share one
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        frame.to_feather(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Removes the least recently used cache entries until the cache fits in max_bytes.
+
+    Parameters:
+    cache_dir (str): The cache directory.
+    max_bytes (int): The size budget for the cache directory in bytes.
+    """
+    entries = {}
+    with os.scandir(cache_dir) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.feather'):
+                continue
+            key = entry.name.split('.', 1)[0]
+            stat = entry.stat()
+            size, last_used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+    total_bytes = sum(size for size, _ in entries.values())
+    for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total_bytes <= max_bytes:
+            break
+        for suffix in ('demux', 'top'):
+            try:
+                os.remove(os.path.join(cache_dir, f"{key}.{suffix}.feather"))
+            except FileNotFoundError:
+                pass
+        total_bytes -= size
+
+def read_demultiplex_stats_cached(file_path, categorical=True, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Returns the parsed tables of a Demultiplex_Stats.csv file from the on-disk cache,
+    parsing the file and adding it to the cache on a miss.
+
+    Entries are keyed by the file's path, size and mtime, so an edited file is parsed again.
+    Reading an entry marks it as recently used; the least recently used entries are removed
+    once the cache grows past max_bytes. Without pyarrow the file is always parsed.
+
+    Parameters:
+    file_path (str): The path to the Demultiplex_Stats.csv file.
+    categorical (bool): Store the SampleID, Sample_Project and index columns as categories.
+    cache_dir (str): The cache directory. Defaults to $DEMUX_CACHE_DIR or ~/.cache/demux_stats.
+    max_bytes (int): The size budget for the cache directory in bytes.
+
+    Returns:
+    tuple: The demux stats DataFrame and the top unknown barcodes DataFrame (or None).
+    """
+    if feather is None:
+        return _parse_demultiplex_stats(file_path, categorical)
+
+    demux_path, top_path = _cache_paths(file_path, categorical, cache_dir)
+
+    # The demux table is written last, so its presence marks a complete entry
+    if os.path.exists(demux_path):
+        try:
+            demux_stats = pd.read_feather(demux_path)
+            top_unknown_barcodes = pd.read_feather(top_path) if os.path.exists(top_path) else None
+            os.utime(demux_path)
+            return demux_stats, top_unknown_barcodes
+        except (OSError, ValueError) as e:
+            print(f"Discarding unreadable cache entry {demux_path}: {e}")
+
+    demux_stats, top_unknown_barcodes = _parse_demultiplex_stats(file_path, categorical)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if top_unknown_barcodes is not None:
+            _write_feather(top_unknown_barcodes, top_path)
+        elif os.path.exists(top_path):
+            os.remove(top_path)
+        _write_feather(demux_stats, demux_path)
+        evict_cache(cache_dir, max_bytes)
+    except (OSError, ValueError) as e:
+        print(f"Could not cache {file_path}: {e}")
+
+    return demux_stats, top_unknown_barcodes
+
+def read_demultiplex_stats(file_path, skip_undetermined=False, categorical=True, use_cache=True):
+    """
+    Reads the demux stats and top unknown barcodes tables from a Demultiplex_Stats.csv file.
+
+    The file is read from disk once. The "[Top Unknown Barcodes]" boundary is located by byte
+    offset and both tables are parsed directly out of the same in-memory buffer, so no lines
+    are copied into intermediate Python lists. Parsed tables are kept in the on-disk cache
+    (see read_demultiplex_stats_cached) unless use_cache is False.
+
+    Parameters:
+    file_path (str): The path to the Demultiplex_Stats.csv file.
+    skip_undetermined (bool): Drop the rows whose SampleID contains "Undetermined".
+    categorical (bool): Store the SampleID, Sample_Project and index columns as categories.
+    use_cache (bool): Load and store the parsed tables in the on-disk cache.
+
+    Returns:
+    tuple: A tuple containing:
+        - The demux stats DataFrame (an empty DataFrame if the table has no rows).
+        - The top unknown barcodes DataFrame, or None if the file has no such section.
+    """
+    if use_cache:
+        demux_stats, top_unknown_barcodes = read_demultiplex_stats_cached(file_path, categorical=categorical)
+    else:
+        demux_stats, top_unknown_barcodes = _parse_demultiplex_stats(file_path, categorical)
+
+    if skip_undetermined and 'SampleID' in demux_stats.columns:
+        determined = ~demux_stats['SampleID'].str.contains("Undetermined", na=False)
+        demux_stats = _tidy_frame(demux_stats[determined])
+
+    return demux_stats, top_unknown_barcodes
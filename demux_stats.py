@@ -1,4 +1,5 @@
 import pandas as pd
+from demux_reader import read_demultiplex_stats
 
 def read_dataframes(file_path):
     """
@@ -10,11 +11,10 @@ def read_dataframes(file_path):
     Returns:
     tuple: A tuple containing two pandas dataframes.
     """
-    # Read the first table into a dataframe named demux_stats
-    demux_stats = pd.read_csv(file_path, nrows=136, skiprows=0)
-
-    # Read the second table into a dataframe named top_unknown_barcodes
-    top_unknown_barcodes = pd.read_csv(file_path, skiprows=139)
+    # Read both tables in a single pass over the file
+    demux_stats, top_unknown_barcodes = read_demultiplex_stats(file_path)
+    if top_unknown_barcodes is None:
+        top_unknown_barcodes = pd.DataFrame(columns=["Lane", "index", "index2", "# Reads"])
 
     return demux_stats, top_unknown_barcodes
 
@@ -33,7 +33,7 @@ def calculate_metrics(demux_stats, top_unknown_barcodes):
     run_yield = demux_stats["# of >= Q30 Bases (PF)"].sum()
 
     # Sum of "# of >= Q30 Bases (PF)" excluding rows with "Undetermined" in "SampleID"
-    run_yield_excluding_undetermined = demux_stats[~demux_stats["SampleID"].str.contains("Undetermined")]["# of >= Q30 Bases (PF)"].sum()
+    run_yield_excluding_undetermined = demux_stats[~demux_stats["SampleID"].str.contains("Undetermined", na=False)]["# of >= Q30 Bases (PF)"].sum()
 
     # Sum of "# Reads"
     total_reads = demux_stats["# Reads"].sum()
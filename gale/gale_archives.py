@@ -1,9 +1,161 @@
 import os
+import stat
 import sqlite3
 from sqlite3 import Error
 import pandas as pd
 from datetime import datetime
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# BEGIN IMMEDIATE and COMMIT are retried this many times when another process holds the lock
+LOCK_RETRIES = 5
+LOCK_RETRY_DELAY = 0.2
+
+# Seconds a connection waits on a lock held by another connection before raising
+BUSY_TIMEOUT = 30.0
+
+# UPDATE ... FROM needs SQLite 3.33; older builds (e.g. those bundled with CPython 3.8) use correlated subqueries
+_HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+# RETURNING needs SQLite 3.35; older builds read the changed rows with a separate SELECT
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+class ArchiveCatalog:
+    """
+    A long-lived handle on an archives database, shared by the functions in this module.
+
+    Each thread gets its own connection, opened on first use and kept for the life of the
+    catalog, so repeated calls skip the connect and schema-parse cost. Connections use WAL
+    mode (readers never block the cron ingest), synchronous=NORMAL, a larger page cache and a
+    busy timeout. Every function below that takes db_path also accepts a catalog, and is
+    available as a method, e.g. catalog.get_paths_by_archive_status({'aws': 'complete'}).
+
+    :param db_path: Path to the SQLite database file.
+    :param cache_size_kib: Page cache per connection, in KiB.
+    :param busy_timeout: Seconds to wait for a lock before failing.
+    """
+
+    def __init__(self, db_path="archives.db", cache_size_kib=64 * 1024, busy_timeout=BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ArchiveCatalog({self.db_path!r})"
+
+    def connection(self):
+        """
+        Returns this thread's connection, opening it if needed.
+
+        :return: A sqlite3.Connection in autocommit mode; use transaction() to group writes.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only the owning thread uses a connection; close() may run on another thread
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+            except sqlite3.OperationalError as e:
+                print(f"Could not enable WAL mode: {e}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the enclosed statements in one write transaction on this thread's connection,
+        committing on success and rolling back on error. Nested uses join the outer transaction.
+        """
+        with _transaction(self.connection()) as conn:
+            yield conn
+
+    def close(self):
+        """Closes the connections of every thread."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def _is_locked_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+def _retry_locked(conn, statement, retries=LOCK_RETRIES, delay=LOCK_RETRY_DELAY):
+    """Executes statement, retrying with exponential backoff while the database is locked."""
+    for attempt in range(retries + 1):
+        try:
+            return conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            if not _is_locked_error(e) or attempt == retries:
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+@contextmanager
+def _transaction(conn):
+    """
+    Wraps the enclosed statements in BEGIN IMMEDIATE ... COMMIT on an autocommit connection,
+    retrying while another writer holds the lock. Joins an already open transaction.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+    _retry_locked(conn, "BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    try:
+        _retry_locked(conn, "COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+
+@contextmanager
+def _open(db):
+    """
+    Yields a connection for db: the calling thread's connection of an ArchiveCatalog, or a new
+    autocommit connection to a database path, closed on exit.
+    """
+    if isinstance(db, ArchiveCatalog):
+        yield db.connection()
+        return
+    conn = sqlite3.connect(db, timeout=BUSY_TIMEOUT, isolation_level=None)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def _db_key(db):
+    """Identifies the database behind a path or catalog."""
+    return os.path.abspath(db.db_path if isinstance(db, ArchiveCatalog) else db)
 
 def create_connection(db_file):
     """ create a database connection to the SQLite database
@@ -49,62 +201,50 @@ def create_database(db_path="archives.db"):
                                     UNIQUE(path_id, archive_type) -- Composite unique constraint
                                 );"""
 
-    # Create a database connection
-    conn = create_connection(db_path)
-
     # Create tables
-    if conn is not None:
-        create_table(conn, sql_create_paths_table)
-        create_table(conn, sql_create_archives_table)
+    try:
+        with _open(db_path) as conn:
+            create_table(conn, sql_create_paths_table)
+            create_table(conn, sql_create_archives_table)
+            create_archived_names_tables(conn)
+            create_snapshot_tables(conn)
+            create_path_sizes_table(conn)
+        migrate_database(db_path)
         print("Tables were created successfully.")
-        conn.close()
-    else:
+    except Error as e:
+        print(e)
         print("Error! Cannot create the database connection.")
 
 def list_table_names(db_path):
     """
     List all table names in the SQLite database specified by db_path.
     
-    :param db_path: Path to the SQLite database file.
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :return: A list of table names in the database.
     """
-    conn = None
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Query to select all table names from sqlite_master
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        
-        # Fetch all results and extract table names
-        tables = cursor.fetchall()
-        table_names = [table[0] for table in tables]
-        
-        return table_names
+        with _open(db_path) as conn:
+            # Query to select all table names from sqlite_master
+            tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
+
+        # Extract table names
+        return [table[0] for table in tables]
     except sqlite3.Error as e:
         print(f"Error connecting to database: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 def get_db_table(db_path, table_name):
     """
     Return a DataFrame containing the contents of a database table.
 
-    :param db_path: The path to the SQLite database file.
+    :param db_path: The path to the SQLite database file, or an ArchiveCatalog.
     :param table_name: The name of the table to return.
     :return: A pandas DataFrame of the requested table.
     """
-    # Create a connection to the database
-    conn = sqlite3.connect(db_path)
-
     # Query the table and read into a pandas DataFrame
     query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql_query(query, conn)
-
-    # Close the database connection
-    conn.close()
+    with _open(db_path) as conn:
+        df = pd.read_sql_query(query, conn)
 
     # Return the DataFrame
     return df
@@ -178,406 +318,909 @@ def get_filesystem_dates(entry_path):
     except OSError:
         return None
 
-def update_archive_details_from_list(db_path, paths, archive_type):
-    """
-    Updates the database with archival details for a list of paths based on a provided archive log file.
-    
-    Handles cases where files or directories have been removed by setting 'is_removed' accordingly.
+def _format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def _stat_entry(entry_path):
     """
-    archived_names_log_path = get_file_path_for_archive_type(archive_type)
+    Stats a path once.
 
+    :param entry_path: The path to the file or directory.
+    :return: A tuple of (path_type, ctime_ns, mtime_ns), all None if the path no longer exists.
+    """
     try:
-        with open(archived_names_log_path, 'r') as file:
-            archived_names = {line.strip() for line in file.readlines()}
-    except IOError as e:
-        print(f"Could not read archived names log file: {e}")
-        return
+        st = os.stat(entry_path)
+    except OSError:
+        return None, None, None
+    path_type = 'file' if stat.S_ISREG(st.st_mode) else 'directory'
+    return path_type, st.st_ctime_ns, st.st_mtime_ns
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def _path_details(entry_path, path_type, ctime_ns, mtime_ns):
+    """Formats stat results as a (path, path_type, creation_date, modification_date) row."""
+    if path_type is None:
+        return entry_path, None, None, None
+    return entry_path, path_type, _format_timestamp(ctime_ns / 1e9), _format_timestamp(mtime_ns / 1e9)
 
-    for entry_path in paths:
-        dates = get_filesystem_dates(entry_path)
-        if dates:
-            creation_date, modification_date = dates
-            is_removed = False
-            path_type = 'file' if os.path.isfile(entry_path) else 'directory'
-            archive_status = 'complete' if entry_path in archived_names else 'pending'
-        else:
-            # If dates could not be retrieved, assume the file/directory has been removed
-            creation_date = modification_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Placeholder dates
-            is_removed = True
-            path_type = 'unknown'
-            archive_status = 'pending'  # Default to pending if the path is missing
+def _stat_path(entry_path):
+    """
+    Stats a path once.
 
-        print(f"Processing: {entry_path}, Type: {path_type}, Archive Status: {archive_status}")
-        
-        db_update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    :param entry_path: The path to the file or directory.
+    :return: A tuple of (path, path_type, creation_date, modification_date); everything but the
+             path is None if the path no longer exists.
+    """
+    return _path_details(entry_path, *_stat_entry(entry_path))
 
-        try:
-            cursor.execute("""
-                INSERT INTO Paths (path, path_type, created_at, modified_at, is_removed)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(path) DO UPDATE SET
-                    path_type=excluded.path_type,
-                    created_at=excluded.created_at,
-                    modified_at=excluded.modified_at,
-                    is_removed=excluded.is_removed;
-                """, (entry_path, path_type, creation_date, modification_date, is_removed))
+def stat_paths(paths, max_workers=32):
+    """
+    Stats many paths concurrently. Each stat is a metadata round-trip to the file server,
+    so running them on a thread pool hides most of the latency.
 
-            if not is_removed:
-                cursor.execute("SELECT path_id FROM Paths WHERE path = ?", (entry_path,))
-                path_id = cursor.fetchone()[0]
+    :param paths: The paths to stat.
+    :param max_workers: Number of stat calls in flight at once.
+    :return: A list of (path, path_type, creation_date, modification_date) tuples in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_stat_path, paths))
 
-                cursor.execute("""
-                    INSERT INTO Archives (path_id, archive_type, archive_status, last_updated)
-                    VALUES (?, ?, ?, ?)
-                    ON CONFLICT(path_id, archive_type) DO UPDATE SET
-                        archive_status=excluded.archive_status,
-                        last_updated=excluded.last_updated;
-                    """, (path_id, archive_type, archive_status, db_update_time))
-        except sqlite3.Error as e:
-            print(f"Database error while processing {entry_path}: {e}")
-
-    conn.commit()
-    conn.close()
-    print(f"Completed updating archive details for provided paths with archive type '{archive_type}'.")
-
-def update_archive_details_in_db(db_path, directory_path, archive_type):
-    archived_names_log_path = get_file_path_for_archive_type(archive_type)
+# SQL for the last component of a path: rtrim strips every character except '/' from the
+# right, leaving the directory prefix, which replace then removes
+_BASENAME_SQL = "replace({path}, rtrim({path}, replace({path}, '/', '')), '')"
 
-    if not archived_names_log_path or not os.path.isfile(archived_names_log_path):
-        print(f"Log file path for archive type '{archive_type}' could not be determined or does not exist.")
-        return
+def create_archived_names_tables(conn):
+    """
+    Creates the tables holding the contents of the archived names logs, if they do not exist.
 
-    with open(archived_names_log_path, 'r') as file:
-        archived_names = {line.strip() for line in file.readlines()}
+    ArchivedNames has one row per line of each log. ArchiveLogOffsets records how far each log
+    has been read, so later loads only read the lines appended since.
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    :param conn: An open connection to the archives database.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS ArchivedNames (
+                        archive_type TEXT NOT NULL CHECK (archive_type IN ('dsmc', 'aws')),
+                        name TEXT NOT NULL,
+                        PRIMARY KEY (archive_type, name)
+                    ) WITHOUT ROWID;""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS ArchiveLogOffsets (
+                        archive_type TEXT PRIMARY KEY,
+                        log_path TEXT NOT NULL,
+                        inode INTEGER,
+                        byte_offset INTEGER NOT NULL
+                    );""")
+
+def load_archived_names(db_path, archive_type):
+    """
+    Loads the lines appended to the archived names log of archive_type since the last load
+    into the ArchivedNames table.
 
-    numbered_entries = [entry for entry in os.listdir(directory_path) if entry[0].isdigit()]
+    Reading starts at the byte offset stored for the log and stops after the last complete
+    line, so a line that is still being written is picked up next time. The log is read from
+    the start again if it was replaced or truncated.
 
-    for entry in numbered_entries:
-        entry_path = os.path.join(directory_path, entry)
-        creation_date, modification_date = get_filesystem_dates(entry_path)
-        path_type = 'file' if os.path.isfile(entry_path) else 'directory'
-        archive_status = 'complete' if entry in archived_names else 'pending'
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_type: The type of archive ('dsmc' or 'aws').
+    :return: The number of lines read, or None if the log could not be read.
+    """
+    archived_names_log_path = get_file_path_for_archive_type(archive_type)
 
-        print(f"Processing: {entry_path}, Type: {path_type}, Archive Status: {archive_status}")
+    with _open(db_path) as conn:
+        create_archived_names_tables(conn)
+        try:
+            with _transaction(conn):
+                row = conn.execute("SELECT log_path, inode, byte_offset FROM ArchiveLogOffsets WHERE archive_type = ?",
+                                   (archive_type,)).fetchone()
+                with open(archived_names_log_path, 'rb') as file:
+                    log_stat = os.fstat(file.fileno())
+                    offset = 0
+                    if row and row[0] == archived_names_log_path and row[1] == log_stat.st_ino and row[2] <= log_stat.st_size:
+                        offset = row[2]
+                    file.seek(offset)
+                    data = file.read()
+
+                # Leave a trailing partial line for the next load
+                data = data[:data.rfind(b"\n") + 1]
+                names = {line.strip() for line in data.decode('utf-8', errors='replace').splitlines()}
+                names.discard('')
+
+                conn.executemany("INSERT OR IGNORE INTO ArchivedNames (archive_type, name) VALUES (?, ?)",
+                                 ((archive_type, name) for name in names))
+                conn.execute("""
+                    INSERT INTO ArchiveLogOffsets (archive_type, log_path, inode, byte_offset)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(archive_type) DO UPDATE SET
+                        log_path=excluded.log_path,
+                        inode=excluded.inode,
+                        byte_offset=excluded.byte_offset;
+                    """, (archive_type, archived_names_log_path, log_stat.st_ino, offset + len(data)))
+        except (IOError, TypeError) as e:
+            print(f"Could not read archived names log file: {e}")
+            return None
+
+    return data.count(b"\n")
+
+def create_snapshot_tables(conn):
+    """
+    Creates the tables recording what the last directory scan saw, if they do not exist.
 
-        # Get the current time for the database update operation
-        db_update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    DirectorySnapshots holds the mtime of each scanned directory and EntrySnapshots the stat
+    results of its entries at that time.
 
-        try:
-            cursor.execute("""
+    :param conn: An open connection to the archives database.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS DirectorySnapshots (
+                        directory TEXT PRIMARY KEY,
+                        mtime_ns INTEGER NOT NULL,
+                        scanned_at DATETIME NOT NULL
+                    );""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS EntrySnapshots (
+                        directory TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        path_type TEXT,
+                        ctime_ns INTEGER,
+                        mtime_ns INTEGER,
+                        PRIMARY KEY (directory, name)
+                    ) WITHOUT ROWID;""")
+
+def snapshot_directory(db_path, directory_path, force=False, max_workers=32):
+    """
+    Returns the details of the numbered entries of a directory, re-listing and re-stat'ing
+    them only if the directory changed since the last scan.
+
+    A directory's mtime changes whenever an entry is added, removed or renamed. If it still
+    matches the stored snapshot, the entries recorded last time are returned without touching
+    the filesystem beyond one stat of the directory. Otherwise the directory is listed with
+    os.scandir, its entries are stat'ed in parallel and the snapshot is updated, writing only
+    entries whose values differ. Changes inside an entry (e.g. files written into a run
+    folder) do not change the parent's mtime; use force=True to pick them up.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param directory_path: The directory to scan.
+    :param force: Re-list and re-stat even if the directory is unchanged.
+    :param max_workers: Number of stat calls in flight at once.
+    :return: A tuple of (rows, rescanned). rows are (path, path_type, creation_date,
+             modification_date) tuples like stat_paths returns; rescanned tells whether the
+             directory was scanned again.
+    """
+    # Taken before listing, so changes made during the scan trigger another scan next time
+    directory_mtime_ns = os.stat(directory_path).st_mtime_ns
+
+    with _open(db_path) as conn:
+        create_snapshot_tables(conn)
+        row = conn.execute("SELECT mtime_ns FROM DirectorySnapshots WHERE directory = ?", (directory_path,)).fetchone()
+        if row and row[0] == directory_mtime_ns and not force:
+            entries = conn.execute("SELECT name, path_type, ctime_ns, mtime_ns FROM EntrySnapshots WHERE directory = ?",
+                                   (directory_path,)).fetchall()
+            return [_path_details(os.path.join(directory_path, name), *details) for name, *details in entries], False
+
+    with os.scandir(directory_path) as scan:
+        names = [entry.name for entry in scan if entry.name[0].isdigit()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        details = list(executor.map(_stat_entry, (os.path.join(directory_path, name) for name in names)))
+
+    with _open(db_path) as conn, _transaction(conn):
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS StagedEntries (
+                name TEXT PRIMARY KEY,
+                path_type TEXT,
+                ctime_ns INTEGER,
+                mtime_ns INTEGER
+            )""")
+        conn.execute("DELETE FROM StagedEntries")
+        conn.executemany("INSERT INTO StagedEntries VALUES (?, ?, ?, ?)",
+                         [(name, *entry_details) for name, entry_details in zip(names, details)])
+        conn.execute("""
+            DELETE FROM EntrySnapshots
+            WHERE directory = ? AND name NOT IN (SELECT name FROM StagedEntries);
+            """, (directory_path,))
+        conn.execute("""
+            INSERT INTO EntrySnapshots (directory, name, path_type, ctime_ns, mtime_ns)
+            SELECT ?, name, path_type, ctime_ns, mtime_ns FROM StagedEntries WHERE true
+            ON CONFLICT(directory, name) DO UPDATE SET
+                path_type=excluded.path_type,
+                ctime_ns=excluded.ctime_ns,
+                mtime_ns=excluded.mtime_ns
+            WHERE EntrySnapshots.path_type IS NOT excluded.path_type
+                OR EntrySnapshots.ctime_ns IS NOT excluded.ctime_ns
+                OR EntrySnapshots.mtime_ns IS NOT excluded.mtime_ns;
+            """, (directory_path,))
+        conn.execute("""
+            INSERT INTO DirectorySnapshots (directory, mtime_ns, scanned_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(directory) DO UPDATE SET
+                mtime_ns=excluded.mtime_ns,
+                scanned_at=excluded.scanned_at;
+            """, (directory_path, directory_mtime_ns, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.execute("DELETE FROM StagedEntries")
+
+    rows = [_path_details(os.path.join(directory_path, name), *entry_details) for name, entry_details in zip(names, details)]
+    return rows, True
+
+def bulk_update_archive_details(db_path, paths, archive_type, archived_names=None, match_names=False,
+                                max_workers=32, verbose=False, stats=None):
+    """
+    Registers many paths and their archive status in one transaction.
+
+    Paths are stat'ed in parallel and staged in a temporary table, then Paths and Archives are
+    upserted with one INSERT ... SELECT each. Paths that no longer exist are only marked as
+    removed if they are already in the database. The database is switched to WAL mode so
+    readers are not blocked while the ingest runs.
+
+    Unless archived_names is given, each path's status is derived inside SQLite with one
+    UPDATE joining the staged paths against the ArchivedNames table (see load_archived_names).
+    Only rows whose values differ from what is stored are written, so last_updated records
+    when a path's archive status last changed.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param paths: The paths to register.
+    :param archive_type: The type of archive ('dsmc' or 'aws').
+    :param archived_names: Optional set of the names in the archived names log, used instead of ArchivedNames.
+    :param match_names: Match the entry name instead of the full path against the archived names.
+    :param max_workers: Number of stat calls in flight at once.
+    :param verbose: Print a line for every path.
+    :param stats: Optional rows already returned by stat_paths or snapshot_directory; paths is then ignored.
+    :return: A dictionary with the number of paths staged, removed and archived ('complete').
+    """
+    if stats is None:
+        stats = stat_paths(paths, max_workers=max_workers)
+
+    staged = []
+    for entry_path, path_type, creation_date, modification_date in stats:
+        archive_status = None
+        if archived_names is not None:
+            name = os.path.basename(entry_path.rstrip('/')) if match_names else entry_path
+            archive_status = 'complete' if path_type is not None and name in archived_names else 'pending'
+        staged.append((entry_path, path_type, creation_date, modification_date, archive_status))
+
+    db_update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    _ensure_migrated(db_path)
+    with _open(db_path) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        create_archived_names_tables(conn)
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS StagedPaths (
+                path TEXT PRIMARY KEY,
+                path_type TEXT,
+                created_at DATETIME,
+                modified_at DATETIME,
+                archive_status TEXT
+            )""")
+        with _transaction(conn):
+            conn.execute("DELETE FROM StagedPaths")
+            conn.executemany("INSERT OR REPLACE INTO StagedPaths VALUES (?, ?, ?, ?, ?)", staged)
+
+            if archived_names is None:
+                name_sql = _BASENAME_SQL.format(path="rtrim(path, '/')") if match_names else "path"
+                conn.execute(f"""
+                    UPDATE StagedPaths
+                    SET archive_status = CASE WHEN EXISTS (
+                        SELECT 1 FROM ArchivedNames n WHERE n.archive_type = ? AND n.name = {name_sql}
+                    ) THEN 'complete' ELSE 'pending' END
+                    WHERE path_type IS NOT NULL;
+                    """, (archive_type,))
+
+            conn.execute("""
                 INSERT INTO Paths (path, path_type, created_at, modified_at, is_removed)
-                VALUES (?, ?, ?, ?, ?)
+                SELECT path, path_type, created_at, modified_at, FALSE
+                FROM StagedPaths
+                WHERE path_type IS NOT NULL
                 ON CONFLICT(path) DO UPDATE SET
                     path_type=excluded.path_type,
                     created_at=excluded.created_at,
                     modified_at=excluded.modified_at,
-                    is_removed=excluded.is_removed;
-                """, (entry_path, path_type, creation_date, modification_date, False))
-            print("Inserted/Updated in Paths table successfully.")
+                    is_removed=excluded.is_removed
+                WHERE Paths.path_type IS NOT excluded.path_type
+                    OR Paths.created_at IS NOT excluded.created_at
+                    OR Paths.modified_at IS NOT excluded.modified_at
+                    OR Paths.is_removed IS NOT excluded.is_removed;
+                """)
+
+            removed = conn.execute("""
+                UPDATE Paths SET is_removed = TRUE
+                WHERE NOT is_removed AND path IN (SELECT path FROM StagedPaths WHERE path_type IS NULL);
+                """).rowcount
+
+            conn.execute("""
+                INSERT INTO Archives (path_id, archive_type, archive_status, last_updated)
+                SELECT p.path_id, ?, s.archive_status, ?
+                FROM StagedPaths s
+                JOIN Paths p ON p.path = s.path
+                WHERE s.path_type IS NOT NULL
+                ON CONFLICT(path_id, archive_type) DO UPDATE SET
+                    archive_status=excluded.archive_status,
+                    last_updated=excluded.last_updated
+                WHERE Archives.archive_status IS NOT excluded.archive_status;
+                """, (archive_type, db_update_time))
+
+            if verbose:
+                for entry_path, path_type, archive_status in conn.execute(
+                        "SELECT path, path_type, archive_status FROM StagedPaths"):
+                    print(f"Processing: {entry_path}, Type: {path_type or 'unknown'}, "
+                          f"Archive Status: {archive_status or 'pending'}")
+            complete = conn.execute("SELECT COUNT(*) FROM StagedPaths WHERE archive_status = 'complete'").fetchone()[0]
+
+            conn.execute("DELETE FROM StagedPaths")
+
+    return {'staged': len(staged), 'removed': removed, 'complete': complete}
+
+def reconcile_archive_status(db_path, archive_type):
+    """
+    Marks as 'complete' every registered path of archive_type whose full path or entry name
+    has appeared in the archived names log, without rescanning the filesystem.
 
-        except sqlite3.Error as e:
-            print(f"Error updating Paths table for {entry_path}: {e}")
+    New log lines are loaded first with load_archived_names, then all statuses are updated
+    with one join-based UPDATE. Statuses are only ever promoted to 'complete'.
 
-        try:
-            cursor.execute("SELECT path_id FROM Paths WHERE path = ?", (entry_path,))
-            path_id_result = cursor.fetchone()
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_type: The type of archive ('dsmc' or 'aws').
+    :return: The number of Archives rows marked complete, or None if the log could not be read.
+    """
+    if load_archived_names(db_path, archive_type) is None:
+        return None
 
-            if path_id_result:
-                path_id = path_id_result[0]
-                cursor.execute("""
-                    INSERT INTO Archives (path_id, archive_type, archive_status, last_updated)
-                    VALUES (?, ?, ?, ?)
-                    ON CONFLICT(path_id, archive_type) DO UPDATE SET
-                        archive_status=excluded.archive_status,
-                        last_updated=excluded.last_updated;
-                    """, (path_id, archive_type, archive_status, db_update_time))
-                print("Inserted/Updated in Archives table successfully.")
-            else:
-                print(f"No path_id found for {entry_path}")
+    archived = f"""(EXISTS (SELECT 1 FROM ArchivedNames n WHERE n.archive_type = ? AND n.name = p.path)
+                     OR EXISTS (SELECT 1 FROM ArchivedNames n WHERE n.archive_type = ?
+                                AND n.name = {_BASENAME_SQL.format(path='p.path')}))"""
+    if _HAS_UPDATE_FROM:
+        sql = f"""
+                UPDATE Archives
+                SET archive_status = 'complete', last_updated = ?
+                FROM Paths p
+                WHERE Archives.path_id = p.path_id
+                AND Archives.archive_type = ?
+                AND Archives.archive_status != 'complete'
+                AND {archived};
+                """
+    else:
+        sql = f"""
+                UPDATE Archives
+                SET archive_status = 'complete', last_updated = ?
+                WHERE archive_type = ?
+                AND archive_status != 'complete'
+                AND path_id IN (SELECT p.path_id FROM Paths p WHERE {archived});
+                """
+
+    _ensure_migrated(db_path)
+    with _open(db_path) as conn, _transaction(conn):
+        cursor = conn.execute(sql, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                    archive_type, archive_type, archive_type))
+    return cursor.rowcount
+
+def update_archive_details_from_list(db_path, paths, archive_type, max_workers=32, verbose=False):
+    """
+    Updates the database with archival details for a list of paths based on a provided archive log file.
+    
+    Handles cases where files or directories have been removed by setting 'is_removed' accordingly.
+    Only the lines appended to the log since the last update are read; all paths are then
+    written in one transaction by bulk_update_archive_details.
+    """
+    try:
+        if load_archived_names(db_path, archive_type) is None:
+            return
+        counts = bulk_update_archive_details(db_path, paths, archive_type,
+                                             max_workers=max_workers, verbose=verbose)
+    except sqlite3.Error as e:
+        print(f"Database error while updating archive details: {e}")
+        return
 
-        except sqlite3.Error as e:
-            print(f"Error updating Archives table for {entry_path} with path_id {path_id}: {e}")
+    print(f"Completed updating archive details for {counts['staged']} paths with archive type '{archive_type}' "
+          f"({counts['complete']} complete, {counts['removed']} marked removed).")
+
+def update_archive_details_in_db(db_path, directory_path, archive_type, max_workers=32, verbose=False, force=False):
+    """
+    Registers the numbered entries of a directory and their archive status.
+
+    The directory is only listed and its entries only stat'ed again if its mtime changed since
+    the last run (see snapshot_directory), and only changed rows are written.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param directory_path: The directory holding the run folders.
+    :param archive_type: The type of archive ('dsmc' or 'aws').
+    :param max_workers: Number of stat calls in flight at once.
+    :param verbose: Print a line for every path.
+    :param force: Re-list and re-stat the directory even if it is unchanged.
+    """
+    archived_names_log_path = get_file_path_for_archive_type(archive_type)
+
+    if not archived_names_log_path or not os.path.isfile(archived_names_log_path):
+        print(f"Log file path for archive type '{archive_type}' could not be determined or does not exist.")
+        return
+
+    # Entries of the run directories are matched against the log by name
+    try:
+        if load_archived_names(db_path, archive_type) is None:
+            return
+        stats, _ = snapshot_directory(db_path, directory_path, force=force, max_workers=max_workers)
+        bulk_update_archive_details(db_path, None, archive_type, match_names=True, verbose=verbose, stats=stats)
+    except sqlite3.Error as e:
+        print(f"Database error while updating archive details: {e}")
+        return
 
-    conn.commit()
-    conn.close()
     print(f"Completed updating archive details for '{directory_path}' with archive type '{archive_type}'.")
 
 def load_paths_details(db_path):
     """
     Load paths and their details into a DataFrame.
 
-    :param db_path: Path to the SQLite database file.
+    The rows are read in batches by iter_paths_details, so path_type, archive_type and
+    archive_status are categorical and age is computed in pandas.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :return: A pandas DataFrame with the paths and their details.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
-
-    # SQL query to join Paths and Archives tables and calculate age
-    # Note: SQLite does not have a built-in DATEDIFF function, so we use
-    # the Julian day function to calculate the difference in days
-    query = """
-    SELECT 
-        p.path, 
-        p.path_type, 
-        CASE 
-            WHEN p.path_type = 'file' THEN 
-                ROUND(julianday('now') - julianday(p.modified_at))
-            ELSE 
-                ROUND(julianday('now') - julianday(p.created_at))
-        END AS age,
-        a.archive_type, 
-        a.archive_status, 
-        p.is_removed
-    FROM 
-        Paths p
-    JOIN 
-        Archives a ON p.path_id = a.path_id;
-    """
-
-    # Execute the query and load the results into a DataFrame
-    df = pd.read_sql_query(query, conn)
-
-    # Close the database connection
-    conn.close()
-
-    return df
+    return _concat_batches(iter_paths_details(db_path), PATH_DETAIL_COLUMNS)
 
 def get_complete_non_removed_paths(db_path):
     """
     Generate a list of paths that are not removed and have both AWS and DSMC 
     archive status marked as 'complete'.
 
-    :param db_path: Path to the SQLite database file.
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :return: A list of paths meeting the criteria.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    return query_paths_by_archive_status(db_path, {'aws': 'complete', 'dsmc': 'complete'})
 
-    # SQL query to find paths that are not removed and have both AWS and DSMC status as 'complete'
-    query = """
-    SELECT p.path
-    FROM Paths p
-    WHERE p.is_removed = 0
-    AND EXISTS (
-        SELECT 1 FROM Archives a WHERE a.path_id = p.path_id AND a.archive_type = 'aws' AND a.archive_status = 'complete'
-    )
-    AND EXISTS (
-        SELECT 1 FROM Archives a WHERE a.path_id = p.path_id AND a.archive_type = 'dsmc' AND a.archive_status = 'complete'
-    );
+# Databases known to have the trigram path search index, once seen by this process
+_indexed_databases = set()
+
+# Databases migrate_database has brought up to date in this process
+_migrated_databases = set()
+
+# Trigram search needs at least this many characters
+_TRIGRAM_LENGTH = 3
+
+def create_query_indexes(conn):
+    """
+    Creates the covering indexes used by the path queries, if they do not exist.
+
+    :param conn: An open connection to the archives database.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archives_type_status_path ON Archives (archive_type, archive_status, path_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_paths_is_removed ON Paths (is_removed);")
+
+def create_path_search_index(conn):
+    """
+    Creates PathsFTS, an FTS5 trigram index over Paths.path kept in sync by triggers, and fills
+    it from the existing paths if it is new. Substring searches of three or more characters
+    can then be answered from the index instead of scanning Paths.
+
+    Requires SQLite 3.34 or later built with FTS5.
+
+    :param conn: An open connection to the archives database.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'PathsFTS'").fetchone()
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS PathsFTS USING fts5(
+                        path, content='Paths', content_rowid='path_id', tokenize='trigram');""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Paths_fts_insert AFTER INSERT ON Paths BEGIN
+                        INSERT INTO PathsFTS (rowid, path) VALUES (new.path_id, new.path);
+                    END;""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Paths_fts_delete AFTER DELETE ON Paths BEGIN
+                        INSERT INTO PathsFTS (PathsFTS, rowid, path) VALUES ('delete', old.path_id, old.path);
+                    END;""")
+    conn.execute("""CREATE TRIGGER IF NOT EXISTS Paths_fts_update AFTER UPDATE OF path ON Paths BEGIN
+                        INSERT INTO PathsFTS (PathsFTS, rowid, path) VALUES ('delete', old.path_id, old.path);
+                        INSERT INTO PathsFTS (rowid, path) VALUES (new.path_id, new.path);
+                    END;""")
+    if not exists:
+        conn.execute("INSERT INTO PathsFTS (PathsFTS) VALUES ('rebuild');")
+
+def rebuild_path_search_index(db_path):
     """
+    Rebuilds PathsFTS from the Paths table, e.g. after Paths was edited with triggers disabled.
 
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    """
+    with _open(db_path) as conn, _transaction(conn):
+        create_path_search_index(conn)
+        conn.execute("INSERT INTO PathsFTS (PathsFTS) VALUES ('rebuild');")
+
+def migrate_database(db_path):
+    """
+    Adds the query indexes, the path search index, the ArchiveSummary counts and the
+    ArchiveEvents history to an existing database. Every step is skipped if already done, so
+    this is safe to run on every ingest. A step that fails because the database is locked is
+    retried by the next call; SQLite builds without FTS5 trigram support simply keep using LIKE.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :return: True if the database is up to date.
+    """
+    key = _db_key(db_path)
+    complete = True
+    with _open(db_path) as conn:
+        for step in (create_query_indexes, create_path_search_index, create_archive_summary, create_archive_events):
+            try:
+                with _transaction(conn):
+                    step(conn)
+            except sqlite3.OperationalError as e:
+                print(f"Could not run {step.__name__}: {e}")
+                if _is_locked_error(e):
+                    complete = False
+    if complete:
+        _migrated_databases.add(key)
+    return complete
+
+def _ensure_migrated(db_path):
+    """Runs migrate_database before the first write to a database in this process."""
+    if _db_key(db_path) not in _migrated_databases:
+        migrate_database(db_path)
+
+def _has_search_index(conn, db_path):
+    """
+    Returns True if PathsFTS exists and can be used for path searches. Only a positive answer
+    is remembered, so an index added later by migrate_database is picked up.
+    """
+    key = _db_key(db_path)
+    if key in _indexed_databases:
+        return True
     try:
-        cursor.execute(query)
-        paths = [row[0] for row in cursor.fetchall()]
-        return paths
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
+        found = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'PathsFTS'").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+    if found:
+        _indexed_databases.add(key)
+    return found
+
+def fts_phrase(text):
+    """
+    Quotes text as an FTS5 phrase, so it is matched as a literal substring by the trigram index.
+
+    :param text: The literal text.
+    :return: The quoted phrase.
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+# Digits consumed by the numeric escapes of a regular expression, and at most how many
+_DECIMAL_DIGITS = '0123456789'
+_HEX_DIGITS = '0123456789abcdefABCDEF'
+_ESCAPE_DIGITS = {'x': (_HEX_DIGITS, 2), 'u': (_HEX_DIGITS, 4), 'U': (_HEX_DIGITS, 8)}
+
+def _character_class_end(pattern, start):
+    """
+    Returns the index just past the character class opening at pattern[start]. Escaped
+    characters such as \\] and a ']' straight after '[' or '[^' belong to the class.
+    """
+    i = start + 1
+    if pattern.startswith('^', i):
+        i += 1
+    if pattern.startswith(']', i):
+        i += 1
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            i += 2
+        elif pattern[i] == ']':
+            return i + 1
+        else:
+            i += 1
+    return len(pattern)
+
+def regex_literals(pattern, min_length=_TRIGRAM_LENGTH):
+    """
+    Extracts runs of literal characters that every match of a regular expression must contain.
+
+    Only simple patterns are analysed: anything with alternation, groups or inline flags
+    returns no literals. Character classes, wildcards and anchors split runs, and a character
+    followed by an optional quantifier is dropped. The result can be used to prefilter
+    candidates before the regex itself is applied.
+
+    :param pattern: The regular expression.
+    :param min_length: Shortest run worth returning.
+    :return: A list of literal strings.
+    """
+    if any(char in pattern for char in '|()'):
         return []
-    finally:
-        conn.close()
 
-def get_paths_by_archive_status(db_path, archive_criteria):
+    runs, run = [], ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped.isalnum():
+                # A character class such as \d, an anchor such as \b, or an escape whose digits
+                # must not be read as literal text: \x41, \u00e9, \U0001f600, \N{...}, \101 or \1
+                runs.append(run)
+                run = ''
+                if escaped == 'N' and pattern.startswith('{', i):
+                    i = pattern.find('}', i) + 1 or len(pattern)
+                else:
+                    # Octal escapes and backreferences take up to two more digits
+                    digits, max_digits = _ESCAPE_DIGITS.get(escaped, (_DECIMAL_DIGITS, 2 if escaped.isdigit() else 0))
+                    end = i
+                    while end < len(pattern) and end - i < max_digits and pattern[end] in digits:
+                        end += 1
+                    i = end
+            else:
+                run += escaped
+            continue
+        if char in '?*{':
+            # The previous character may be absent
+            runs.append(run[:-1])
+            run = ''
+            if char == '{':
+                i = pattern.find('}', i) + 1 or len(pattern)
+                continue
+        elif char in '.^$+[':
+            # The run ends here; with '+' the previous character is still required once
+            runs.append(run)
+            run = ''
+            if char == '[':
+                i = _character_class_end(pattern, i)
+                continue
+        else:
+            run += char
+        i += 1
+    runs.append(run)
+    return [run for run in runs if len(run) >= min_length]
+
+def escape_like(text, escape='\\'):
     """
-    Generate a list of paths based on specified archive types and statuses.
+    Escapes the LIKE wildcards in text so it matches literally, for use with ESCAPE '\\'.
 
-    :param db_path: Path to the SQLite database file.
-    :param archive_criteria: A dictionary mapping archive types to their desired statuses.
-                             Example: {'aws': 'complete', 'dsmc': 'complete'}
-    :return: A list of paths meeting the criteria.
+    :param text: The literal text.
+    :param escape: The escape character named in the ESCAPE clause.
+    :return: The escaped text.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    return text.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
 
-    # Base query to select paths that meet the specified archive criteria
-    base_query = """
-    SELECT DISTINCT p.path
-    FROM Paths p
-    WHERE p.is_removed = 0
+def build_paths_query(archive_criteria, subpath=None, regex=None, search_index=False):
     """
-    
-    # Dynamically build the EXISTS subquery for each archive type/status pair
-    subqueries = []
-    for archive_type, status in archive_criteria.items():
-        subquery = f"""
-        AND EXISTS (
-            SELECT 1 FROM Archives a 
-            WHERE a.path_id = p.path_id 
-            AND a.archive_type = '{archive_type}' 
-            AND a.archive_status = '{status}'
-        )
-        """
-        subqueries.append(subquery)
+    Builds the SQL and bound parameters selecting the non-removed paths that meet all the
+    archive criteria.
+
+    The criteria are matched with a single join against Archives: a path qualifies when the
+    number of its Archives rows matching any (archive_type, archive_status) pair equals the
+    number of pairs. Archives holds one row per path and archive type, so that means every
+    pair matched. The SQL text depends only on the number of criteria and which filters are
+    used, so SQLite's statement cache can reuse it across calls.
+
+    With search_index, candidate paths for a subpath of three or more characters, or for a
+    regex containing such literal runs, are first looked up in the PathsFTS trigram index;
+    LIKE and REGEXP then only check those candidates.
+
+    :param archive_criteria: A dictionary mapping archive types to their desired statuses.
+    :param subpath: Optional string the path must contain (matched literally, case-insensitively for ASCII).
+    :param regex: Optional regular expression the path must match (requires the REGEXP function).
+    :param search_index: Use the PathsFTS trigram index (see create_path_search_index).
+    :return: A tuple of (sql, params).
+    """
+    params = []
+    if archive_criteria:
+        sql = "SELECT p.path FROM Paths p JOIN Archives a ON a.path_id = p.path_id WHERE p.is_removed = 0"
+        sql += " AND (" + " OR ".join(["(a.archive_type = ? AND a.archive_status = ?)"] * len(archive_criteria)) + ")"
+        for archive_type, status in archive_criteria.items():
+            params.extend([archive_type, status])
+    else:
+        sql = "SELECT p.path FROM Paths p WHERE p.is_removed = 0"
+
+    if search_index:
+        literals = []
+        if subpath and len(subpath) >= _TRIGRAM_LENGTH:
+            literals.append(subpath)
+        if regex:
+            literals.extend(regex_literals(regex))
+        if literals:
+            sql += " AND p.path_id IN (SELECT rowid FROM PathsFTS WHERE PathsFTS MATCH ?)"
+            params.append(" AND ".join(fts_phrase(literal) for literal in literals))
 
-    # Combine the base query with all subqueries
-    final_query = base_query + " ".join(subqueries) + ";"
+    if subpath:
+        sql += " AND p.path LIKE ? ESCAPE '\\'"
+        params.append(f"%{escape_like(subpath)}%")
+
+    if regex:
+        sql += " AND p.path REGEXP ?"
+        params.append(regex)
 
+    if archive_criteria:
+        sql += " GROUP BY p.path_id HAVING COUNT(*) = ?"
+        params.append(len(archive_criteria))
+
+    return sql + ";", params
+
+def query_paths_by_archive_status(db_path, archive_criteria, subpath=None, regex=None):
+    """
+    Generate a list of non-removed paths based on specified archive types and statuses,
+    optionally filtered by a substring and/or a regular expression.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_criteria: A dictionary mapping archive types to their desired statuses.
+                             Example: {'aws': 'complete', 'dsmc': 'complete'}
+    :param subpath: Optional string for filtering paths that contain this substring.
+    :param regex: Optional regular expression string for filtering paths.
+    :return: A list of paths meeting the criteria.
+    """
     try:
-        cursor.execute(final_query)
-        paths = [row[0] for row in cursor.fetchall()]
-        return paths
+        with _open(db_path) as conn:
+            search_index = _has_search_index(conn, db_path)
+            sql, params = build_paths_query(archive_criteria, subpath=subpath, regex=regex, search_index=search_index)
+            if regex:
+                conn.create_function("REGEXP", 2, regexp, deterministic=True)
+            return [row[0] for row in conn.execute(sql, params)]
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        conn.close()
 
-def get_paths_by_archive_status_and_subpath(db_path, archive_criteria, subpath=None):
+def get_paths_by_archive_status(db_path, archive_criteria):
     """
-    Generate a list of paths based on specified archive types, statuses, and an optional substring of the path.
+    Generate a list of paths based on specified archive types and statuses.
 
-    :param db_path: Path to the SQLite database file.
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :param archive_criteria: A dictionary mapping archive types to their desired statuses.
                              Example: {'aws': 'complete', 'dsmc': 'complete'}
-    :param subpath: Optional string for filtering paths that contain this substring.
     :return: A list of paths meeting the criteria.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    return query_paths_by_archive_status(db_path, archive_criteria)
 
-    # Base query to select paths that meet the specified archive criteria
-    base_query = """
-    SELECT DISTINCT p.path
-    FROM Paths p
-    WHERE p.is_removed = 0
+def get_paths_by_archive_status_and_subpath(db_path, archive_criteria, subpath=None):
     """
-    
-    # Filter by subpath if provided
-    if subpath:
-        base_query += f" AND p.path LIKE '%{subpath}%'"
-    
-    # Dynamically build the EXISTS subquery for each archive type/status pair
-    subqueries = []
-    for archive_type, status in archive_criteria.items():
-        subquery = f"""
-        AND EXISTS (
-            SELECT 1 FROM Archives a 
-            WHERE a.path_id = p.path_id 
-            AND a.archive_type = '{archive_type}' 
-            AND a.archive_status = '{status}'
-        )
-        """
-        subqueries.append(subquery)
+    Generate a list of paths based on specified archive types, statuses, and an optional substring of the path.
 
-    # Combine the base query with all subqueries
-    final_query = base_query + " ".join(subqueries) + ";"
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_criteria: A dictionary mapping archive types to their desired statuses.
+                             Example: {'aws': 'complete', 'dsmc': 'complete'}
+    :param subpath: Optional string for filtering paths that contain this substring.
+    :return: A list of paths meeting the criteria.
+    """
+    return query_paths_by_archive_status(db_path, archive_criteria, subpath=subpath)
 
-    try:
-        cursor.execute(final_query)
-        paths = [row[0] for row in cursor.fetchall()]
-        return paths
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
-    finally:
-        conn.close()
+@lru_cache(maxsize=256)
+def _compile_regex(expr):
+    return re.compile(expr)
 
 def regexp(expr, item):
     """
     Define a function to be used with SQLite's REGEXP operator.
+    Compiled patterns are cached, so a query compiles its pattern once rather than once per row.
     
     :param expr: Regular expression pattern.
     :param item: String to test against the regular expression.
     :return: True if there is a match, else False.
     """
-    reg = re.compile(expr)
-    return reg.search(item) is not None
+    if item is None:
+        return False
+    return _compile_regex(expr).search(item) is not None
 
 def get_paths_by_archive_status_and_regex(db_path, archive_criteria, regex=None):
     """
     Generate a list of paths based on specified archive types, statuses, and an optional regex for the path.
 
-    :param db_path: Path to the SQLite database file.
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :param archive_criteria: A dictionary mapping archive types to their desired statuses.
     :param regex: Optional regular expression string for filtering paths.
     :return: A list of paths meeting the criteria.
     """
-    conn = sqlite3.connect(db_path)
-    conn.create_function("REGEXP", 2, regexp)  # Register the custom REGEXP function
-    cursor = conn.cursor()
+    return query_paths_by_archive_status(db_path, archive_criteria, regex=regex)
 
-    base_query = """
-    SELECT DISTINCT p.path
-    FROM Paths p
-    WHERE p.is_removed = 0
+def set_path_statuses(db_path, updates=None, path_pattern=None, archive_type=None, status=None):
     """
-
-    if regex:
-        base_query += f" AND p.path REGEXP '{regex}'"
-    
-    subqueries = []
-    for archive_type, status in archive_criteria.items():
-        subquery = f"""
-        AND EXISTS (
-            SELECT 1 FROM Archives a
-            WHERE a.path_id = p.path_id
-            AND a.archive_type = '{archive_type}'
-            AND a.archive_status = '{status}'
-        )
-        """
-        subqueries.append(subquery)
-
-    final_query = base_query + " ".join(subqueries) + ";"
-
-    try:
-        cursor.execute(final_query)
-        paths = [row[0] for row in cursor.fetchall()]
-        return paths
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
-    finally:
-        conn.close()
+    Sets the archive status of many paths in one transaction.
+
+    Either give updates, an iterable of (path, archive_type, status) tuples, or a path_pattern
+    (SQLite LIKE syntax) together with archive_type and status to set that status on every
+    matching path that has an archive record of that type. The requested changes are staged
+    in a temporary table and applied with a single UPDATE joining it against Archives. When
+    the same path and archive type appear more than once in updates, the last one wins.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param updates: Optional iterable of (path, archive_type, status) tuples.
+    :param path_pattern: Optional LIKE pattern selecting the paths, e.g. '%/240101_%'.
+    :param archive_type: The archive type to update when using path_pattern.
+    :param status: The status to set when using path_pattern.
+    :return: A DataFrame with the path, archive_type, status and outcome of every requested
+             change; outcome is 'updated', 'superseded', 'no archive record' or 'path not found'.
+    """
+    if (updates is None) == (path_pattern is None):
+        raise ValueError("Give either updates or path_pattern.")
+    if path_pattern is not None and (archive_type is None or status is None):
+        raise ValueError("path_pattern needs an archive_type and a status.")
+
+    _ensure_migrated(db_path)
+    with _open(db_path) as conn, _transaction(conn):
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS StagedStatuses (
+                seq INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                archive_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                path_id INTEGER,
+                outcome TEXT
+            )""")
+        conn.execute("DELETE FROM StagedStatuses")
+
+        if updates is not None:
+            conn.executemany("INSERT INTO StagedStatuses (path, archive_type, status) VALUES (?, ?, ?)", updates)
+            if _HAS_UPDATE_FROM:
+                conn.execute("""
+                    UPDATE StagedStatuses SET path_id = p.path_id
+                    FROM Paths p WHERE p.path = StagedStatuses.path;
+                    """)
+            else:
+                conn.execute("""
+                    UPDATE StagedStatuses SET path_id = (SELECT p.path_id FROM Paths p WHERE p.path = StagedStatuses.path);
+                    """)
+        else:
+            conn.execute("""
+                INSERT INTO StagedStatuses (path, archive_type, status, path_id)
+                SELECT p.path, a.archive_type, ?, p.path_id
+                FROM Paths p
+                JOIN Archives a ON a.path_id = p.path_id
+                WHERE a.archive_type = ? AND p.path LIKE ?;
+                """, (status, archive_type, path_pattern))
+
+        # Only the last request for each path and archive type is applied
+        conn.execute("""
+            UPDATE StagedStatuses SET outcome = 'superseded'
+            WHERE seq NOT IN (SELECT MAX(seq) FROM StagedStatuses GROUP BY path_id, archive_type)
+                AND path_id IS NOT NULL;
+            """)
+        if _HAS_RETURNING:
+            updated = {row for row in conn.execute("""
+                UPDATE Archives
+                SET archive_status = s.status, last_updated = datetime('now')
+                FROM StagedStatuses s
+                WHERE Archives.path_id = s.path_id AND Archives.archive_type = s.archive_type
+                    AND s.outcome IS NULL
+                RETURNING Archives.path_id, Archives.archive_type;
+                """)}
+        else:
+            # The rows to change are read first, in the same transaction as the UPDATE
+            updated = {row for row in conn.execute("""
+                SELECT a.path_id, a.archive_type
+                FROM Archives a
+                JOIN StagedStatuses s ON s.path_id = a.path_id AND s.archive_type = a.archive_type
+                WHERE s.outcome IS NULL;
+                """)}
+            conn.execute("""
+                UPDATE Archives
+                SET archive_status = (SELECT s.status FROM StagedStatuses s
+                                      WHERE s.path_id = Archives.path_id AND s.archive_type = Archives.archive_type
+                                          AND s.outcome IS NULL),
+                    last_updated = datetime('now')
+                WHERE EXISTS (SELECT 1 FROM StagedStatuses s
+                              WHERE s.path_id = Archives.path_id AND s.archive_type = Archives.archive_type
+                                  AND s.outcome IS NULL);
+                """)
+
+        outcomes = []
+        for seq, path, row_type, row_status, path_id, outcome in conn.execute(
+                "SELECT seq, path, archive_type, status, path_id, outcome FROM StagedStatuses ORDER BY seq"):
+            if outcome is None:
+                if path_id is None:
+                    outcome = 'path not found'
+                elif (path_id, row_type) in updated:
+                    outcome = 'updated'
+                else:
+                    outcome = 'no archive record'
+            outcomes.append((path, row_type, row_status, outcome))
+        conn.execute("DELETE FROM StagedStatuses")
+
+    return pd.DataFrame(outcomes, columns=['path', 'archive_type', 'status', 'outcome'])
 
 def set_path_status(db_path, path, archive_type, status):
     """
     Sets the archive status of a given path for a specified archive_type to the provided status.
+    Use set_path_statuses to change many paths at once.
 
-    :param db_path: Path to the SQLite database file.
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
     :param path: The path whose status needs to be updated.
     :param archive_type: The type of archive ('aws', 'dsmc', etc.) whose status is to be updated.
     :param status: The new status to set for the path ('complete', 'pending', etc.).
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     try:
-        # Find the path_id from the Paths table
-        cursor.execute("SELECT path_id FROM Paths WHERE path = ?", (path,))
-        result = cursor.fetchone()
-
-        if result:
-            path_id = result[0]
-
-            # Update the Archives table to set the status to the provided value
-            cursor.execute("""
-                UPDATE Archives
-                SET archive_status = ?, last_updated = datetime('now')
-                WHERE path_id = ? AND archive_type = ?
-            """, (status, path_id, archive_type))
-
-            # Check if the update was successful
-            if cursor.rowcount == 0:
-                print(f"No existing record found for {path} with archive_type '{archive_type}'.")
-            else:
-                print(f"Archive status set to '{status}' for {path} with archive_type '{archive_type}'.")
-
-        else:
-            print(f"Path not found: {path}")
-
-        conn.commit()
+        outcome = set_path_statuses(db_path, [(path, archive_type, status)])['outcome'].iloc[0]
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-    finally:
-        conn.close()
+        return
 
-def fetch_filtered_paths_and_archives(db_path, path_pattern=None, archive_type=None, archive_status=None):
+    if outcome == 'path not found':
+        print(f"Path not found: {path}")
+    elif outcome == 'no archive record':
+        print(f"No existing record found for {path} with archive_type '{archive_type}'.")
+    else:
+        print(f"Archive status set to '{status}' for {path} with archive_type '{archive_type}'.")
+
+def _filtered_paths_query(conn, db_path, path_pattern=None, archive_type=None, archive_status=None):
+    """Builds the SQL and parameters of fetch_filtered_paths_and_archives."""
     sql_query = """
     SELECT
         p.path,
@@ -596,24 +1239,671 @@ def fetch_filtered_paths_and_archives(db_path, path_pattern=None, archive_type=N
     params = []
     conditions = []
 
+    search_index = _has_search_index(conn, db_path)
+
     if archive_type:
         conditions.append("a.archive_type = ?")
         params.append(archive_type)
-    
+
     if archive_status:
         conditions.append("a.archive_status = ?")
         params.append(archive_status)
-    
+
     if path_pattern:
+        # The literal runs between LIKE wildcards narrow the candidates through the trigram index
+        literals = [literal for literal in re.split(r'[%_]', path_pattern) if len(literal) >= _TRIGRAM_LENGTH]
+        if search_index and literals:
+            conditions.append("p.path_id IN (SELECT rowid FROM PathsFTS WHERE PathsFTS MATCH ?)")
+            params.append(" AND ".join(fts_phrase(literal) for literal in literals))
         conditions.append("p.path LIKE ?")
         params.append(path_pattern)  # For simple patterns, use SQLite's LIKE syntax
-    
+
     if conditions:
         sql_query += " WHERE " + " AND ".join(conditions)
 
-    conn = sqlite3.connect(db_path)
-    try:
+    return sql_query, params
+
+def fetch_filtered_paths_and_archives(db_path, path_pattern=None, archive_type=None, archive_status=None):
+    with _open(db_path) as conn:
+        sql_query, params = _filtered_paths_query(conn, db_path, path_pattern, archive_type, archive_status)
         df = pd.read_sql_query(sql_query, conn, params=params)
         return df
-    finally:
-        conn.close()
\ No newline at end of file
+
+# The iterators read this many rows from SQLite at a time
+FETCH_BATCH_ROWS = 50000
+
+PATHS_AND_ARCHIVES_COLUMNS = ['path', 'path_type', 'created_at', 'modified_at', 'is_removed',
+                              'archive_type', 'archive_status', 'last_updated']
+PATH_DETAIL_COLUMNS = ['path', 'path_type', 'age', 'archive_type', 'archive_status', 'is_removed']
+
+# Low-cardinality text columns, stored as pandas categories and Arrow dictionaries
+CATEGORICAL_COLUMNS = ['path_type', 'archive_type', 'archive_status']
+
+def _iter_rows(conn, sql, params, batch_rows):
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            return
+        yield rows
+
+def _iter_frames(db_path, query, columns, batch_rows):
+    """
+    Yields the rows of a query as DataFrames of at most batch_rows rows. query is called with
+    the connection and returns the SQL and its parameters.
+
+    Categorical columns share one CategoricalDtype across batches. Its categories only grow as
+    new values turn up, so every batch is a valid instance of the last batch's dtype.
+    """
+    dtypes = {column: pd.CategoricalDtype([]) for column in CATEGORICAL_COLUMNS if column in columns}
+    with _open(db_path) as conn:
+        sql, params = query(conn)
+        for rows in _iter_rows(conn, sql, params, batch_rows):
+            frame = pd.DataFrame.from_records(rows, columns=columns)
+            for column, dtype in dtypes.items():
+                new_values = set(frame[column].dropna().unique()) - set(dtype.categories)
+                if new_values:
+                    dtype = dtypes[column] = pd.CategoricalDtype(list(dtype.categories) + sorted(new_values))
+                frame[column] = frame[column].astype(dtype)
+            yield frame
+
+def _concat_batches(batches, columns):
+    """Concatenates the DataFrames from _iter_frames, keeping the categorical columns categorical."""
+    batches = list(batches)
+    if not batches:
+        return pd.DataFrame(columns=columns)
+    last = batches[-1]
+    dtypes = {column: last[column].dtype for column in CATEGORICAL_COLUMNS if column in last.columns}
+    return pd.concat([batch.astype(dtypes) for batch in batches], ignore_index=True)
+
+def iter_paths_and_archives(db_path, path_pattern=None, archive_type=None, archive_status=None,
+                            batch_rows=FETCH_BATCH_ROWS):
+    """
+    Yields the rows of fetch_filtered_paths_and_archives as DataFrames of at most batch_rows
+    rows, so the whole catalog can be processed without holding it in memory.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param path_pattern: Optional LIKE pattern the path must match.
+    :param archive_type: Optional archive type to select.
+    :param archive_status: Optional archive status to select.
+    :param batch_rows: Maximum number of rows per DataFrame.
+    :return: An iterator of DataFrames; path_type, archive_type and archive_status are categorical.
+    """
+    def query(conn):
+        return _filtered_paths_query(conn, db_path, path_pattern, archive_type, archive_status)
+    return _iter_frames(db_path, query, PATHS_AND_ARCHIVES_COLUMNS, batch_rows)
+
+def iter_paths_details(db_path, batch_rows=FETCH_BATCH_ROWS):
+    """
+    Yields the rows of load_paths_details as DataFrames of at most batch_rows rows.
+
+    The age in days (from the modification date for files and the creation date for
+    directories, like the julianday difference load_paths_details used to compute in SQL) is
+    computed per batch with vectorized pandas operations.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param batch_rows: Maximum number of rows per DataFrame.
+    :return: An iterator of DataFrames; path_type, archive_type and archive_status are categorical.
+    """
+    sql = """
+    SELECT p.path, p.path_type, p.created_at, p.modified_at, a.archive_type, a.archive_status, p.is_removed
+    FROM Paths p
+    JOIN Archives a ON p.path_id = a.path_id;
+    """
+    columns = ['path', 'path_type', 'created_at', 'modified_at', 'archive_type', 'archive_status', 'is_removed']
+    for frame in _iter_frames(db_path, lambda conn: (sql, ()), columns, batch_rows):
+        # julianday('now') is UTC
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        dates = frame['modified_at'].where(frame['path_type'] == 'file', frame['created_at'])
+        age = (now - pd.to_datetime(dates, format='mixed', errors='coerce')) / pd.Timedelta(days=1)
+        frame['age'] = age.round()
+        yield frame[PATH_DETAIL_COLUMNS]
+
+def iter_paths_and_archives_record_batches(db_path, path_pattern=None, archive_type=None, archive_status=None,
+                                           batch_rows=FETCH_BATCH_ROWS):
+    """
+    Yields the rows of fetch_filtered_paths_and_archives as pyarrow RecordBatches, built
+    straight from the SQLite rows without going through pandas. path_type, archive_type and
+    archive_status are dictionary-encoded. Requires pyarrow.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param path_pattern: Optional LIKE pattern the path must match.
+    :param archive_type: Optional archive type to select.
+    :param archive_status: Optional archive status to select.
+    :param batch_rows: Maximum number of rows per batch.
+    :return: An iterator of pyarrow.RecordBatch with the paths_and_archives_schema() schema.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow and Parquet export.")
+
+    schema = paths_and_archives_schema()
+    with _open(db_path) as conn:
+        sql, params = _filtered_paths_query(conn, db_path, path_pattern, archive_type, archive_status)
+        for rows in _iter_rows(conn, sql, params, batch_rows):
+            arrays = []
+            for field, values in zip(schema, zip(*rows)):
+                if pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def paths_and_archives_schema():
+    """
+    Returns the Arrow schema of iter_paths_and_archives_record_batches. Requires pyarrow.
+
+    :return: A pyarrow.Schema.
+    """
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([('path', pa.string()), ('path_type', category), ('created_at', pa.string()),
+                      ('modified_at', pa.string()), ('is_removed', pa.int64()), ('archive_type', category),
+                      ('archive_status', category), ('last_updated', pa.string())])
+
+def export_paths_and_archives_parquet(db_path, output_path, path_pattern=None, archive_type=None,
+                                      archive_status=None, batch_rows=FETCH_BATCH_ROWS):
+    """
+    Writes the rows of fetch_filtered_paths_and_archives to a Parquet file, one row group per
+    batch, holding only one batch in memory at a time. Requires pyarrow.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param output_path: The Parquet file to write.
+    :param path_pattern: Optional LIKE pattern the path must match.
+    :param archive_type: Optional archive type to select.
+    :param archive_status: Optional archive status to select.
+    :param batch_rows: Maximum number of rows per row group.
+    :return: The number of rows written.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow and Parquet export.")
+
+    rows = 0
+    with pq.ParquetWriter(output_path, paths_and_archives_schema()) as writer:
+        for batch in iter_paths_and_archives_record_batches(db_path, path_pattern, archive_type, archive_status,
+                                                            batch_rows=batch_rows):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+def search_paths(db_path, text, include_removed=False):
+    """
+    Returns the paths containing text, e.g. a flowcell ID or pool name.
+
+    Searches of three or more characters are answered from the PathsFTS trigram index;
+    shorter ones fall back to LIKE. Matching is case-insensitive.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param text: The substring to search for.
+    :param include_removed: Also return paths marked as removed.
+    :return: A list of matching paths.
+    """
+    with _open(db_path) as conn:
+        search_index = _has_search_index(conn, db_path)
+        removed_filter = "" if include_removed else " AND p.is_removed = 0"
+        if search_index and len(text) >= _TRIGRAM_LENGTH:
+            sql = ("SELECT p.path FROM PathsFTS f JOIN Paths p ON p.path_id = f.rowid "
+                   "WHERE PathsFTS MATCH ? AND p.path LIKE ? ESCAPE '\\'" + removed_filter)
+            params = (fts_phrase(text), f"%{escape_like(text)}%")
+        else:
+            sql = "SELECT p.path FROM Paths p WHERE p.path LIKE ? ESCAPE '\\'" + removed_filter
+            params = (f"%{escape_like(text)}%",)
+        return [row[0] for row in conn.execute(sql, params)]
+
+# Sizes are written to PathSizes this many paths per transaction
+SIZE_BATCH_ROWS = 500
+
+def create_path_sizes_table(conn):
+    """
+    Creates the PathSizes table holding the on-disk size of each path, if it does not exist.
+
+    :param conn: An open connection to the archives database.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS PathSizes (
+                        path_id INTEGER PRIMARY KEY,
+                        apparent_bytes INTEGER NOT NULL,
+                        allocated_bytes INTEGER NOT NULL,
+                        file_count INTEGER NOT NULL,
+                        directory_count INTEGER NOT NULL,
+                        error_count INTEGER NOT NULL,
+                        scanned_at DATETIME NOT NULL,
+                        FOREIGN KEY (path_id) REFERENCES Paths(path_id) ON DELETE CASCADE
+                    );""")
+
+def measure_path_size(root):
+    """
+    Measures the space taken by a file or a directory tree, like du does.
+
+    Directories are walked with os.scandir without following symlinks. Apparent bytes are
+    the entry sizes; allocated bytes are the blocks actually used (st_blocks * 512). Both
+    include the directories themselves, as du does. A file with several hard links inside
+    the tree is only counted once. Entries that cannot be read are counted in error_count
+    and skipped.
+
+    :param root: The file or directory to measure.
+    :return: A tuple of (apparent_bytes, allocated_bytes, file_count, directory_count, error_count),
+             or None if root does not exist.
+    """
+    try:
+        st = os.lstat(root)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_size, st.st_blocks * 512, 1, 0, 0
+
+    apparent, allocated = st.st_size, st.st_blocks * 512
+    files = errors = 0
+    directories = 1
+    seen_inodes = set()
+    pending = [root]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as scan:
+                for entry in scan:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        errors += 1
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+                        directories += 1
+                    elif st.st_nlink > 1:
+                        inode = (st.st_dev, st.st_ino)
+                        if inode in seen_inodes:
+                            continue
+                        seen_inodes.add(inode)
+                        files += 1
+                    else:
+                        files += 1
+                    apparent += st.st_size
+                    allocated += st.st_blocks * 512
+        except OSError:
+            errors += 1
+    return apparent, allocated, files, directories, errors
+
+def _write_path_sizes(conn, rows):
+    with _transaction(conn):
+        conn.executemany("""
+            INSERT INTO PathSizes (path_id, apparent_bytes, allocated_bytes, file_count,
+                                   directory_count, error_count, scanned_at)
+            SELECT path_id, ?, ?, ?, ?, ?, ? FROM Paths WHERE path = ?
+            ON CONFLICT(path_id) DO UPDATE SET
+                apparent_bytes=excluded.apparent_bytes,
+                allocated_bytes=excluded.allocated_bytes,
+                file_count=excluded.file_count,
+                directory_count=excluded.directory_count,
+                error_count=excluded.error_count,
+                scanned_at=excluded.scanned_at;
+            """, rows)
+
+def update_path_sizes(db_path, paths=None, max_workers=16, batch_rows=SIZE_BATCH_ROWS, verbose=False):
+    """
+    Measures the registered paths and stores their sizes in the PathSizes table.
+
+    Each path is walked by measure_path_size on a pool of max_workers threads, so several run
+    folders are scanned at once without starting one thread per folder. Results are written
+    in the order the scans finish, batch_rows paths per transaction, so one slow tree does not
+    hold back the others and an interrupted scan keeps what it has measured. Paths that no
+    longer exist are skipped and keep their previous size; paths not in the Paths table are
+    skipped without being measured.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param paths: The paths to measure. Defaults to every path not marked as removed.
+    :param max_workers: Number of paths scanned at once.
+    :param batch_rows: Number of paths written per transaction.
+    :param verbose: Print a line for every path.
+    :return: A dictionary with the number of paths measured (and stored), missing and not
+             registered, and the bytes stored.
+    """
+    totals = {'measured': 0, 'missing': 0, 'unregistered': 0, 'apparent_bytes': 0, 'allocated_bytes': 0}
+
+    def write(batch):
+        # Only counted once stored, so the totals match what PathSizes holds
+        _write_path_sizes(conn, batch)
+        totals['measured'] += len(batch)
+        totals['apparent_bytes'] += sum(row[0] for row in batch)
+        totals['allocated_bytes'] += sum(row[1] for row in batch)
+
+    with _open(db_path) as conn:
+        create_path_sizes_table(conn)
+        if paths is None:
+            paths = [row[0] for row in conn.execute("SELECT path FROM Paths WHERE is_removed = 0")]
+        else:
+            requested = list(dict.fromkeys(paths))
+            registered = set()
+            for start in range(0, len(requested), SIZE_BATCH_ROWS):
+                chunk = requested[start:start + SIZE_BATCH_ROWS]
+                registered.update(row[0] for row in conn.execute(
+                    f"SELECT path FROM Paths WHERE path IN ({', '.join('?' * len(chunk))})", chunk))
+            paths = [path for path in requested if path in registered]
+            totals['unregistered'] = len(requested) - len(paths)
+            if verbose:
+                for path in requested:
+                    if path not in registered:
+                        print(f"Not registered: {path}")
+
+        batch = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(measure_path_size, path): path for path in paths}
+            for future in as_completed(futures):
+                path, size = futures[future], future.result()
+                if size is None:
+                    totals['missing'] += 1
+                    if verbose:
+                        print(f"Missing: {path}")
+                    continue
+                apparent, allocated, files, directories, errors = size
+                if verbose:
+                    print(f"Measured: {path}, Apparent: {apparent}, Allocated: {allocated}, Files: {files}")
+                batch.append((*size, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), path))
+                if len(batch) >= batch_rows:
+                    write(batch)
+                    batch = []
+        if batch:
+            write(batch)
+
+    return totals
+
+def get_reclaimable_space(db_path, archive_criteria=None):
+    """
+    Sums the measured sizes of the non-removed paths meeting the archive criteria, i.e. the
+    space freed by deleting them.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_criteria: A dictionary mapping archive types to their desired statuses.
+                             Defaults to {'aws': 'complete', 'dsmc': 'complete'}.
+    :return: A dictionary with the number of eligible paths, how many of them have been
+             measured, and their total apparent bytes, allocated bytes and file count.
+    """
+    if archive_criteria is None:
+        archive_criteria = {'aws': 'complete', 'dsmc': 'complete'}
+    eligible_sql, params = build_paths_query(archive_criteria)
+
+    with _open(db_path) as conn:
+        create_path_sizes_table(conn)
+        row = conn.execute(f"""
+            WITH eligible(path) AS ({eligible_sql.rstrip(';')})
+            SELECT COUNT(*),
+                   COUNT(s.path_id),
+                   COALESCE(SUM(s.apparent_bytes), 0),
+                   COALESCE(SUM(s.allocated_bytes), 0),
+                   COALESCE(SUM(s.file_count), 0)
+            FROM eligible e
+            JOIN Paths p ON p.path = e.path
+            LEFT JOIN PathSizes s ON s.path_id = p.path_id;
+            """, params).fetchone()
+
+    return dict(zip(('paths', 'measured_paths', 'apparent_bytes', 'allocated_bytes', 'file_count'), row))
+
+# The month a path's age counts from: its modification date for files, its creation date for directories
+_SUMMARY_MONTH_SQL = ("COALESCE(strftime('%Y-%m', CASE WHEN {p}.path_type = 'file' "
+                      "THEN {p}.modified_at ELSE {p}.created_at END), '')")
+
+# Upper bounds in months of the age buckets reported by get_archive_summary
+AGE_BUCKETS = [(1, '< 1 month'), (3, '1-3 months'), (6, '3-6 months'), (12, '6-12 months'), (None, '> 1 year')]
+
+def _summary_delta_sql(sign, archives, paths, where):
+    """An upsert adding sign to the ArchiveSummary count of each selected Archives row."""
+    return f"""
+        INSERT INTO ArchiveSummary (archive_type, archive_status, is_removed, month, path_count)
+        SELECT {archives}.archive_type, {archives}.archive_status, {paths}.is_removed,
+               {_SUMMARY_MONTH_SQL.format(p=paths)}, {sign}
+        {where}
+        ON CONFLICT(archive_type, archive_status, is_removed, month) DO UPDATE SET
+            path_count = path_count + excluded.path_count;"""
+
+def create_archive_summary(conn):
+    """
+    Creates ArchiveSummary, the number of paths per archive type, archive status, removal
+    state and age month, kept up to date by triggers on Paths and Archives, and fills it from
+    the existing rows if it is new.
+
+    Counts are keyed by the calendar month a path's age counts from rather than by age, so
+    they never go stale as time passes; get_archive_summary turns months into age buckets.
+
+    :param conn: An open connection to the archives database.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ArchiveSummary'").fetchone()
+    conn.execute("""CREATE TABLE IF NOT EXISTS ArchiveSummary (
+                        archive_type TEXT NOT NULL,
+                        archive_status TEXT NOT NULL,
+                        is_removed BOOLEAN NOT NULL,
+                        month TEXT NOT NULL,
+                        path_count INTEGER NOT NULL,
+                        PRIMARY KEY (archive_type, archive_status, is_removed, month)
+                    ) WITHOUT ROWID;""")
+
+    add_new = _summary_delta_sql(1, 'new', 'p', "FROM Paths p WHERE p.path_id = new.path_id")
+    remove_old = _summary_delta_sql(-1, 'old', 'p', "FROM Paths p WHERE p.path_id = old.path_id")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Archives_summary_insert AFTER INSERT ON Archives BEGIN
+                        {add_new}
+                    END;""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Archives_summary_delete AFTER DELETE ON Archives BEGIN
+                        {remove_old}
+                    END;""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Archives_summary_update
+                    AFTER UPDATE OF path_id, archive_type, archive_status ON Archives
+                    WHEN old.path_id IS NOT new.path_id OR old.archive_type IS NOT new.archive_type
+                        OR old.archive_status IS NOT new.archive_status BEGIN
+                        {remove_old}
+                        {add_new}
+                    END;""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Paths_summary_update
+                    AFTER UPDATE OF path_type, created_at, modified_at, is_removed ON Paths
+                    WHEN old.path_type IS NOT new.path_type OR old.created_at IS NOT new.created_at
+                        OR old.modified_at IS NOT new.modified_at OR old.is_removed IS NOT new.is_removed BEGIN
+                        {_summary_delta_sql(-1, 'a', 'old', "FROM Archives a WHERE a.path_id = old.path_id")}
+                        {_summary_delta_sql(1, 'a', 'new', "FROM Archives a WHERE a.path_id = new.path_id")}
+                    END;""")
+    # Before the delete, while the path's Archives rows can still be joined to it
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Paths_summary_delete BEFORE DELETE ON Paths BEGIN
+                        {_summary_delta_sql(-1, 'a', 'old', "FROM Archives a WHERE a.path_id = old.path_id")}
+                    END;""")
+    if not exists:
+        _fill_archive_summary(conn)
+
+def _fill_archive_summary(conn):
+    conn.execute("DELETE FROM ArchiveSummary")
+    conn.execute(f"""
+        INSERT INTO ArchiveSummary (archive_type, archive_status, is_removed, month, path_count)
+        SELECT a.archive_type, a.archive_status, p.is_removed, {_SUMMARY_MONTH_SQL.format(p='p')}, COUNT(*)
+        FROM Archives a
+        JOIN Paths p ON p.path_id = a.path_id
+        GROUP BY 1, 2, 3, 4;
+        """)
+
+def refresh_archive_summary(db_path):
+    """
+    Recounts ArchiveSummary from Paths and Archives. The triggers keep it current, so this is
+    only a daily consistency pass, e.g. after rows were edited with triggers disabled.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    """
+    with _open(db_path) as conn, _transaction(conn):
+        create_archive_summary(conn)
+        _fill_archive_summary(conn)
+
+def get_archive_summary(db_path, by_age=True, age_buckets=AGE_BUCKETS):
+    """
+    Returns the number of paths per archive type, archive status and removal state, read from
+    ArchiveSummary without touching Paths or Archives. ArchiveSummary is created by
+    migrate_database; without it an empty DataFrame is returned.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param by_age: Also break the counts down by age bucket.
+    :param age_buckets: (upper bound in months or None, label) pairs in increasing order.
+    :return: A DataFrame with archive_type, archive_status, is_removed, age_bucket (if by_age)
+             and path_count columns.
+    """
+    keys = ['archive_type', 'archive_status', 'is_removed']
+    with _open(db_path) as conn:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ArchiveSummary'").fetchone():
+            print("ArchiveSummary not found; run migrate_database to create it.")
+            return pd.DataFrame(columns=keys + (['age_bucket'] if by_age else []) + ['path_count'])
+        summary = pd.read_sql_query("""
+            SELECT archive_type, archive_status, is_removed, month, path_count
+            FROM ArchiveSummary WHERE path_count > 0;
+            """, conn)
+
+    if not by_age:
+        return summary.groupby(keys, as_index=False)['path_count'].sum()
+
+    # Whole months between the month a path's age counts from and the current month
+    today = datetime.now()
+    month = pd.to_datetime(summary['month'], format='%Y-%m', errors='coerce')
+    months_old = (today.year - month.dt.year) * 12 + (today.month - month.dt.month)
+
+    summary['age_bucket'] = 'unknown'
+    lower = None
+    for upper, label in age_buckets:
+        in_bucket = months_old.notna()
+        if lower is not None:
+            in_bucket &= months_old >= lower
+        if upper is not None:
+            in_bucket &= months_old < upper
+        summary.loc[in_bucket, 'age_bucket'] = label
+        lower = upper
+    return summary.groupby(keys + ['age_bucket'], as_index=False)['path_count'].sum()
+
+# ArchiveEvents timestamps, in UTC with milliseconds so events in one run keep their order
+_EVENT_TIMESTAMP_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def create_archive_events(conn):
+    """
+    Creates ArchiveEvents, an append-only history of archive status changes written by
+    triggers on Archives, so each event is recorded in the same transaction as the change.
+
+    It is created by migrate_database, so changes are recorded from the first ingest or status
+    change after an upgrade. A new table is seeded with one event per existing Archives row,
+    flagged as seeded, since the earlier history was not kept. Seeded events are stamped with
+    last_updated, which older ingests wrote in local time rather than UTC, so they are left out
+    of get_archive_throughput and get_time_in_state.
+
+    :param conn: An open connection to the archives database.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ArchiveEvents'").fetchone()
+    conn.execute("""CREATE TABLE IF NOT EXISTS ArchiveEvents (
+                        event_id INTEGER PRIMARY KEY,
+                        path_id INTEGER NOT NULL,
+                        archive_type TEXT NOT NULL,
+                        old_status TEXT,
+                        new_status TEXT NOT NULL,
+                        ts DATETIME NOT NULL,
+                        seeded BOOLEAN NOT NULL DEFAULT FALSE
+                    );""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_events_type_ts ON ArchiveEvents (archive_type, ts);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_events_path ON ArchiveEvents (path_id, archive_type, ts);")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Archives_events_insert AFTER INSERT ON Archives BEGIN
+                        INSERT INTO ArchiveEvents (path_id, archive_type, old_status, new_status, ts)
+                        VALUES (new.path_id, new.archive_type, NULL, new.archive_status, {_EVENT_TIMESTAMP_SQL});
+                    END;""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS Archives_events_update AFTER UPDATE OF archive_status ON Archives
+                    WHEN old.archive_status IS NOT new.archive_status BEGIN
+                        INSERT INTO ArchiveEvents (path_id, archive_type, old_status, new_status, ts)
+                        VALUES (new.path_id, new.archive_type, old.archive_status, new.archive_status,
+                                {_EVENT_TIMESTAMP_SQL});
+                    END;""")
+    if not exists:
+        conn.execute(f"""
+            INSERT INTO ArchiveEvents (path_id, archive_type, old_status, new_status, ts, seeded)
+            SELECT path_id, archive_type, NULL, archive_status,
+                   COALESCE(strftime('%Y-%m-%d %H:%M:%f', last_updated), {_EVENT_TIMESTAMP_SQL}), TRUE
+            FROM Archives;
+            """)
+
+def _has_archive_events(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ArchiveEvents'").fetchone():
+        return True
+    print("ArchiveEvents not found; run migrate_database to start recording archive status changes.")
+    return False
+
+def get_archive_throughput(db_path, archive_type=None, status='complete', since=None):
+    """
+    Counts the paths reaching a status per day, e.g. how many runs dsmc archived each day.
+    Statuses recorded before ArchiveEvents existed (seeded events) are not counted.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_type: Optional archive type to select; all types by default.
+    :param status: The status whose arrivals are counted.
+    :param since: Optional date string ('YYYY-MM-DD'); only events on or after it are counted.
+    :return: A DataFrame with day, archive_type and path_count columns.
+    """
+    conditions = ["new_status = ?", "NOT seeded"]
+    params = [status]
+    if archive_type:
+        conditions.append("archive_type = ?")
+        params.append(archive_type)
+    if since:
+        conditions.append("ts >= ?")
+        params.append(since)
+
+    with _open(db_path) as conn:
+        if not _has_archive_events(conn):
+            return pd.DataFrame(columns=['day', 'archive_type', 'path_count'])
+        return pd.read_sql_query(f"""
+            SELECT date(ts) AS day, archive_type, COUNT(DISTINCT path_id) AS path_count
+            FROM ArchiveEvents
+            WHERE {" AND ".join(conditions)}
+            GROUP BY day, archive_type
+            ORDER BY day, archive_type;
+            """, conn, params=params)
+
+def get_time_in_state(db_path, archive_type=None, percentiles=(0.5, 0.9, 0.99)):
+    """
+    Measures how long paths stay in each archive status before moving on, to find the slow
+    stages of an archive pipeline.
+
+    Each event is paired with the next event of the same path and archive type using LEAD;
+    the time between them is the time spent in the status. Paths still in a status are not
+    counted for it, nor are statuses that started with a seeded event, whose time is unreliable.
+
+    :param db_path: Path to the SQLite database file, or an ArchiveCatalog.
+    :param archive_type: Optional archive type to select; all types by default.
+    :param percentiles: The percentiles to report, as fractions.
+    :return: A DataFrame with archive_type, status, transitions, mean_hours and one pNN_hours
+             column per percentile.
+    """
+    where = "WHERE archive_type = ?" if archive_type else ""
+    params = [archive_type] if archive_type else []
+
+    with _open(db_path) as conn:
+        if not _has_archive_events(conn):
+            durations = pd.DataFrame({'archive_type': [], 'status': [], 'hours': []})
+        else:
+            # Events are ordered by event_id: seeded timestamps may not sort with the trigger ones
+            durations = pd.read_sql_query(f"""
+                SELECT archive_type, status, (julianday(next_ts) - julianday(ts)) * 24 AS hours
+                FROM (
+                    SELECT archive_type, new_status AS status, ts, seeded,
+                           LEAD(ts) OVER (PARTITION BY path_id, archive_type ORDER BY event_id) AS next_ts
+                    FROM ArchiveEvents
+                    {where}
+                )
+                WHERE next_ts IS NOT NULL AND NOT seeded;
+                """, conn, params=params)
+
+    grouped = durations.groupby(['archive_type', 'status'])['hours']
+    summary = grouped.agg(transitions='count', mean_hours='mean')
+    for percentile in percentiles:
+        summary[f"p{percentile * 100:g}_hours"] = grouped.quantile(percentile)
+    return summary.reset_index()
+
+def _catalog_method(function):
+    @wraps(function)
+    def method(self, *args, **kwargs):
+        return function(self, *args, **kwargs)
+    return method
+
+# Every function taking db_path first is also an ArchiveCatalog method bound to the catalog
+for _function in (create_database, list_table_names, get_db_table, load_archived_names,
+                  snapshot_directory, bulk_update_archive_details, reconcile_archive_status,
+                  update_archive_details_from_list,
+                  update_archive_details_in_db, load_paths_details, get_complete_non_removed_paths,
+                  migrate_database, rebuild_path_search_index, query_paths_by_archive_status, get_paths_by_archive_status,
+                  get_paths_by_archive_status_and_subpath, get_paths_by_archive_status_and_regex,
+                  set_path_statuses, set_path_status, fetch_filtered_paths_and_archives, iter_paths_and_archives,
+                  iter_paths_details, iter_paths_and_archives_record_batches, export_paths_and_archives_parquet,
+                  search_paths, update_path_sizes,
+                  get_reclaimable_space, refresh_archive_summary, get_archive_summary, get_archive_throughput,
+                  get_time_in_state):
+    setattr(ArchiveCatalog, _function.__name__, _catalog_method(_function))
+del _function
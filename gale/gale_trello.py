@@ -16,6 +16,8 @@ Example:
 
 import os
 import requests
+import trello_client
+import trello_index
 import sys
 
 # Retrieve API key, token, and board ID from environment variables
@@ -72,7 +74,7 @@ def get_trello_card_comments(card_id, api_key, api_token):
     }
 
     # Make the request to the Trello API
-    response = requests.get(url, params=query)
+    response = trello_client.get(url, params=query)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -131,7 +133,7 @@ def post_comment_to_card(card_id, comment_text, api_key, api_token):
     }
 
     try:
-        response = requests.post(url, params=params)
+        response = trello_client.post(url, params=params)
         response.raise_for_status()  # Raise an exception for non-200 status codes
         print("Comment posted successfully!")
         return True
@@ -161,7 +163,7 @@ def has_comment_with_text(card_id, target_text, api_key, api_token, base_url="ht
   headers = {"Authorization": f"Bearer {api_token}"}
 
   # Send request to get card comments
-  response = requests.get(comments_url, headers=headers)
+  response = trello_client.get(comments_url, headers=headers)
 
   if response.status_code == 200:
     comments_data = response.json()
@@ -189,21 +191,9 @@ def get_card_id(card_name, board_id):
     api_key = os.environ.get('TKEY')
     api_token = os.environ.get('TTOKEN')
 
-    url = f"https://api.trello.com/1/boards/{board_id}/cards"
-    params = {
-        'key': api_key,
-        'token': api_token
-    }
-
+    # Answered from the local index of the board (see trello_index)
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        cards = response.json()
-
-        for card in cards:
-            if card['name'] == card_name:
-                return card['id']
-
+        return trello_index.get_card_id(board_id, card_name, api_key, api_token)
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {str(e)}")
 
@@ -211,23 +201,11 @@ def get_card_id(card_name, board_id):
 
 # Find the ID of the list
 def get_list_id(board_id, list_name):
-    lists_url = f"{BASE_URL}/boards/{board_id}/lists"
-    response = requests.get(lists_url, params={"key": API_KEY, "token": TOKEN})
-    lists = response.json()
-    for l in lists:
-        if l["name"] == list_name:
-            return l["id"]
-    return None
+    return trello_index.get_list_id(board_id, list_name, API_KEY, TOKEN)
 
 # Find the ID of the custom field based on its name
 def get_custom_field_id(board_id, field_name):
-    custom_fields_url = f"{BASE_URL}/boards/{board_id}/customFields"
-    response = requests.get(custom_fields_url, params={"key": API_KEY, "token": TOKEN})
-    custom_fields = response.json()
-    for field in custom_fields:
-        if field["name"] == field_name:
-            return field["id"]
-    return None
+    return trello_index.get_custom_field_id(board_id, field_name, API_KEY, TOKEN)
 
 # Update custom field with the specified value
 def update_custom_field(card_id, field_id, value):
@@ -237,7 +215,7 @@ def update_custom_field(card_id, field_id, value):
         "token": TOKEN,
         "value": {"text": value}
     }
-    response = requests.put(custom_field_url, json=payload)
+    response = trello_client.put(custom_field_url, json=payload)
     if response.status_code == 200:
         print("Custom field updated successfully!")
     else:
@@ -267,7 +245,7 @@ def create_card(list_id, title, description):
       "name": title,
       "desc": description
   }
-  response = requests.post(CARDS_URL, data=payload)
+  response = trello_client.post(CARDS_URL, data=payload)
 
   if response.status_code == 200:
       card_id = response.json()["id"]
@@ -340,7 +318,7 @@ def get_all_cards(board_id, api_key, token):
         'token': token
     }
 
-    response = requests.get(url, headers=headers, params=query)
+    response = trello_client.get(url, headers=headers, params=query)
     if response.status_code == 200:
         return response.json()  # Return a list of card details
     else:
@@ -377,7 +355,7 @@ def get_custom_field_data(card_id, api_key, token):
         'key': api_key,
         'token': token
     }
-    response = requests.get(url, params=params)
+    response = trello_client.get(url, params=params)
     if response.status_code == 200:
         return response.json()  # This returns the list of custom field items as JSON
     else:
@@ -400,7 +378,7 @@ def get_custom_fields_in_board(board_id, api_key, token):
         'key': api_key,
         'token': token
     }
-    response = requests.get(url, params=params)
+    response = trello_client.get(url, params=params)
     if response.status_code == 200:
         return response.json()  # Returns the list of custom fields as JSON
     else:
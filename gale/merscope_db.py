@@ -73,7 +73,7 @@ def create_database_with_text_ids(db_name):
     conn.close()
 
 
-def insert_data_into_db(tissue_block_id, run_id, card_id, card_name):
+def insert_data_into_db(tissue_block_id, run_id, card_id, card_name, db_name='merscope.db'):
     """
     Inserts data into TissueBlocks, MerScopeRuns, and TrelloCards tables.
 
@@ -82,29 +82,41 @@ def insert_data_into_db(tissue_block_id, run_id, card_id, card_name):
     - run_id (str): Run ID to be inserted into MerScopeRuns.
     - card_id (str): Card ID to be inserted into TrelloCards.
     - card_name (str): Card Name to be inserted into TrelloCards.
+    - db_name (str): Path to the SQLite database.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect('merscope.db')
-    c = conn.cursor()
-    
-    # Insert into TissueBlocks
-    c.execute('''
-        INSERT INTO TissueBlocks (TissueBlockID, TissueName) VALUES (?, ?)
-        ON CONFLICT(TissueBlockID) DO UPDATE SET TissueName = excluded.TissueName;
-    ''', (tissue_block_id, tissue_block_id))
+    insert_rows_into_db([(tissue_block_id, run_id, card_id, card_name)], db_name)
 
-    # Insert into MerScopeRuns
-    c.execute('''
-        INSERT INTO MerScopeRuns (RunID, TissueBlockID) VALUES (?, ?)
-        ON CONFLICT(RunID) DO NOTHING;
-    ''', (run_id, tissue_block_id))
 
-    # Insert into TrelloCards
-    c.execute('''
-        INSERT INTO TrelloCards (CardID, RunID, CardName) VALUES (?, ?, ?)
-        ON CONFLICT(CardID) DO UPDATE SET RunID = excluded.RunID, CardName = excluded.CardName;
-    ''', (card_id, run_id, card_name))
+def insert_rows_into_db(rows, db_name='merscope.db'):
+    """
+    Inserts many (tissue_block_id, run_id, card_id, card_name) rows into TissueBlocks,
+    MerScopeRuns, and TrelloCards over one connection and in one transaction.
 
-    # Commit changes and close connection
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    Parameters:
+    - rows (list of tuple): (tissue_block_id, run_id, card_id, card_name) tuples.
+    - db_name (str): Path to the SQLite database.
+    """
+    rows = list(rows)
+    # Connect to the SQLite database
+    conn = sqlite3.connect(db_name)
+    try:
+        with conn:
+            # Insert into TissueBlocks
+            conn.executemany('''
+                INSERT INTO TissueBlocks (TissueBlockID, TissueName) VALUES (?, ?)
+                ON CONFLICT(TissueBlockID) DO UPDATE SET TissueName = excluded.TissueName;
+            ''', [(tissue_block_id, tissue_block_id) for tissue_block_id, _, _, _ in rows])
+
+            # Insert into MerScopeRuns
+            conn.executemany('''
+                INSERT INTO MerScopeRuns (RunID, TissueBlockID) VALUES (?, ?)
+                ON CONFLICT(RunID) DO NOTHING;
+            ''', [(run_id, tissue_block_id) for tissue_block_id, run_id, _, _ in rows])
+
+            # Insert into TrelloCards
+            conn.executemany('''
+                INSERT INTO TrelloCards (CardID, RunID, CardName) VALUES (?, ?, ?)
+                ON CONFLICT(CardID) DO UPDATE SET RunID = excluded.RunID, CardName = excluded.CardName;
+            ''', [(card_id, run_id, card_name) for _, run_id, card_id, card_name in rows])
+    finally:
+        conn.close()
@@ -0,0 +1 @@
+../trl/trello_async.py
\ No newline at end of file
@@ -0,0 +1 @@
+../trl/trello_client.py
\ No newline at end of file
@@ -0,0 +1 @@
+../trl/trello_index.py
\ No newline at end of file
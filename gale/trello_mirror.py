@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of Trello boards: cards, lists, custom field values, checklists and comments.
+
+The first sync of a board downloads it with a handful of board-level requests. Later syncs
+read only the board actions newer than the stored high-water mark (the ID of the last action
+applied), re-fetch the cards those actions touched through Trello's /1/batch endpoint, ten
+cards per request, and apply everything in batched transactions. Read-heavy helpers can then
+query the mirror instead of the API.
+
+Environment Variables:
+    - TKEY: Trello API key
+    - TTOKEN: Trello API token
+    - TBOARDID_SEQ_PIPELINE, TBOARDID_BICAN: The boards synced by default
+
+Usage:
+    python trello_mirror.py [db_path]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+import requests
+
+import merscope_db
+import trello_client
+
+MIRROR_DB = "trello_mirror.db"
+
+# Trello returns at most this many actions per request
+ACTIONS_PAGE_SIZE = 1000
+
+# Trello's /1/batch endpoint takes at most this many URLs
+BATCH_URLS = 10
+
+# Card fields kept in the mirror
+CARD_FIELDS = 'id,name,desc,idList,idBoard,closed,dateLastActivity,url'
+
+# Actions whose effect is applied by re-fetching the card they mention
+_COMMENT_ACTIONS = {'commentCard', 'updateComment', 'deleteComment'}
+_REMOVED_CARD_ACTIONS = {'deleteCard', 'moveCardFromBoard'}
+
+
+def create_mirror_tables(conn):
+    """
+    Creates the mirror tables if they do not exist.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the mirror database.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS MirrorBoards (
+            board_id TEXT PRIMARY KEY,
+            last_action_id TEXT,
+            synced_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS MirrorLists (
+            list_id TEXT PRIMARY KEY,
+            board_id TEXT NOT NULL,
+            name TEXT,
+            closed BOOLEAN
+        );
+        CREATE TABLE IF NOT EXISTS MirrorCards (
+            card_id TEXT PRIMARY KEY,
+            board_id TEXT NOT NULL,
+            list_id TEXT,
+            name TEXT,
+            desc TEXT,
+            closed BOOLEAN,
+            date_last_activity TEXT,
+            url TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_mirror_cards_board_name ON MirrorCards (board_id, name);
+        CREATE TABLE IF NOT EXISTS MirrorCustomFields (
+            field_id TEXT PRIMARY KEY,
+            board_id TEXT NOT NULL,
+            name TEXT,
+            type TEXT,
+            options TEXT
+        );
+        CREATE TABLE IF NOT EXISTS MirrorCustomFieldValues (
+            card_id TEXT NOT NULL,
+            field_id TEXT NOT NULL,
+            value_text TEXT,
+            value_json TEXT,
+            PRIMARY KEY (card_id, field_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS MirrorChecklists (
+            checklist_id TEXT PRIMARY KEY,
+            card_id TEXT NOT NULL,
+            name TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_mirror_checklists_card ON MirrorChecklists (card_id);
+        CREATE TABLE IF NOT EXISTS MirrorCheckItems (
+            item_id TEXT PRIMARY KEY,
+            checklist_id TEXT NOT NULL,
+            card_id TEXT NOT NULL,
+            name TEXT,
+            state TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_mirror_check_items_card ON MirrorCheckItems (card_id);
+        CREATE TABLE IF NOT EXISTS MirrorComments (
+            action_id TEXT PRIMARY KEY,
+            card_id TEXT NOT NULL,
+            board_id TEXT NOT NULL,
+            member TEXT,
+            text TEXT,
+            date TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_mirror_comments_card_date ON MirrorComments (card_id, date);
+    """)
+
+
+def connect_mirror(db_path=MIRROR_DB):
+    """
+    Opens the mirror database, creating its tables if needed.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+
+    Returns:
+    - sqlite3.Connection: The connection.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_mirror_tables(conn)
+    return conn
+
+
+def _get_json(endpoint, api_key, token, **params):
+    response = trello_client.get(endpoint, params={'key': api_key, 'token': token, **params})
+    response.raise_for_status()
+    return response.json()
+
+
+def _field_value_text(item, options):
+    """The value of a customFieldItems entry as text (option text for list-type fields)."""
+    if item.get('idValue'):
+        return options.get(item['idValue'])
+    value = item.get('value') or {}
+    for key in ('text', 'number', 'date', 'checked'):
+        if key in value:
+            return str(value[key])
+    return None
+
+
+def _field_options(conn, board_id):
+    options = {}
+    for (field_options,) in conn.execute("SELECT options FROM MirrorCustomFields WHERE board_id = ?", (board_id,)):
+        for option in json.loads(field_options or '[]'):
+            options[option['id']] = option.get('value', {}).get('text')
+    return options
+
+
+def _write_cards(conn, board_id, cards, checklists=None):
+    """
+    Replaces the mirrored rows of the given cards (fields, custom field values and, if the cards
+    carry them or checklists is given, checklists) in the current transaction.
+    """
+    options = _field_options(conn, board_id)
+    card_ids = [(card['id'],) for card in cards]
+
+    conn.executemany("""
+        INSERT INTO MirrorCards (card_id, board_id, list_id, name, desc, closed, date_last_activity, url)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(card_id) DO UPDATE SET
+            board_id=excluded.board_id, list_id=excluded.list_id, name=excluded.name, desc=excluded.desc,
+            closed=excluded.closed, date_last_activity=excluded.date_last_activity, url=excluded.url;
+        """, [(card['id'], board_id, card.get('idList'), card.get('name'), card.get('desc'), card.get('closed'),
+               card.get('dateLastActivity'), card.get('url')) for card in cards])
+
+    conn.executemany("DELETE FROM MirrorCustomFieldValues WHERE card_id = ?", card_ids)
+    conn.executemany("INSERT INTO MirrorCustomFieldValues VALUES (?, ?, ?, ?)",
+                     [(card['id'], item['idCustomField'], _field_value_text(item, options), json.dumps(item))
+                      for card in cards for item in card.get('customFieldItems') or []])
+
+    if checklists is None:
+        checklists = [checklist for card in cards for checklist in card.get('checklists') or []]
+    conn.executemany("DELETE FROM MirrorChecklists WHERE card_id = ?", card_ids)
+    conn.executemany("DELETE FROM MirrorCheckItems WHERE card_id = ?", card_ids)
+    conn.executemany("INSERT OR REPLACE INTO MirrorChecklists VALUES (?, ?, ?)",
+                     [(checklist['id'], checklist['idCard'], checklist.get('name')) for checklist in checklists])
+    conn.executemany("INSERT OR REPLACE INTO MirrorCheckItems VALUES (?, ?, ?, ?, ?)",
+                     [(item['id'], checklist['id'], checklist['idCard'], item.get('name'), item.get('state'))
+                      for checklist in checklists for item in checklist.get('checkItems') or []])
+
+
+def _delete_cards(conn, card_ids):
+    rows = [(card_id,) for card_id in card_ids]
+    for table in ('MirrorCards', 'MirrorCustomFieldValues', 'MirrorChecklists', 'MirrorCheckItems', 'MirrorComments'):
+        conn.executemany(f"DELETE FROM {table} WHERE card_id = ?", rows)
+
+
+def _write_lists(conn, board_id, lists):
+    conn.execute("DELETE FROM MirrorLists WHERE board_id = ?", (board_id,))
+    conn.executemany("INSERT OR REPLACE INTO MirrorLists VALUES (?, ?, ?, ?)",
+                     [(item['id'], board_id, item.get('name'), item.get('closed')) for item in lists])
+
+
+def _write_custom_fields(conn, board_id, custom_fields):
+    conn.execute("DELETE FROM MirrorCustomFields WHERE board_id = ?", (board_id,))
+    conn.executemany("INSERT OR REPLACE INTO MirrorCustomFields VALUES (?, ?, ?, ?, ?)",
+                     [(field['id'], board_id, field.get('name'), field.get('type'),
+                       json.dumps(field.get('options') or [])) for field in custom_fields])
+
+
+def _apply_comment_actions(conn, board_id, actions):
+    for action in actions:
+        data = action.get('data', {})
+        if action['type'] == 'commentCard':
+            conn.execute("INSERT OR REPLACE INTO MirrorComments VALUES (?, ?, ?, ?, ?, ?)",
+                         (action['id'], data.get('card', {}).get('id'), board_id,
+                          (action.get('memberCreator') or {}).get('username'), data.get('text'), action.get('date')))
+        elif action['type'] == 'updateComment':
+            conn.execute("UPDATE MirrorComments SET text = ? WHERE action_id = ?",
+                         (data.get('action', {}).get('text'), data.get('action', {}).get('id')))
+        elif action['type'] == 'deleteComment':
+            conn.execute("DELETE FROM MirrorComments WHERE action_id = ?", (data.get('action', {}).get('id'),))
+
+
+def _fetch_actions(board_id, api_key, token, since=None, action_filter=None):
+    """Fetches every board action after since (an action ID), paging back with before; oldest first."""
+    actions = []
+    before = None
+    while True:
+        params = {'limit': ACTIONS_PAGE_SIZE}
+        if since:
+            params['since'] = since
+        if before:
+            params['before'] = before
+        if action_filter:
+            params['filter'] = action_filter
+        page = _get_json(f"boards/{board_id}/actions", api_key, token, **params)
+        actions.extend(page)
+        if len(page) < ACTIONS_PAGE_SIZE:
+            break
+        before = page[-1]['id']
+    return actions[::-1]
+
+
+def _batch_status(result):
+    """The HTTP status of one /1/batch entry: its only key (e.g. {"200": card}) or its statusCode."""
+    if len(result) == 1:
+        key = next(iter(result))
+        if key.isdigit():
+            return int(key)
+    return result.get('statusCode')
+
+
+def _fetch_cards_batched(card_ids, api_key, token):
+    """
+    Fetches cards with their custom field items and checklists through /1/batch.
+
+    Returns:
+    - tuple: (cards found, IDs of the cards that no longer exist, i.e. answered with 404).
+
+    Raises:
+    - requests.HTTPError: If any card is answered with another error (e.g. 429 or 5xx), so the
+      sync stops before deleting anything or moving the high-water mark.
+    """
+    cards, missing = [], []
+    card_ids = list(card_ids)
+    for start in range(0, len(card_ids), BATCH_URLS):
+        chunk = card_ids[start:start + BATCH_URLS]
+        # The URLs are comma-separated, so they cannot carry a fields list; the default card fields suffice
+        urls = ','.join(f"/cards/{card_id}?customFieldItems=true&checklists=all" for card_id in chunk)
+        for card_id, result in zip(chunk, _get_json('batch', api_key, token, urls=urls)):
+            status = _batch_status(result)
+            if status == 200:
+                cards.append(result['200'])
+            elif status == 404:
+                missing.append(card_id)
+            else:
+                raise requests.HTTPError(f"Batch request for card {card_id} failed with status {status}: {result}")
+    return cards, missing
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def full_sync_board(conn, board_id, api_key, token):
+    """
+    Downloads a whole board into the mirror and sets its high-water mark.
+
+    Parameters:
+    - conn (sqlite3.Connection): An open connection to the mirror database.
+    - board_id (str): The ID of the Trello board.
+    - api_key (str): Your Trello API key.
+    - token (str): Your Trello token.
+    """
+    # Read first, so actions made during the download are applied by the next sync
+    latest = _get_json(f"boards/{board_id}/actions", api_key, token, limit=1, fields='id')
+
+    custom_fields = _get_json(f"boards/{board_id}/customFields", api_key, token)
+    lists = _get_json(f"boards/{board_id}/lists", api_key, token, filter='all')
+    cards = _get_json(f"boards/{board_id}/cards/all", api_key, token, fields=CARD_FIELDS, customFieldItems='true')
+    checklists = _get_json(f"boards/{board_id}/checklists", api_key, token, checkItems='all')
+    comments = _fetch_actions(board_id, api_key, token, action_filter='commentCard')
+
+    with conn:
+        conn.execute("DELETE FROM MirrorComments WHERE board_id = ?", (board_id,))
+        _delete_cards(conn, [row[0] for row in conn.execute("SELECT card_id FROM MirrorCards WHERE board_id = ?",
+                                                            (board_id,))])
+        _write_custom_fields(conn, board_id, custom_fields)
+        _write_lists(conn, board_id, lists)
+        _write_cards(conn, board_id, cards, checklists)
+        _apply_comment_actions(conn, board_id, comments)
+        conn.execute("INSERT OR REPLACE INTO MirrorBoards VALUES (?, ?, ?)",
+                     (board_id, latest[0]['id'] if latest else None, _now()))
+
+
+def sync_board(db_path, board_id, api_key=None, token=None, full=False):
+    """
+    Brings the mirror of a board up to date.
+
+    A board without a high-water mark is downloaded in full. Otherwise only the actions after
+    the mark are read: comments are applied from the actions themselves, cards mentioned by
+    any other action are re-fetched through /1/batch, and lists and custom field definitions
+    are re-read once if any action changed them. The changes and the new mark are written in
+    one transaction, so an interrupted sync is simply repeated.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - board_id (str): The ID of the Trello board.
+    - api_key (str, optional): Your Trello API key. Defaults to the TKEY environment variable.
+    - token (str, optional): Your Trello token. Defaults to the TTOKEN environment variable.
+    - full (bool): Download the whole board even if it has a high-water mark.
+
+    Returns:
+    - dict: The number of actions applied and cards re-fetched, or None after a full download.
+    """
+    api_key = api_key or os.environ.get('TKEY')
+    token = token or os.environ.get('TTOKEN')
+
+    conn = connect_mirror(db_path)
+    try:
+        row = conn.execute("SELECT last_action_id FROM MirrorBoards WHERE board_id = ?", (board_id,)).fetchone()
+        if full or row is None or row[0] is None:
+            full_sync_board(conn, board_id, api_key, token)
+            return None
+
+        actions = _fetch_actions(board_id, api_key, token, since=row[0])
+        if not actions:
+            with conn:
+                conn.execute("UPDATE MirrorBoards SET synced_at = ? WHERE board_id = ?", (_now(), board_id))
+            return {'actions': 0, 'cards': 0}
+
+        touched, removed = [], set()
+        for action in actions:
+            card_id = action.get('data', {}).get('card', {}).get('id')
+            if action['type'] in _REMOVED_CARD_ACTIONS and card_id:
+                removed.add(card_id)
+            elif card_id and action['type'] not in _COMMENT_ACTIONS:
+                removed.discard(card_id)
+                if card_id not in touched:
+                    touched.append(card_id)
+        touched = [card_id for card_id in touched if card_id not in removed]
+
+        types = {action['type'] for action in actions}
+        lists = (_get_json(f"boards/{board_id}/lists", api_key, token, filter='all')
+                 if any('List' in action_type for action_type in types) else None)
+        custom_fields = (_get_json(f"boards/{board_id}/customFields", api_key, token)
+                         if any(action_type.endswith('CustomField') for action_type in types) else None)
+        cards, missing = _fetch_cards_batched(touched, api_key, token)
+
+        with conn:
+            if custom_fields is not None:
+                _write_custom_fields(conn, board_id, custom_fields)
+            if lists is not None:
+                _write_lists(conn, board_id, lists)
+            _write_cards(conn, board_id, cards)
+            _delete_cards(conn, removed | set(missing))
+            _apply_comment_actions(conn, board_id, actions)
+            conn.execute("UPDATE MirrorBoards SET last_action_id = ?, synced_at = ? WHERE board_id = ?",
+                         (actions[-1]['id'], _now(), board_id))
+        return {'actions': len(actions), 'cards': len(cards)}
+    finally:
+        conn.close()
+
+
+def sync_boards(db_path=MIRROR_DB, board_ids=None, api_key=None, token=None):
+    """
+    Syncs several boards into the mirror.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - board_ids (list of str, optional): Defaults to the TBOARDID_SEQ_PIPELINE and TBOARDID_BICAN boards.
+    - api_key (str, optional): Your Trello API key. Defaults to the TKEY environment variable.
+    - token (str, optional): Your Trello token. Defaults to the TTOKEN environment variable.
+
+    Returns:
+    - dict: Maps each board ID to the result of sync_board.
+    """
+    if board_ids is None:
+        board_ids = [board_id for board_id in (os.environ.get('TBOARDID_SEQ_PIPELINE'),
+                                               os.environ.get('TBOARDID_BICAN')) if board_id]
+    return {board_id: sync_board(db_path, board_id, api_key, token) for board_id in board_ids}
+
+
+def get_last_update_timestamp(db_path, card_id):
+    """
+    Returns a card's dateLastActivity from the mirror.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - card_id (str): The ID of the Trello card.
+
+    Returns:
+    - str: Timestamp of the last update in ISO 8601 format, or None if the card is not mirrored.
+    """
+    conn = connect_mirror(db_path)
+    try:
+        row = conn.execute("SELECT date_last_activity FROM MirrorCards WHERE card_id = ?", (card_id,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def extract_custom_field_text(db_path, card_id, target_custom_field_id):
+    """
+    Returns the value of a card's custom field from the mirror, as text.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - card_id (str): The ID of the Trello card.
+    - target_custom_field_id (str): The ID of the custom field.
+
+    Returns:
+    - str: The value, or None if the field is not set on the card.
+    """
+    conn = connect_mirror(db_path)
+    try:
+        row = conn.execute("SELECT value_text FROM MirrorCustomFieldValues WHERE card_id = ? AND field_id = ?",
+                           (card_id, target_custom_field_id)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def get_card_comments(db_path, card_id):
+    """
+    Returns a card's comments from the mirror, newest first.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - card_id (str): The ID of the Trello card.
+
+    Returns:
+    - list of str: The comment texts.
+    """
+    conn = connect_mirror(db_path)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT text FROM MirrorComments WHERE card_id = ? ORDER BY date DESC", (card_id,))]
+    finally:
+        conn.close()
+
+
+def search_comments(db_path, text, board_id=None):
+    """
+    Finds the comments containing text, e.g. "upload:", across the mirrored boards.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - text (str): The text to look for (case-insensitive for ASCII).
+    - board_id (str, optional): Only search this board.
+
+    Returns:
+    - pd.DataFrame: card_id, card_name, text and date of each matching comment, newest first.
+    """
+    sql = """
+        SELECT c.card_id, cards.name AS card_name, c.text, c.date
+        FROM MirrorComments c
+        LEFT JOIN MirrorCards cards ON cards.card_id = c.card_id
+        WHERE instr(lower(c.text), lower(?)) > 0
+    """
+    params = [text]
+    if board_id:
+        sql += " AND c.board_id = ?"
+        params.append(board_id)
+    conn = connect_mirror(db_path)
+    try:
+        return pd.read_sql_query(sql + " ORDER BY c.date DESC", conn, params=params)
+    finally:
+        conn.close()
+
+
+def find_cards(db_path, name_substring, board_id=None, include_closed=False):
+    """
+    Finds mirrored cards whose name contains a substring, e.g. a run ID.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - name_substring (str): The text to look for in card names.
+    - board_id (str, optional): Only search this board.
+    - include_closed (bool): Also return archived cards.
+
+    Returns:
+    - pd.DataFrame: card_id, board_id, list name, card name and dateLastActivity of each match.
+    """
+    sql = """
+        SELECT c.card_id, c.board_id, l.name AS list_name, c.name, c.date_last_activity
+        FROM MirrorCards c
+        LEFT JOIN MirrorLists l ON l.list_id = c.list_id
+        WHERE instr(c.name, ?) > 0
+    """
+    params = [name_substring]
+    if board_id:
+        sql += " AND c.board_id = ?"
+        params.append(board_id)
+    if not include_closed:
+        sql += " AND NOT c.closed"
+    conn = connect_mirror(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def export_merscope_cards(db_path, run_id_field_id, tissue_block_field_id, merscope_db_name='merscope.db',
+                          board_id=None):
+    """
+    Fills the TissueBlocks, MerScopeRuns and TrelloCards tables of merscope_db from the mirror,
+    in one transaction, instead of fetching each card's custom fields from the API.
+
+    Parameters:
+    - db_path (str): Path to the SQLite mirror.
+    - run_id_field_id (str): The ID of the custom field holding the MERSCOPE run ID.
+    - tissue_block_field_id (str): The ID of the custom field holding the tissue block ID.
+    - merscope_db_name (str): Path to the MERSCOPE database.
+    - board_id (str, optional): Only export cards of this board.
+
+    Returns:
+    - int: The number of cards exported, i.e. open cards with both fields set.
+    """
+    sql = """
+        SELECT tissue.value_text, run.value_text, c.card_id, c.name
+        FROM MirrorCards c
+        JOIN MirrorCustomFieldValues run ON run.card_id = c.card_id AND run.field_id = ?
+        JOIN MirrorCustomFieldValues tissue ON tissue.card_id = c.card_id AND tissue.field_id = ?
+        WHERE NOT c.closed AND run.value_text IS NOT NULL AND tissue.value_text IS NOT NULL
+    """
+    params = [run_id_field_id, tissue_block_field_id]
+    if board_id:
+        sql += " AND c.board_id = ?"
+        params.append(board_id)
+    conn = connect_mirror(db_path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    merscope_db.insert_rows_into_db(rows, merscope_db_name)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else MIRROR_DB
+    for board_id, result in sync_boards(db_path).items():
+        print(f"{board_id}: {'full download' if result is None else result}")
@@ -0,0 +1 @@
+../trl/trello_mock_server.py
\ No newline at end of file
@@ -1,6 +1,6 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from demux_reader import read_demultiplex_stats
 
 def load_data(file_path):
     """
@@ -12,7 +12,8 @@ def load_data(file_path):
     Returns:
     pandas.DataFrame: The loaded data.
     """
-    return pd.read_csv(file_path)
+    demux_stats, _ = read_demultiplex_stats(file_path, categorical=False)
+    return demux_stats
 
 def calculate_undetermined_reads_percentage(data):
     """
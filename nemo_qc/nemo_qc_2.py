@@ -1,10 +1,11 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from demux_reader import read_demultiplex_stats
 
 # Function to load data from a CSV file
 def load_data(file_path):
-    return pd.read_csv(file_path)
+    demux_stats, _ = read_demultiplex_stats(file_path, categorical=False)
+    return demux_stats
 
 # Function to calculate undetermined reads percentage
 def calculate_undetermined_reads_percentage(data):
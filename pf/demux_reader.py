@@ -0,0 +1 @@
+../broad_qc/demux_reader.py
\ No newline at end of file
@@ -1,37 +1,90 @@
 import pandas as pd
-from itertools import combinations
+from collections import deque
+import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
 import matplotlib.pyplot as plt
+from demux_reader import read_demultiplex_stats
 
-def get_pool_ids_from_directories(path):
+def _scan_directory(dir_path):
+    """
+    Lists a directory once, returning the pool_id of its first 'qc-*.conf' file (or None)
+    and the subdirectories to descend into. Symlinked directories are reported but not
+    descended into, matching os.walk's default.
+    """
+    pool_id = None
+    subdirs = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if pool_id is None and name.startswith("qc-") and name.endswith(".conf"):
+                    pool_id = name.split('-')[1].split('.')[0]
+                try:
+                    if entry.is_dir():
+                        subdirs.append((entry.path, name, entry.is_symlink()))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return pool_id, subdirs
+
+def scan_pool_ids(path, max_depth=None, max_workers=16):
+    """
+    Searches the directories below path for 'qc-*.conf' files, listing directories in parallel.
+
+    Every directory is listed exactly once with os.scandir. Listings run on a thread pool so
+    that metadata round-trips on network filesystems overlap, and results are yielded as soon
+    as they are found, in no particular order.
+
+    Args:
+        path (str): The root directory path to start searching for configuration files.
+        max_depth (int, optional): How many levels below path to search. 1 searches only the
+            immediate subdirectories. Defaults to no limit.
+        max_workers (int): Number of directories listed concurrently.
+
+    Yields:
+        tuple: The name of the directory (str) where a valid file was found and the
+            extracted pool_id (str).
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # The root itself is only listed for its subdirectories
+        pending = {executor.submit(_scan_directory, path): (None, 0, False)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_name, depth, is_symlink = pending.pop(future)
+                pool_id, subdirs = future.result()
+                if dir_name is not None and pool_id is not None:
+                    yield dir_name, pool_id
+                if is_symlink or (max_depth is not None and depth >= max_depth):
+                    continue
+                for subdir_path, subdir_name, subdir_is_symlink in subdirs:
+                    future = executor.submit(_scan_directory, subdir_path)
+                    pending[future] = (subdir_name, depth + 1, subdir_is_symlink)
+
+def get_pool_ids_from_directories(path, max_depth=None, max_workers=16):
     """
     Traverse the specified path to find directories containing configuration files with specific naming patterns,
     and extract a unique identifier (pool_id) from each file name.
 
-    This function walks through all directories starting from the given path, searching for files that match the pattern
+    This function searches all directories below the given path for files that match the pattern
     'qc-*.conf'. It extracts the pool_id, which is the part of the filename between "-" and ".", and returns a list of
     tuples. Each tuple contains the name of the directory (not the full path) and the extracted pool_id.
+    The search is done by scan_pool_ids; results are sorted by directory name.
 
     Args:
         path (str): The root directory path to start searching for configuration files.
+        max_depth (int, optional): How many levels below path to search. Defaults to no limit.
+        max_workers (int): Number of directories listed concurrently.
 
     Returns:
         list of tuple: A list where each tuple contains two elements:
             1. The name of the directory (str) where a valid file was found.
             2. The extracted pool_id (str) from the filename.
     """
-    dir_pool_list = []
-    
-    for root, dirs, files in os.walk(path):
-        for dir_name in dirs:
-            full_dir_path = os.path.join(root, dir_name)
-            for file in os.listdir(full_dir_path):
-                if file.startswith("qc-") and file.endswith(".conf"):
-                    pool_id = file.split('-')[1].split('.')[0]
-                    dir_pool_list.append((dir_name, pool_id))
-                    break
-    return dir_pool_list
+    return sorted(scan_pool_ids(path, max_depth=max_depth, max_workers=max_workers))
 
 def generate_reads_pf_chart(run_folder, pool):
     """
@@ -40,11 +93,11 @@ def generate_reads_pf_chart(run_folder, pool):
     """
     demux_stats_file_path = os.path.join(run_folder, "Reports", "Demultiplex_Stats.csv")
 
-    # Read the CSV file into a DataFrame
-    df = pd.read_csv(demux_stats_file_path)
+    # Read the demux stats table into a DataFrame
+    df, _ = read_demultiplex_stats(demux_stats_file_path)
     
     # Process the DataFrame to get summed reads per SampleID
-    summed_df = df.groupby('SampleID')['# Reads'].sum().reset_index()
+    summed_df = df.groupby('SampleID', observed=True)['# Reads'].sum().reset_index()
     filtered_summed_df = summed_df[summed_df['SampleID'] != 'Undetermined']
     sorted_summed_df = filtered_summed_df.sort_values(by='# Reads', ascending=False)
     
@@ -62,127 +115,307 @@ def generate_reads_pf_chart(run_folder, pool):
 
     return total_reads
 
-def compute_pairwise_differences(df):
-    """Compute the pairwise differences in total reads."""
-    pairs = list(combinations(df['Pool'], 2))
-    differences = []
-    for pair in pairs:
-        reads1 = df[df['Pool'] == pair[0]]['Total Reads'].values[0]
-        reads2 = df[df['Pool'] == pair[1]]['Total Reads'].values[0]
-        differences.append((pair[0], pair[1], abs(reads1 - reads2)))
-    return differences
-
-def generate_combinations(differences):
-    """Generate all possible combinations of pairs ensuring unique pools."""
-    return list(combinations(differences, 2))
-
-def find_best_combination(combinations):
-    """Find the best combination with the lowest difference between differences."""
-    best_combination = None
-    best_difference = float('inf')
-    for comb in combinations:
-        pools = {comb[0][0], comb[0][1], comb[1][0], comb[1][1]}
-        if len(pools) == 4:
-            diff1 = comb[0][2]
-            diff2 = comb[1][2]
-            difference_between_differences = abs(diff1 - diff2)
-            if difference_between_differences < best_difference:
-                best_difference = difference_between_differences
-                best_combination = comb
-    return best_combination, best_difference
-
-def find_lowest_difference_pair(differences):
-    """Find the pair with the lowest difference."""
-    return min(differences, key=lambda x: x[2])
-
-def find_remaining_pair(df, pair):
-    """Find the difference for the remaining pair of pools."""
-    remaining_pools = set(df['Pool']) - {pair[0], pair[1]}
-    if not remaining_pools:
-        return None  # No remaining pairs
-    remaining_pair = tuple(remaining_pools)
-    reads1 = df[df['Pool'] == remaining_pair[0]]['Total Reads'].values[0]
-    reads2 = df[df['Pool'] == remaining_pair[1]]['Total Reads'].values[0]
-    remaining_difference = abs(reads1 - reads2)
-    return remaining_pair + (remaining_difference,)
-
-def compute_reads_ratio(df, pair):
-    """Compute the ratio of total reads between two pools."""
-    reads1 = df[df['Pool'] == pair[0]]['Total Reads'].values[0]
-    reads2 = df[df['Pool'] == pair[1]]['Total Reads'].values[0]
-    ratio = reads2 / reads1 if reads1 != 0 else float('inf')
+def pool_read_totals(df):
+    """
+    Returns the total reads of each pool as a Series indexed by pool name, in DataFrame order.
+
+    Args:
+        df (pd.DataFrame): Pools with 'Pool' and 'Total Reads' columns.
+
+    Returns:
+        pd.Series: 'Total Reads' indexed by 'Pool'.
+    """
+    return df.set_index('Pool')['Total Reads']
+
+def _ratio_array(reads):
+    """reads[j] / reads[i] for every pair, or inf where reads[i] is 0."""
+    reads = np.asarray(reads)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = reads[None, :] / reads[:, None]
+    ratio[reads == 0, :] = np.inf
     return ratio
 
-def lowest_difference(df):
-    """Main function to compute the lowest difference pairs, remaining pair difference, and ratios."""
-    differences = compute_pairwise_differences(df)
-    if len(differences) == 1:
-        # Only one pair available
-        lowest_diff_pair = differences[0]
-        lowest_diff_pair_ratio = compute_reads_ratio(df, lowest_diff_pair[:2])
-        lowest_diff_pair_inverse_ratio = compute_reads_ratio(df, (lowest_diff_pair[1], lowest_diff_pair[0]))
+def _difference_array(reads):
+    """|reads[i] - reads[j]| for every pair."""
+    reads = np.asarray(reads)
+    return np.abs(reads[:, None] - reads[None, :])
 
-        reads1 = df[df['Pool'] == lowest_diff_pair[0]]['Total Reads'].values[0]
-        reads2 = df[df['Pool'] == lowest_diff_pair[1]]['Total Reads'].values[0]
+def compute_ratio_matrix(df):
+    """
+    Computes the read ratio between every pair of pools in one broadcast.
 
-        result_data = [
-            
-            (lowest_diff_pair[0], lowest_diff_pair[1], reads1, lowest_diff_pair_ratio),
-            (lowest_diff_pair[1], lowest_diff_pair[0], reads2, lowest_diff_pair_inverse_ratio)
-        ]
+    Args:
+        df (pd.DataFrame): Pools with 'Pool' and 'Total Reads' columns.
 
-        result_df = pd.DataFrame(result_data, columns=['Pool 1', 'Pool 2', 'Total Reads', 'Ratio'])
-        return result_df
+    Returns:
+        pd.DataFrame: N x N matrix indexed by 'Pool 1' (rows) and 'Pool 2' (columns) holding
+            Total Reads of Pool 2 / Total Reads of Pool 1, or inf where Pool 1 has no reads.
+    """
+    totals = pool_read_totals(df)
+    return pd.DataFrame(_ratio_array(totals.to_numpy()),
+                        index=totals.index.rename('Pool 1'), columns=totals.index.rename('Pool 2'))
 
-    lowest_diff_pair = find_lowest_difference_pair(differences)
-    remaining_diff_pair = find_remaining_pair(df, lowest_diff_pair)
+def compute_difference_matrix(df):
+    """
+    Computes the absolute difference in total reads between every pair of pools in one broadcast.
 
-    lowest_diff_pair_ratio = compute_reads_ratio(df, lowest_diff_pair[:2])
-    remaining_diff_pair_ratio = compute_reads_ratio(df, remaining_diff_pair[:2]) if remaining_diff_pair else None
+    Args:
+        df (pd.DataFrame): Pools with 'Pool' and 'Total Reads' columns.
 
-    lowest_diff_pair_inverse_ratio = compute_reads_ratio(df, (lowest_diff_pair[1], lowest_diff_pair[0]))
-    remaining_diff_pair_inverse_ratio = compute_reads_ratio(df, (remaining_diff_pair[1], remaining_diff_pair[0])) if remaining_diff_pair else None
+    Returns:
+        pd.DataFrame: Symmetric N x N matrix indexed by 'Pool 1' (rows) and 'Pool 2' (columns).
+    """
+    totals = pool_read_totals(df)
+    return pd.DataFrame(_difference_array(totals.to_numpy()),
+                        index=totals.index.rename('Pool 1'), columns=totals.index.rename('Pool 2'))
 
-    reads1 = df[df['Pool'] == lowest_diff_pair[0]]['Total Reads'].values[0]
-    reads2 = df[df['Pool'] == lowest_diff_pair[1]]['Total Reads'].values[0]
+def _oriented(i, j):
+    """Order a pair of pool positions as they appear in the DataFrame."""
+    return (i, j) if i < j else (j, i)
 
-    result_data = [
-        (lowest_diff_pair[0], lowest_diff_pair[1], reads1, lowest_diff_pair_ratio),
-        (lowest_diff_pair[1], lowest_diff_pair[0], reads2, lowest_diff_pair_inverse_ratio)
-    ]
+def find_lowest_difference_pairs(reads):
+    """
+    Greedily pair pools with the closest total reads.
 
-    if remaining_diff_pair:
-        reads3 = df[df['Pool'] == remaining_diff_pair[0]]['Total Reads'].values[0]
-        reads4 = df[df['Pool'] == remaining_diff_pair[1]]['Total Reads'].values[0]
-        result_data.extend([
-            (remaining_diff_pair[0], remaining_diff_pair[1], reads3, remaining_diff_pair_ratio),
-            (remaining_diff_pair[1], remaining_diff_pair[0], reads4, remaining_diff_pair_inverse_ratio)
-        ])
+    The two remaining pools with the smallest difference are always neighbours once the totals
+    are sorted, so each step is a sweep over the sorted gaps. With an odd number of pools one
+    pool is left unpaired. With four pools this matches picking the lowest difference pair and
+    then the remaining pair.
 
-    result_df = pd.DataFrame(result_data, columns=['Pool 1', 'Pool 2', 'Total Reads', 'Ratio']).sort_values(by='Pool 1')
-    return result_df
+    Args:
+        reads (np.ndarray): Total reads of each pool.
 
-def lowest_second_order_difference(df):
-    """Main function to find the lowest difference pairs and compute ratios."""
-    differences = compute_pairwise_differences(df)
-    if len(differences) <= 1:
-        return pd.DataFrame(columns=['Pool 1', 'Pool 2', 'Total Reads', 'Ratio'])  # Not enough pairs to compare
+    Returns:
+        list of tuple: (i, j) positions of each pair, in the order they were chosen.
+    """
+    remaining = list(np.argsort(reads, kind='stable'))
+    pairs = []
+    while len(remaining) >= 2:
+        gaps = np.diff(reads[remaining])
+        # Ties go to the pair that comes first in pool order
+        k = min(np.flatnonzero(gaps == gaps.min()), key=lambda k: _oriented(remaining[k], remaining[k + 1]))
+        pairs.append(_oriented(remaining[k], remaining[k + 1]))
+        del remaining[k:k + 2]
+    return pairs
 
-    combs = generate_combinations(differences)
-    best_combination, best_difference = find_best_combination(combs)
+def _maximum_matching(adjacency, nodes):
+    """
+    Find a maximum matching among the given nodes of a general graph with Edmonds' blossom
+    algorithm, in O(V^3).
 
-    result_data = []
-    for pair in best_combination:
-        ratio = compute_reads_ratio(df, pair[:2])
-        inverse_ratio = compute_reads_ratio(df, (pair[1], pair[0]))
-        reads1 = df[df['Pool'] == pair[0]]['Total Reads'].values[0]
-        reads2 = df[df['Pool'] == pair[1]]['Total Reads'].values[0]
-        result_data.append((pair[0], pair[1], reads1, ratio))
-        result_data.append((pair[1], pair[0], reads2, inverse_ratio))
+    Args:
+        adjacency (list of set): The neighbours of each node.
+        nodes (list of int): The nodes to match; edges to any other node are ignored.
 
+    Returns:
+        dict: Maps each matched node to its partner.
+    """
+    n = len(adjacency)
+    active = [False] * n
+    for v in nodes:
+        active[v] = True
+    match = [-1] * n
+
+    def find_augmenting_path(root):
+        parent = [-1] * n
+        base = list(range(n))
+        used = [False] * n
+        used[root] = True
+        queue = deque([root])
+
+        def lowest_common_ancestor(a, b):
+            seen = [False] * n
+            while True:
+                a = base[a]
+                seen[a] = True
+                if match[a] == -1:
+                    break
+                a = parent[match[a]]
+            while True:
+                b = base[b]
+                if seen[b]:
+                    return b
+                b = parent[match[b]]
+
+        def mark_path(v, blossom_base, child, in_blossom):
+            while base[v] != blossom_base:
+                in_blossom[base[v]] = in_blossom[base[match[v]]] = True
+                parent[v] = child
+                child = match[v]
+                v = parent[match[v]]
+
+        while queue:
+            v = queue.popleft()
+            for to in adjacency[v]:
+                if not active[to] or base[v] == base[to] or match[v] == to:
+                    continue
+                if to == root or (match[to] != -1 and parent[match[to]] != -1):
+                    # An odd cycle: contract it into its base
+                    blossom_base = lowest_common_ancestor(v, to)
+                    in_blossom = [False] * n
+                    mark_path(v, blossom_base, to, in_blossom)
+                    mark_path(to, blossom_base, v, in_blossom)
+                    for i in range(n):
+                        if in_blossom[base[i]]:
+                            base[i] = blossom_base
+                            if not used[i]:
+                                used[i] = True
+                                queue.append(i)
+                elif parent[to] == -1:
+                    parent[to] = v
+                    if match[to] == -1:
+                        return to, parent
+                    used[match[to]] = True
+                    queue.append(match[to])
+        return -1, parent
+
+    for root in nodes:
+        if match[root] == -1:
+            v, parent = find_augmenting_path(root)
+            while v != -1:
+                previous = match[parent[v]]
+                match[v], match[parent[v]] = parent[v], v
+                v = previous
+    return {v: match[v] for v in nodes if match[v] != -1}
+
+def _has_perfect_matching(adjacency, nodes):
+    return len(_maximum_matching(adjacency, nodes)) == len(nodes)
+
+def _first_perfect_matching(adjacency, nodes):
+    """
+    Find the perfect matching whose sorted pairs come first, or None: the lowest node takes the
+    lowest partner that still leaves a perfect matching of the rest, and so on.
+    """
+    remaining = sorted(nodes)
+    if not _has_perfect_matching(adjacency, remaining):
+        return None
+    pairs = []
+    while remaining:
+        i = remaining[0]
+        for j in sorted(adjacency[i].intersection(remaining[1:])):
+            rest = [k for k in remaining[1:] if k != j]
+            if _has_perfect_matching(adjacency, rest):
+                break
+        pairs.append((i, j))
+        remaining = rest
+    return pairs
+
+def find_balanced_pairs(reads):
+    """
+    Pair up pools so that the differences within the pairs are as close to each other as possible.
+
+    Candidate pairs are sorted by their difference and swept with two pointers to find the
+    narrowest window of differences whose pairs still cover every pool (a perfect matching,
+    checked with Edmonds' blossom algorithm). A second pass over windows of that width picks the
+    first optimal pairing in pool order. Every step is polynomial, so any number of pools is
+    handled. With four pools this is the same choice as comparing every combination of two
+    pairs. With an odd number of pools one pool is left unpaired.
+
+    Args:
+        reads (np.ndarray): Total reads of each pool.
+
+    Returns:
+        tuple: The (i, j) positions of each pair and the spread between the largest and smallest
+            within-pair difference, or ([], inf) if there are fewer than four pools.
+    """
+    n_pools = len(reads)
+    if n_pools < 4:
+        return [], float('inf')
+
+    differences = _difference_array(reads)
+    rows, cols = np.triu_indices(n_pools, k=1)
+    order = np.argsort(differences[rows, cols], kind='stable')
+    rows, cols = rows[order], cols[order]
+    edge_differences = differences[rows, cols]
+
+    # An odd pool count gets a dummy node, numbered last, that can pair with anything
+    n_nodes = n_pools + (n_pools % 2)
+    nodes = list(range(n_nodes))
+
+    def adjacency_for(lo, hi):
+        adjacency = [set() for _ in nodes]
+        if n_nodes > n_pools:
+            adjacency[n_pools] = set(range(n_pools))
+            for i in range(n_pools):
+                adjacency[i].add(n_pools)
+        for i, j in zip(rows[lo:hi + 1].tolist(), cols[lo:hi + 1].tolist()):
+            adjacency[i].add(j)
+            adjacency[j].add(i)
+        return adjacency
+
+    # Narrowest window of differences that still pairs every pool
+    best_spread = float('inf')
+    hi = 0
+    for lo in range(len(edge_differences)):
+        hi = max(hi, lo)
+        covered = _has_perfect_matching(adjacency_for(lo, hi), nodes)
+        while not covered and hi + 1 < len(edge_differences):
+            hi += 1
+            covered = _has_perfect_matching(adjacency_for(lo, hi), nodes)
+        if not covered:
+            break
+        best_spread = min(best_spread, edge_differences[hi] - edge_differences[lo])
+
+    # Every window of that width holds only optimal pairings; ties go to the first in pool order
+    best_pairs = None
+    for lo in range(len(edge_differences)):
+        hi = np.searchsorted(edge_differences, edge_differences[lo] + best_spread, side='right') - 1
+        matching = _first_perfect_matching(adjacency_for(lo, hi), nodes)
+        if matching is not None:
+            pairs = [(i, j) for i, j in matching if j < n_pools]
+            if best_pairs is None or pairs < best_pairs:
+                best_pairs = pairs
+    return best_pairs, best_spread
+
+def group_pools(df, group_size=2):
+    """
+    Split pools into groups of group_size with the closest total reads.
+
+    Sorting the totals and cutting them into consecutive groups minimises the summed range of
+    reads within the groups. Leftover pools form a final, smaller group.
+
+    Args:
+        df (pd.DataFrame): Pools with 'Pool' and 'Total Reads' columns.
+        group_size (int): Number of pools per group, e.g. 2 for pairs or 4 for a 4-way split.
+
+    Returns:
+        list of tuple: The pool names in each group, lowest total reads first.
+    """
+    totals = pool_read_totals(df)
+    pools, reads = totals.index.to_numpy(), totals.to_numpy()
+    order = np.argsort(reads, kind='stable')
+    return [tuple(pools[order[k:k + group_size]]) for k in range(0, len(order), group_size)]
+
+def _pairs_to_read_adj_table(totals, ratio, pairs):
+    """Lay out pairs as 'Pool 1', 'Pool 2', 'Total Reads', 'Ratio' rows in both directions."""
+    pools, reads = totals.index, totals.to_numpy()
+    result_data = []
+    for i, j in pairs:
+        result_data.append((pools[i], pools[j], reads[i], ratio[i, j]))
+        result_data.append((pools[j], pools[i], reads[j], ratio[j, i]))
     result_df = pd.DataFrame(result_data, columns=['Pool 1', 'Pool 2', 'Total Reads', 'Ratio']).sort_values(by='Pool 1')
     return result_df
 
-def generate_read_adj_table(df):
-    return pd.concat([lowest_difference(df), lowest_second_order_difference(df)], axis=0)
+def lowest_difference(df, totals=None, ratio=None):
+    """Pair pools with the closest total reads and compute the read ratios within each pair."""
+    totals = pool_read_totals(df) if totals is None else totals
+    ratio = _ratio_array(totals.to_numpy()) if ratio is None else ratio
+    return _pairs_to_read_adj_table(totals, ratio, find_lowest_difference_pairs(totals.to_numpy()))
 
+def lowest_second_order_difference(df, totals=None, ratio=None):
+    """Pair pools so the within-pair differences are as even as possible and compute the read ratios."""
+    totals = pool_read_totals(df) if totals is None else totals
+    ratio = _ratio_array(totals.to_numpy()) if ratio is None else ratio
+    pairs, _ = find_balanced_pairs(totals.to_numpy())
+    return _pairs_to_read_adj_table(totals, ratio, pairs)
+
+def generate_read_adj_table(df):
+    """
+    Builds the read adjustment table from both pairings, reading the ratios from a single
+    N x N ratio matrix computed once for all pools.
+    """
+    totals = pool_read_totals(df)
+    ratio = _ratio_array(totals.to_numpy())
+    tables = [lowest_difference(df, totals, ratio), lowest_second_order_difference(df, totals, ratio)]
+    # With fewer than four pools there is no second pairing, and concatenating an empty frame warns
+    return pd.concat([table for table in tables if not table.empty], axis=0)
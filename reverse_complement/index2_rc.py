@@ -1,64 +1,123 @@
-import pandas as pd
+import glob
 import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from reverse_complement import reverse_complement_many
 
-def reverse_complement(seq):
-    """
-    Calculate the reverse complement of a DNA sequence.
+OUTPUT_SUFFIX = ".index2_rc.csv"
 
-    Args:
-    seq (str): A string representing a DNA sequence (consisting of A, T, C, G).
+# Data rows are rewritten this many at a time
+CHUNK_ROWS = 10000
 
-    Returns:
-    str: The reverse complement of the DNA sequence.
+def _rewrite_rows(lines, index2_column):
+    """
+    Reverse-complements the index2 field of a chunk of data rows, keeping every other
+    field and the line endings exactly as they were.
     """
-    complement = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
-    return ''.join([complement[base] for base in reversed(seq)])
+    rows = []
+    for line in lines:
+        body = line.rstrip('\r\n')
+        rows.append((body.split(','), line[len(body):]))
 
-def index2_rc(file_path):
+    targets = [fields for fields, _ in rows if len(fields) > index2_column and fields[index2_column]]
+    for fields, index2 in zip(targets, reverse_complement_many([fields[index2_column] for fields in targets])):
+        fields[index2_column] = index2
+
+    return [','.join(fields) + line_ending for fields, line_ending in rows]
+
+def index2_rc(file_path, output_path=None, chunk_rows=CHUNK_ROWS):
     """
-    Process a BCLConvert CSV file, apply reverse complement to 'index2' column, 
-    and concatenate with lines before the header. Writes the result to a new CSV file.
+    Process a BCLConvert sample sheet, apply reverse complement to the 'index2' column
+    and write the result to a new CSV file.
 
-    This function reads a CSV file specified by 'file_path', identifies the header line 
-    containing "Sample_ID", and applies a reverse complement transformation to the 'index2' column. 
-    It then concatenates any lines found before the header line with the transformed CSV data, 
-    and writes the combined content to a new CSV file with the same name but appended with '.new'.
+    The sheet is streamed line by line. Everything before the data header (the first line
+    containing "Sample_ID"), such as the [Header], [Reads] and [BCLConvert_Settings] sections,
+    and any section after the data rows are copied through untouched. Only the index2 field of
+    the [BCLConvert_Data] rows is rewritten, chunk_rows rows at a time. The output is written
+    to a temporary file in the same directory and moved into place, so a reader never sees a
+    partial sheet. Fields are split on commas; quoted fields are not expected in sample sheets.
 
     Args:
     file_path (str): The path to the BCLConvert CSV file.
+    output_path (str, optional): Where to write the result. Defaults to the same name with
+        '.index2_rc.csv' in place of the extension.
+    chunk_rows (int): Number of data rows rewritten at a time.
 
     Returns:
     str: The path to the newly created CSV file, or an error message if the header is not found or the data is not present.
     """
-    header_line = None
+    if output_path is None:
+        output_path = os.path.splitext(file_path)[0] + OUTPUT_SUFFIX
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    temp_file = tempfile.NamedTemporaryFile('w', dir=output_dir, prefix='.index2_rc.', suffix='.tmp',
+                                            newline='', delete=False)
+    try:
+        with open(file_path, 'r', newline='') as file, temp_file as output:
+            index2_column = None
+            for line in file:
+                output.write(line)
+                if "Sample_ID" in line:
+                    columns = [column.strip() for column in line.rstrip('\r\n').split(',')]
+                    if 'index2' not in columns:
+                        return "BCLConvert data not found"
+                    index2_column = columns.index('index2')
+                    break
 
-    with open(file_path, 'r') as file:
-        for i, line in enumerate(file):
-            if "Sample_ID" in line:
-                header_line = i
-                break
+            if index2_column is None:
+                return "Header containing 'Sample_ID' not found or data loading issue"
 
-    if header_line is not None:
-        bclconvert_data = pd.read_csv(file_path, skiprows=header_line)
-    else:
-        return "Header containing 'Sample_ID' not found or data loading issue"
+            chunk = []
+            for line in file:
+                # The data rows end at the next section, if there is one
+                if line.lstrip().startswith('['):
+                    output.writelines(_rewrite_rows(chunk, index2_column))
+                    chunk = []
+                    output.write(line)
+                    output.writelines(file)
+                    break
+                chunk.append(line)
+                if len(chunk) >= chunk_rows:
+                    output.writelines(_rewrite_rows(chunk, index2_column))
+                    chunk = []
+            output.writelines(_rewrite_rows(chunk, index2_column))
 
-    if bclconvert_data is not None:
-        bclconvert_data['index2'] = bclconvert_data['index2'].apply(reverse_complement)
+        shutil.copymode(file_path, temp_file.name)
+        os.replace(temp_file.name, output_path)
+        return output_path
+    finally:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
 
-        # Generate new file name
-        new_file_name = os.path.splitext(file_path)[0] + ".index2_rc.csv"
+def index2_rc_directory(directory, pattern='*.csv', max_workers=None):
+    """
+    Apply index2_rc to every sample sheet in a directory, one sheet per worker process.
+
+    Files that are already index2_rc outputs are skipped.
+
+    Args:
+    directory (str): The directory containing the sample sheets.
+    pattern (str): Glob pattern selecting the sample sheets within the directory.
+    max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    dict: Maps each input path to the result of index2_rc (the new path or an error message).
+    """
+    file_paths = sorted(path for path in glob.glob(os.path.join(directory, pattern))
+                        if not path.endswith(OUTPUT_SUFFIX))
 
-        # Write concatenated DataFrame to new CSV file
-        bclconvert_data.to_csv(new_file_name, index=False)
-        
-        return new_file_name
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(file_paths, executor.map(index2_rc, file_paths)))
 
-    return "BCLConvert data not found"
-    
 # This block will only run if the script is executed directly, not when imported
 if __name__ == "__main__":
-    # Load the CSV file and perform the operation
-    file_path = '/mnt/data/js_1_5.novaseq.bclconvert.sample_sheet.csv'
-    result = index2_rc(file_path)
-    print("Result:", result)
+    # Sample sheets or directories of sample sheets may be given on the command line
+    paths = sys.argv[1:] or ['/mnt/data/js_1_5.novaseq.bclconvert.sample_sheet.csv']
+    for path in paths:
+        if os.path.isdir(path):
+            for file_path, result in index2_rc_directory(path).items():
+                print(f"{file_path}:", result)
+        else:
+            print("Result:", index2_rc(path))
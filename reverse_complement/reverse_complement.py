@@ -1,33 +1,111 @@
-def reverse(text):
+import pandas as pd
 
-    # input: a string of bases
+# IUPAC nucleotide codes and their complements. N and any character not listed map to
+# themselves, and lowercase bases keep their case.
+_BASES = 'ACGTUNRYSWKMBDHV'
+_COMPLEMENTS = 'TGCAANYRSWMKVHDB'
+COMPLEMENT_TABLE = str.maketrans(_BASES + _BASES.lower(), _COMPLEMENTS + _COMPLEMENTS.lower())
 
-    # returns: a string of bases in reverse order
+# ReverseComplement has always upper-cased A, C, G and T and passed anything else through
+_ACGT_TABLE = str.maketrans('ACGTacgt', 'TGCATGCA')
 
-    rev_text = ''
+# Joins sequences for the whole-column reverse complement; never appears in an index
+_SEPARATOR = '\0'
 
-    for i in range(len(text) - 1, -1, -1):
+def reverse(text):
 
-        rev_text += text[i]
+    # input: a string of bases
 
-    return rev_text
+    # returns: a string of bases in reverse order
+
+    return text[::-1]
 
 def complementOf(base):
     # input: a single character string
     # returns: a single character string
     # the complementary base
 
-    pair = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
-
-    # Check if the base is in the dictionary, return its complement, otherwise return the original base
-    return pair.get(base.upper(), base)
+    # Bases other than A, C, G and T are returned unchanged
+    return base.translate(_ACGT_TABLE)
 
 def ReverseComplement(Pattern):
     # input: a string Pattern
     # returns: the reverse complement of Pattern
 
-    # Use the custom reverse function to reverse the sequence
-    reverse_complement = ''.join(complementOf(base) for base in reverse(Pattern))
+    return Pattern.translate(_ACGT_TABLE)[::-1]
+
+def reverse_complement(seq):
+    """
+    Calculate the reverse complement of a DNA sequence.
+
+    Args:
+    seq (str): A DNA sequence. IUPAC codes and N are complemented and lowercase bases keep
+        their case; any other character is passed through.
+
+    Returns:
+    str: The reverse complement of the DNA sequence.
+    """
+    return seq.translate(COMPLEMENT_TABLE)[::-1]
+
+def reverse_complement_many(sequences):
+    """
+    Reverse-complement a list of DNA sequences at once.
+
+    The sequences are joined into one string, complemented with a single str.translate and
+    reversed with one slice, then split back apart, so the per-base work runs in C instead of
+    one Python call per sequence.
+
+    Args:
+    sequences (list of str): The sequences.
+
+    Returns:
+    list of str: The reverse complements, in the same order.
+    """
+    if not sequences:
+        return []
+
+    joined = _SEPARATOR.join(sequences)
+    if joined.count(_SEPARATOR) != len(sequences) - 1:
+        return [reverse_complement(sequence) for sequence in sequences]
+
+    # Reversing the joined string also reverses the order of the sequences
+    return joined.translate(COMPLEMENT_TABLE)[::-1].split(_SEPARATOR)[::-1]
+
+def reverse_complement_series(sequences):
+    """
+    Reverse-complement a whole column of DNA sequences at once with reverse_complement_many.
+    Missing values stay missing. A categorical column only has its categories rewritten, unless
+    two categories share a reverse complement (e.g. ACGT and ACGU), in which case they are merged.
+
+    Args:
+    sequences (pd.Series): The sequences, e.g. the index2 column of a sample sheet.
+
+    Returns:
+    pd.Series: The reverse complements, with the same index and name.
+    """
+    if isinstance(sequences.dtype, pd.CategoricalDtype):
+        categories = sequences.cat.categories
+        complements = reverse_complement_many(categories.astype(str).to_list())
+        if len(set(complements)) == len(complements):
+            return sequences.cat.rename_categories(complements)
+        # rename_categories refuses duplicate categories, so map the values and re-categorise
+        return sequences.map(dict(zip(categories, complements))).astype('category')
+
+    present = sequences.notna()
+    result = sequences.to_numpy(dtype=object, copy=True)
+    result[present.to_numpy()] = reverse_complement_many(sequences[present].astype(str).to_list())
+    return pd.Series(result, index=sequences.index, name=sequences.name).astype(sequences.dtype, copy=False)
+
+@pd.api.extensions.register_series_accessor("dna")
+class DNAAccessor:
+    """
+    Series accessor for DNA sequence columns, e.g. df['index2'].dna.reverse_complement().
+    Registered when this module is imported.
+    """
 
-    return reverse_complement
+    def __init__(self, series):
+        self._series = series
 
+    def reverse_complement(self):
+        """Reverse-complement every sequence in the column."""
+        return reverse_complement_series(self._series)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-import requests
+import trello_client
 import pandas as pd
 
 def get_card_fields(api_key, api_token, card_id):
@@ -16,7 +16,7 @@ def get_card_fields(api_key, api_token, card_id):
     - dict: A dictionary containing all fields of the card as JSON.
     """
     url = f"https://api.trello.com/1/cards/{card_id}?key={api_key}&token={api_token}"
-    response = requests.get(url)
+    response = trello_client.get(url)
     return response.json()
 
 def get_custom_fields(api_key, api_token, card_id):
@@ -32,7 +32,7 @@ def get_custom_fields(api_key, api_token, card_id):
     - dict: The raw JSON response from the API.
     """
     url = f"https://api.trello.com/1/cards/{card_id}/customFieldItems?key={api_key}&token={api_token}"
-    response = requests.get(url)
+    response = trello_client.get(url)
     return response.json()
 
 def get_checklist_items(api_key, api_token, card_id):
@@ -48,9 +48,116 @@ def get_checklist_items(api_key, api_token, card_id):
     - dict: The raw JSON response from the API.
     """
     url = f"https://api.trello.com/1/cards/{card_id}?key={api_key}&token={api_token}&checklists=all"
-    response = requests.get(url)
+    response = trello_client.get(url)
     return response.json()
 
+def fetch_board_json(api_key, api_token, board_id, resource, **params):
+    """
+    Get one of a board's nested resources (cards, lists, checklists, customFields, actions, ...).
+
+    Parameters:
+    - api_key (str): The API key for Trello.
+    - api_token (str): The API token for authentication.
+    - board_id (str): The ID of the Trello board.
+    - resource (str): The nested resource, e.g. 'cards'.
+    - **params: Extra query parameters, e.g. customFieldItems='true'.
+
+    Returns:
+    - list: The raw JSON response from the API.
+    """
+    url = f"https://api.trello.com/1/boards/{board_id}/{resource}"
+    response = trello_client.get(url, params={'key': api_key, 'token': api_token, **params})
+    response.raise_for_status()
+    return response.json()
+
+def custom_field_item_value(item, options=None):
+    """
+    Get the value of a custom field item as a plain value.
+
+    Parameters:
+    - item (dict): A customFieldItems entry of a card.
+    - options (dict, optional): Maps the option IDs of list-type fields to their text.
+
+    Returns:
+    - The text, number, date or checked value, the option text for list-type fields, or None.
+    """
+    if item.get('idValue'):
+        return (options or {}).get(item['idValue'])
+    value = item.get('value') or {}
+    if 'number' in value:
+        return float(value['number'])
+    if 'checked' in value:
+        return value['checked'] == 'true'
+    return value.get('text', value.get('date'))
+
+def get_board_snapshot(api_key, api_token, board_id, filter_string=None):
+    """
+    Get the cards of a Trello board with their custom field values and checklist items.
+
+    Everything is fetched with four board-level requests: the cards with their
+    customFieldItems, the checklists with their items, the custom field definitions and the
+    lists. The number of requests does not depend on the number of cards.
+
+    Parameters:
+    - api_key (str): The API key for Trello.
+    - api_token (str): The API token for authentication.
+    - board_id (str): The ID of the Trello board.
+    - filter_string (str, optional): Only keep cards whose name contains this string (case-insensitive).
+
+    Returns:
+    - dict: A dictionary of DataFrames:
+        - 'cards': one row per card (card_id, card_name, list_id, list_name, closed,
+          dateLastActivity, desc, url).
+        - 'lists': list_id, list_name.
+        - 'custom_fields': field_id, field_name, field_type.
+        - 'custom_field_values': one row per card and field set on it (card_id, card_name,
+          field_id, field_name, field_type, value).
+        - 'checklist_items': one row per checklist item (card_id, card_name, checklist_id,
+          checklist_name, item_id, item_name, state).
+    """
+    cards = fetch_board_json(api_key, api_token, board_id, 'cards', customFieldItems='true')
+    checklists = fetch_board_json(api_key, api_token, board_id, 'checklists', checkItems='all')
+    custom_fields = fetch_board_json(api_key, api_token, board_id, 'customFields')
+    lists = fetch_board_json(api_key, api_token, board_id, 'lists')
+
+    if filter_string:
+        cards = [card for card in cards if filter_string.lower() in card['name'].lower()]
+
+    lists_df = pd.DataFrame([(trello_list['id'], trello_list['name']) for trello_list in lists],
+                            columns=['list_id', 'list_name'])
+    custom_fields_df = pd.DataFrame([(field['id'], field['name'], field.get('type')) for field in custom_fields],
+                                    columns=['field_id', 'field_name', 'field_type'])
+    options = {option['id']: option.get('value', {}).get('text')
+               for field in custom_fields for option in field.get('options') or []}
+
+    cards_df = pd.DataFrame([(card['id'], card['name'], card.get('idList'), card.get('closed'),
+                              card.get('dateLastActivity'), card.get('desc'), card.get('url')) for card in cards],
+                            columns=['card_id', 'card_name', 'list_id', 'closed', 'dateLastActivity', 'desc', 'url'])
+    cards_df = cards_df.merge(lists_df, on='list_id', how='left')
+    cards_df = cards_df[['card_id', 'card_name', 'list_id', 'list_name', 'closed', 'dateLastActivity', 'desc', 'url']]
+    card_names = cards_df[['card_id', 'card_name']]
+
+    values = [(card['id'], item['idCustomField'], custom_field_item_value(item, options))
+              for card in cards for item in card.get('customFieldItems') or []]
+    values_df = pd.DataFrame(values, columns=['card_id', 'field_id', 'value'])
+    values_df = (values_df.merge(card_names, on='card_id')
+                 .merge(custom_fields_df, on='field_id', how='left')
+                 [['card_id', 'card_name', 'field_id', 'field_name', 'field_type', 'value']])
+
+    items = [(checklist['idCard'], checklist['id'], checklist['name'], item['id'], item['name'], item.get('state'))
+             for checklist in checklists for item in checklist.get('checkItems') or []]
+    items_df = pd.DataFrame(items, columns=['card_id', 'checklist_id', 'checklist_name', 'item_id', 'item_name', 'state'])
+    items_df = (items_df.merge(card_names, on='card_id')
+                [['card_id', 'card_name', 'checklist_id', 'checklist_name', 'item_id', 'item_name', 'state']])
+
+    return {
+        'cards': cards_df,
+        'lists': lists_df,
+        'custom_fields': custom_fields_df,
+        'custom_field_values': values_df,
+        'checklist_items': items_df,
+    }
+
 def get_custom_fields_and_checklists(api_key, api_token, board_id, filter_string=None):
     """
     Get custom fields and checklist items for all cards on a Trello board.
@@ -60,27 +167,26 @@ def get_custom_fields_and_checklists(api_key, api_token, board_id, filter_string
     - api_token (str): The API token for authentication.
     - board_id (str): The ID of the Trello board to retrieve cards from.
     - filter_string (str, optional): A string to filter cards by name. If provided, only cards containing this string in their name will be included.
+
+    Returns:
+    - dict: The DataFrames of get_board_snapshot for the selected cards.
     """
-    url = f"https://api.trello.com/1/boards/{board_id}/cards?key={api_key}&token={api_token}"
-    response = requests.get(url)
-    cards = response.json()
-
-    for card in cards:
-        card_name = card["name"]
-        if filter_string and filter_string.lower() not in card_name.lower():
-            continue  # Skip card if it doesn't contain the filter string
-        card_id = card["id"]
-        custom_fields_json = get_custom_fields(api_key, api_token, card_id)
-        checklist_items_json = get_checklist_items(api_key, api_token, card_id)
-        fields_json = get_card_fields(api_key, api_token, card_id)
-        
-        print(f"Card Name: {card_name}")
-        #print(f"Card ID: {card_id}")
-        #print("Custom Fields JSON:", custom_fields_json)
-        #print("Checklist Items JSON:", checklist_items_json)
-        print("Fields JSON:", fields_json)
+    snapshot = get_board_snapshot(api_key, api_token, board_id, filter_string=filter_string)
+    values = snapshot['custom_field_values'].groupby('card_id')
+    items = snapshot['checklist_items'].groupby('card_id')
+
+    for card in snapshot['cards'].itertuples(index=False):
+        print(f"Card Name: {card.card_name}")
+        if card.card_id in values.groups:
+            print("Custom Fields:", dict(zip(values.get_group(card.card_id)['field_name'],
+                                             values.get_group(card.card_id)['value'])))
+        if card.card_id in items.groups:
+            print("Checklist Items:", dict(zip(items.get_group(card.card_id)['item_name'],
+                                               items.get_group(card.card_id)['state'])))
         print()
 
+    return snapshot
+
 def json_to_dataframe(json_data):
     """
     Convert JSON data to a DataFrame.
@@ -109,7 +215,7 @@ def get_last_update_timestamp(api_key, api_token, card_id):
     url = f"https://api.trello.com/1/cards/{card_id}?key={api_key}&token={api_token}"
 
     # Send GET request to Trello API
-    response = requests.get(url)
+    response = trello_client.get(url)
 
     # Check if request was successful
     if response.status_code == 200:
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 
 
-import requests
+import trello_client
 
 # Function to fetch custom fields
 def fetch_custom_fields(api_key, api_token, board_id):
     custom_fields_url = f"https://api.trello.com/1/boards/{board_id}/customFields?key={api_key}&token={api_token}"
-    response = requests.get(custom_fields_url)
+    response = trello_client.get(custom_fields_url)
     custom_fields_data = response.json()
     custom_fields = {}
     for field in custom_fields_data:
@@ -16,7 +16,7 @@ def fetch_custom_fields(api_key, api_token, board_id):
 # Function to fetch checklists
 def fetch_checklists(api_key, api_token, board_id):
     checklists_url = f"https://api.trello.com/1/boards/{board_id}/checklists?key={api_key}&token={api_token}"
-    response = requests.get(checklists_url)
+    response = trello_client.get(checklists_url)
     checklists_data = response.json()
     checklists = {}
     for checklist in checklists_data:
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Asyncio front end to the shared Trello client for bulk card operations.
+
+Requests still go through trello_client, on a thread pool of `concurrency` workers, so they
+share its keep-alive connections, per-token rate limiter and 429 backoff with the sync
+helpers. With enough requests in flight, a bulk job is limited by Trello's rate limit rather
+than by the round-trip time of each request.
+
+In a notebook, await the coroutines directly (e.g. `await create_cards(list_id, names)`); in a
+script, wrap them in asyncio.run.
+
+Usage (benchmark against a local mock server):
+    python trello_async.py --requests 200 --concurrency 16 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import trello_client
+
+# Requests in flight at once
+DEFAULT_CONCURRENCY = 16
+
+
+class AsyncTrelloClient:
+    """
+    Runs TrelloClient requests concurrently from asyncio, at most `concurrency` at a time.
+
+    Args:
+        client (TrelloClient, optional): The client to send requests with. Defaults to the
+            shared client of trello_client, so its rate limiter is shared with the sync helpers.
+        concurrency (int): Maximum number of requests in flight.
+    """
+
+    def __init__(self, client=None, concurrency=DEFAULT_CONCURRENCY):
+        self.client = client if client is not None else trello_client.get_client()
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='trello')
+        self._semaphore = None
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        """
+        Sends a request through the sync client on the worker pool; see TrelloClient.request.
+
+        Returns:
+            requests.Response: The response.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, lambda: self.client.request(method, endpoint, params=params, **kwargs))
+
+    async def get_json(self, endpoint, params=None, **kwargs):
+        response = await self.request('GET', endpoint, params=params, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def create_card(self, list_id, title, description="", comment_with_id=True):
+        """
+        Creates a card and, like gale_trello.create_card, posts its ID as a comment.
+
+        Returns:
+            str: The ID of the created card, or None if creation failed.
+        """
+        response = await self.request('POST', 'cards', data={'idList': list_id, 'name': title, 'desc': description})
+        if response.status_code != 200:
+            print(f"Card creation failed for {title}: {response.status_code}")
+            return None
+        card_id = response.json()['id']
+        if comment_with_id:
+            await self.post_comment(card_id, card_id)
+        return card_id
+
+    async def post_comment(self, card_id, comment_text):
+        """
+        Posts a comment to a card.
+
+        Returns:
+            bool: True if the comment was posted successfully, False otherwise.
+        """
+        response = await self.request('POST', f'cards/{card_id}/actions/comments', params={'text': comment_text})
+        if response.status_code != 200:
+            print(f"Error posting comment to {card_id}: {response.status_code}")
+            return False
+        return True
+
+    async def get_comments(self, card_id):
+        """
+        Returns the comments of a card as the commentCard actions Trello reports.
+
+        Returns:
+            list: The comments, or an empty list if the request failed.
+        """
+        response = await self.request('GET', f'cards/{card_id}/actions', params={'filter': 'commentCard'})
+        if response.status_code != 200:
+            print(f"Failed to get comments for {card_id}. Status code: {response.status_code}")
+            return []
+        return response.json()
+
+    async def update_custom_field(self, card_id, field_id, value):
+        """
+        Sets the text of a custom field on a card.
+
+        Returns:
+            bool: True if the field was updated, False otherwise.
+        """
+        response = await self.request('PUT', f'cards/{card_id}/customField/{field_id}/item',
+                                      json={'value': {'text': value}})
+        if response.status_code != 200:
+            print(f"Custom field update failed for {card_id}: {response.status_code}")
+            return False
+        return True
+
+    def close(self):
+        """Shuts down the worker pool."""
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+async def create_cards(list_id, titles, description="", comment_with_id=True, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Creates one card per title in a list, each with its ID posted as a comment.
+
+    Args:
+        list_id (str): ID of the Trello list where the cards will be created.
+        titles (list of str): The card titles, e.g. archive paths.
+        description (str): Description for every new card.
+        comment_with_id (bool): Post each card's ID as a comment, as gale_trello.create_card does.
+        concurrency (int): Maximum number of requests in flight.
+
+    Returns:
+        dict: Maps each title to the ID of its card, or None if creation failed.
+    """
+    async with AsyncTrelloClient(concurrency=concurrency) as client:
+        card_ids = await asyncio.gather(*(client.create_card(list_id, title, description, comment_with_id)
+                                          for title in titles))
+    return dict(zip(titles, card_ids))
+
+
+async def get_comments_for_cards(card_ids, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Fetches the comments of many cards.
+
+    Args:
+        card_ids (list of str): The card IDs.
+        concurrency (int): Maximum number of requests in flight.
+
+    Returns:
+        dict: Maps each card ID to its list of comments.
+    """
+    async with AsyncTrelloClient(concurrency=concurrency) as client:
+        comments = await asyncio.gather(*(client.get_comments(card_id) for card_id in card_ids))
+    return dict(zip(card_ids, comments))
+
+
+async def update_custom_fields(updates, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Sets a text custom field on many cards.
+
+    Args:
+        updates (list of tuple): (card_id, field_id, value) tuples.
+        concurrency (int): Maximum number of requests in flight.
+
+    Returns:
+        list of bool: Whether each update succeeded, in the same order.
+    """
+    async with AsyncTrelloClient(concurrency=concurrency) as client:
+        return await asyncio.gather(*(client.update_custom_field(card_id, field_id, value)
+                                      for card_id, field_id, value in updates))
+
+
+def benchmark(count=200, concurrency=DEFAULT_CONCURRENCY, latency=0.1, rate=1000.0):
+    """
+    Times card creation against a local mock server, one request at a time and then with the
+    asyncio client, and prints both throughputs.
+
+    Args:
+        count (int): Number of cards to create in each run.
+        concurrency (int): Requests in flight for the asyncio run.
+        latency (float): Seconds the mock server waits before answering each request.
+        rate (float): Client-side rate limit in requests per second; Trello's is about 9.
+    """
+    import trello_mock_server
+
+    server = trello_mock_server.start_server(latency=latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/1"
+    try:
+        client = trello_client.TrelloClient(api_key='key', token='token', base_url=base_url,
+                                            rate=rate, burst=max(int(rate), 1))
+        titles = [f"/archive/run_{i:05d}" for i in range(count)]
+
+        start = time.perf_counter()
+        for title in titles:
+            client.post('cards', data={'idList': 'list', 'name': title, 'desc': ''})
+        sequential = time.perf_counter() - start
+
+        async def run():
+            async with AsyncTrelloClient(client, concurrency=concurrency) as async_client:
+                await asyncio.gather(*(async_client.create_card('list', title, comment_with_id=False)
+                                       for title in titles))
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        concurrent = time.perf_counter() - start
+
+        print(f"{count} requests, {latency * 1000:.0f} ms latency, rate limit {rate:g}/s")
+        print(f"Sequential: {sequential:.2f} s ({count / sequential:.1f} requests/s)")
+        print(f"Asyncio, concurrency {concurrency}: {concurrent:.2f} s ({count / concurrent:.1f} requests/s)")
+        print("Client metrics:", client.metrics())
+        client.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the asyncio Trello client against a local mock server.")
+    parser.add_argument("--requests", type=int, default=200, help="Cards to create in each run")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--latency", type=float, default=0.1, help="Mock server latency in seconds")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Client rate limit in requests per second")
+    args = parser.parse_args()
+
+    benchmark(args.requests, args.concurrency, args.latency, args.rate)
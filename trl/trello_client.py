@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the Trello API.
+
+Every request goes through one keep-alive requests.Session, so repeated calls reuse their
+TCP and TLS connections, and through a token-bucket limiter per Trello token, so scripts stay
+under Trello's limit of 100 requests per 10 seconds per token. Responses with status 429 are
+retried after the Retry-After delay (or an exponential backoff), and idempotent requests
+(GET, HEAD, OPTIONS, PUT, DELETE) are also retried on server errors and dropped connections,
+so a PUT (e.g. to a custom field) may reach Trello twice.
+
+The module-level get, post, put and delete functions take the same arguments as their
+requests counterparts and return the same Response objects, so existing helpers only need
+requests.get(...) replaced by trello_client.get(...).
+
+Environment Variables:
+    - TRELLO_BASE_URL: API root, e.g. a local mock server (defaults to https://api.trello.com/1)
+    - TRELLO_RATE_LIMIT: Sustained requests per second per token (defaults to 9)
+    - TRELLO_BURST: Requests allowed at once before the rate applies (defaults to 10)
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TRELLO_API_URL = 'https://api.trello.com/1'
+BASE_URL = os.environ.get('TRELLO_BASE_URL', TRELLO_API_URL).rstrip('/')
+
+# A bucket of 10 refilled at 9 per second allows at most 100 requests in any 10 seconds
+RATE_LIMIT = float(os.environ.get('TRELLO_RATE_LIMIT', 9))
+BURST = int(os.environ.get('TRELLO_BURST', 10))
+
+MAX_RETRIES = 5
+BACKOFF = 1.0
+
+# Connections kept open per host
+POOL_SIZE = 16
+
+# Methods safe to send again after a server error or a dropped connection
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket: acquire() takes one token, waiting for the bucket to refill
+    at rate tokens per second if it is empty.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of tokens held, i.e. the largest burst.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Takes a token and returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        return wait
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until it is available.
+
+        Returns:
+            float: The number of seconds waited.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Holds back every caller for the given number of seconds, e.g. after a 429 response."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class TrelloClient:
+    """
+    A pooled, rate-limited Trello API client.
+
+    Args:
+        api_key (str, optional): Added as the 'key' parameter unless a request passes its own.
+            Defaults to the TKEY environment variable.
+        token (str, optional): Added as the 'token' parameter unless a request passes its own.
+            Defaults to the TTOKEN environment variable.
+        base_url (str): Root that relative endpoints such as 'boards/{id}/cards' are joined to.
+        rate (float): Sustained requests per second per token.
+        burst (int): Requests allowed at once per token.
+        max_retries (int): Retries after a 429, a server error or a connection error.
+        backoff (float): First retry delay in seconds when no Retry-After is given; doubles on each retry.
+    """
+
+    def __init__(self, api_key=None, token=None, base_url=BASE_URL, rate=RATE_LIMIT, burst=BURST,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF):
+        self.api_key = api_key if api_key is not None else os.environ.get('TKEY')
+        self.token = token if token is not None else os.environ.get('TTOKEN')
+        self.base_url = base_url.rstrip('/')
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._metrics = Counter()
+        self._status_counts = Counter()
+
+    def __repr__(self):
+        return f"TrelloClient({self.base_url!r})"
+
+    def limiter(self, token=None):
+        """
+        Returns the token bucket shared by every request made with a Trello token.
+
+        Args:
+            token (str, optional): The Trello token. Defaults to the client's token.
+
+        Returns:
+            TokenBucket: The bucket for that token.
+        """
+        token = token if token is not None else self.token
+        with self._lock:
+            if token not in self._limiters:
+                self._limiters[token] = TokenBucket(self.rate, self.burst)
+            return self._limiters[token]
+
+    def url(self, endpoint):
+        """
+        Joins a relative endpoint to the base URL. Absolute Trello API URLs are moved onto the
+        base URL too, so a mock server set in TRELLO_BASE_URL also receives them; other
+        absolute URLs are returned unchanged.
+        """
+        if endpoint.startswith(TRELLO_API_URL):
+            endpoint = endpoint[len(TRELLO_API_URL):]
+        elif endpoint.startswith(('http://', 'https://')):
+            return endpoint
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def _count(self, **counts):
+        with self._lock:
+            self._metrics.update(counts)
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        try:
+            return max(float(retry_after), 0.0)
+        except (TypeError, ValueError):
+            return self.backoff * 2 ** attempt
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        """
+        Sends a request through the session, waiting for the token's rate limiter first.
+
+        The client's key and token are added to the query parameters unless the request passes
+        its own key (as a parameter, in the JSON or form body, or in an Authorization header).
+
+        Args:
+            method (str): The HTTP method.
+            endpoint (str): A URL, or an endpoint relative to the base URL.
+            params (dict, optional): Query parameters.
+            **kwargs: Passed on to requests.Session.request (data, json, headers, stream, ...).
+
+        Returns:
+            requests.Response: The last response; raises the last connection error if every attempt failed.
+        """
+        method = method.upper()
+        url = self.url(endpoint)
+        params = dict(params or {})
+
+        # Older helpers put the key and token in the URL, the body or a header
+        sources = [params, dict(parse_qsl(urlsplit(url).query))]
+        sources.extend(part for part in (kwargs.get('json'), kwargs.get('data')) if isinstance(part, dict))
+        has_auth = any('key' in part for part in sources) or 'Authorization' in (kwargs.get('headers') or {})
+        if not has_auth and self.api_key:
+            params.update({'key': self.api_key, 'token': self.token})
+        token = next((part['token'] for part in sources if part.get('token')), None)
+        limiter = self.limiter(token)
+
+        for attempt in range(self.max_retries + 1):
+            waited = limiter.acquire()
+            self._count(requests=1, wait_seconds=waited)
+            try:
+                response = self.session.request(method, url, params=params, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._count(errors=1)
+                if method not in IDEMPOTENT_METHODS or attempt == self.max_retries:
+                    raise
+                self._count(retries=1)
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            with self._lock:
+                self._status_counts[response.status_code] += 1
+
+            throttled = response.status_code == 429
+            server_error = response.status_code >= 500 and method in IDEMPOTENT_METHODS
+            if not (throttled or server_error) or attempt == self.max_retries:
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if throttled:
+                # Every thread sharing this token waits, not only the one that was refused
+                limiter.pause(delay)
+                self._count(throttled=1)
+            else:
+                time.sleep(delay)
+            self._count(retries=1)
+            response.close()
+        return response
+
+    def get(self, endpoint, params=None, **kwargs):
+        return self.request('GET', endpoint, params=params, **kwargs)
+
+    def post(self, endpoint, params=None, **kwargs):
+        return self.request('POST', endpoint, params=params, **kwargs)
+
+    def put(self, endpoint, params=None, **kwargs):
+        return self.request('PUT', endpoint, params=params, **kwargs)
+
+    def delete(self, endpoint, params=None, **kwargs):
+        return self.request('DELETE', endpoint, params=params, **kwargs)
+
+    def metrics(self):
+        """
+        Returns the request counts so far.
+
+        Returns:
+            dict: requests sent (including retries), retries, throttled (429 responses), errors
+            (connection failures), wait_seconds spent in the rate limiter and status_codes, a
+            dict of response counts by status code.
+        """
+        with self._lock:
+            metrics = {name: self._metrics.get(name, 0)
+                       for name in ('requests', 'retries', 'throttled', 'errors', 'wait_seconds')}
+            metrics['status_codes'] = dict(self._status_counts)
+        return metrics
+
+    def reset_metrics(self):
+        """Sets every request count back to zero."""
+        with self._lock:
+            self._metrics.clear()
+            self._status_counts.clear()
+
+    def close(self):
+        """Closes the session's pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the client shared by every helper in this process, creating it on first use.
+
+    Returns:
+        TrelloClient: The shared client.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TrelloClient()
+        return _default_client
+
+
+def request(method, url, **kwargs):
+    """Sends a request through the shared client; see TrelloClient.request."""
+    return get_client().request(method, url, **kwargs)
+
+
+def get(url, params=None, **kwargs):
+    """Drop-in replacement for requests.get using the shared client."""
+    return get_client().get(url, params=params, **kwargs)
+
+
+def post(url, params=None, **kwargs):
+    """Drop-in replacement for requests.post using the shared client."""
+    return get_client().post(url, params=params, **kwargs)
+
+
+def put(url, params=None, **kwargs):
+    """Drop-in replacement for requests.put using the shared client."""
+    return get_client().put(url, params=params, **kwargs)
+
+
+def delete(url, params=None, **kwargs):
+    """Drop-in replacement for requests.delete using the shared client."""
+    return get_client().delete(url, params=params, **kwargs)
+
+
+def metrics():
+    """Returns the shared client's request counts; see TrelloClient.metrics."""
+    return get_client().metrics()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Local name-to-ID index of the cards, lists and custom fields of Trello boards.
+
+Looking up a card by name used to download the whole board each time. The index keeps the
+names and IDs of each board in SQLite, so lookups are answered locally and survive restarts.
+A board is downloaded in full the first time and once a day; in between, the index is brought
+up to date from the board's actions feed (cards and lists created, renamed, moved or deleted,
+custom fields created, renamed or deleted), one request for everything since the last sync.
+A name that is not found triggers one such refresh before giving up (at most one per board
+every 10 seconds), so a card created a moment ago is still found.
+
+Environment Variables:
+    - TRELLO_INDEX_DB: Path of the SQLite index (defaults to ~/.cache/trello/index.db)
+    - TRELLO_INDEX_TTL: Seconds an index is used before checking the actions feed (defaults to 300)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import trello_client
+
+INDEX_DB = os.environ.get('TRELLO_INDEX_DB', os.path.join(os.path.expanduser('~'), '.cache', 'trello', 'index.db'))
+INDEX_TTL = float(os.environ.get('TRELLO_INDEX_TTL', 300))
+
+# Boards are downloaded in full again after this many seconds
+FULL_SYNC_TTL = 24 * 3600
+
+# A missing name refreshes the index of a board at most this often
+MISS_REFRESH_INTERVAL = 10
+
+# The actions feed returns at most this many actions per request; more means a full sync
+ACTIONS_LIMIT = 1000
+
+CARD, LIST, CUSTOM_FIELD = 'card', 'list', 'custom_field'
+
+# Actions that change the name or presence of a card, list or custom field
+INDEX_ACTIONS = ['createCard', 'copyCard', 'updateCard', 'deleteCard', 'moveCardToBoard', 'moveCardFromBoard',
+                 'convertToCardFromCheckItem', 'createList', 'updateList', 'moveListToBoard', 'moveListFromBoard',
+                 'createCustomField', 'updateCustomField', 'deleteCustomField']
+
+# Each board is synced by one thread at a time; different boards sync in parallel
+_board_locks = {}
+_board_locks_lock = threading.Lock()
+
+# When each board last refreshed after a missing name, by (db_path, board_id)
+_miss_refreshed_at = {}
+
+
+def _board_lock(db_path, board_id):
+    with _board_locks_lock:
+        return _board_locks.setdefault((db_path, board_id), threading.Lock())
+
+
+def _connect(db_path):
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS BoardSyncState (
+                        board_id TEXT PRIMARY KEY,
+                        full_sync_at REAL NOT NULL,
+                        last_sync_at REAL NOT NULL,
+                        last_action_id TEXT
+                    );""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS NameIndex (
+                        board_id TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        object_id TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        position INTEGER NOT NULL,
+                        PRIMARY KEY (board_id, kind, object_id)
+                    ) WITHOUT ROWID;""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_name_index_name ON NameIndex (board_id, kind, name, position);")
+    return conn
+
+
+def _get_json(endpoint, api_key, token, **params):
+    response = trello_client.get(endpoint, params={'key': api_key, 'token': token, **params})
+    response.raise_for_status()
+    return response.json()
+
+
+def _full_sync(conn, board_id, api_key, token):
+    # The newest action is read first, so changes made during the download are replayed next time
+    latest = _get_json(f"boards/{board_id}/actions", api_key, token, limit=1, fields='id')
+    rows = []
+    for kind, resource in ((CARD, 'cards'), (LIST, 'lists'), (CUSTOM_FIELD, 'customFields')):
+        params = {} if kind == CUSTOM_FIELD else {'fields': 'id,name'}
+        objects = _get_json(f"boards/{board_id}/{resource}", api_key, token, **params)
+        rows.extend((board_id, kind, item['id'], item['name'], position) for position, item in enumerate(objects))
+
+    now = time.time()
+    with conn:
+        conn.execute("DELETE FROM NameIndex WHERE board_id = ?", (board_id,))
+        conn.executemany("INSERT INTO NameIndex VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO BoardSyncState VALUES (?, ?, ?, ?)",
+                     (board_id, now, now, latest[0]['id'] if latest else None))
+
+
+def _action_change(action):
+    """Returns the (kind, object_id, name or None to remove) an action implies, or None."""
+    action_type = action['type']
+    data = action.get('data', {})
+    if 'CustomField' in action_type:
+        field = data.get('customField', {})
+        return CUSTOM_FIELD, field.get('id'), None if action_type == 'deleteCustomField' else field.get('name')
+    if 'List' in action_type:
+        trello_list = data.get('list', {})
+        removed = action_type == 'moveListFromBoard' or trello_list.get('closed') is True
+        return LIST, trello_list.get('id'), None if removed else trello_list.get('name')
+    if 'Card' in action_type:
+        card = data.get('card', {})
+        # Archived cards are left out of the board's cards, as in a full download
+        removed = action_type in ('deleteCard', 'moveCardFromBoard') or card.get('closed') is True
+        return CARD, card.get('id'), None if removed else card.get('name')
+    return None
+
+
+def _incremental_sync(conn, board_id, last_action_id, api_key, token):
+    """
+    Applies the actions since last_action_id to the index.
+
+    Returns:
+        bool: False if the feed could not be replayed (too many actions or no starting point).
+    """
+    if last_action_id is None:
+        return False
+    actions = _get_json(f"boards/{board_id}/actions", api_key, token, since=last_action_id,
+                        filter=','.join(INDEX_ACTIONS), limit=ACTIONS_LIMIT)
+    if len(actions) >= ACTIONS_LIMIT:
+        return False
+
+    with conn:
+        # The feed is newest first
+        for action in reversed(actions):
+            change = _action_change(action)
+            if change is None or change[1] is None:
+                continue
+            kind, object_id, name = change
+            if name is None:
+                conn.execute("DELETE FROM NameIndex WHERE board_id = ? AND kind = ? AND object_id = ?",
+                             (board_id, kind, object_id))
+            else:
+                conn.execute("""INSERT INTO NameIndex VALUES (?, ?, ?, ?,
+                                    (SELECT COALESCE(MAX(position), -1) + 1 FROM NameIndex WHERE board_id = ? AND kind = ?))
+                                ON CONFLICT(board_id, kind, object_id) DO UPDATE SET name = excluded.name""",
+                             (board_id, kind, object_id, name, board_id, kind))
+        new_last_action_id = actions[0]['id'] if actions else last_action_id
+        conn.execute("UPDATE BoardSyncState SET last_sync_at = ?, last_action_id = ? WHERE board_id = ?",
+                     (time.time(), new_last_action_id, board_id))
+    return True
+
+
+def refresh_board_index(board_id, api_key=None, token=None, force=False, max_age=INDEX_TTL, db_path=INDEX_DB):
+    """
+    Brings the index of a board up to date if it is older than max_age seconds.
+
+    A board that is new to the index, was last downloaded more than a day ago, or has too many
+    actions to replay is downloaded in full (cards, lists and custom fields); otherwise the
+    actions since the last sync are applied.
+
+    Args:
+        board_id (str): The ID of the Trello board.
+        api_key (str, optional): Your Trello API key. Defaults to the TKEY environment variable.
+        token (str, optional): Your Trello token. Defaults to the TTOKEN environment variable.
+        force (bool): Download the board in full regardless of age.
+        max_age (float): Seconds since the last sync after which the index is refreshed.
+        db_path (str): Path of the SQLite index.
+    """
+    api_key = api_key or os.environ.get('TKEY')
+    token = token or os.environ.get('TTOKEN')
+    with _board_lock(db_path, board_id):
+        conn = _connect(db_path)
+        try:
+            state = conn.execute("SELECT full_sync_at, last_sync_at, last_action_id FROM BoardSyncState "
+                                 "WHERE board_id = ?", (board_id,)).fetchone()
+            now = time.time()
+            if force or state is None or now - state[0] > FULL_SYNC_TTL:
+                _full_sync(conn, board_id, api_key, token)
+            elif now - state[1] > max_age:
+                if not _incremental_sync(conn, board_id, state[2], api_key, token):
+                    _full_sync(conn, board_id, api_key, token)
+        finally:
+            conn.close()
+
+
+def _claim_miss_refresh(db_path, board_id):
+    """Returns True, and records the time, if the board has not refreshed for a missing name recently."""
+    now = time.monotonic()
+    with _board_locks_lock:
+        last = _miss_refreshed_at.get((db_path, board_id))
+        if last is not None and now - last < MISS_REFRESH_INTERVAL:
+            return False
+        _miss_refreshed_at[(db_path, board_id)] = now
+        return True
+
+
+def lookup_id(board_id, kind, name, api_key=None, token=None, db_path=INDEX_DB):
+    """
+    Finds the ID of the card, list or custom field with the given name on a board.
+
+    Args:
+        board_id (str): The ID of the Trello board.
+        kind (str): 'card', 'list' or 'custom_field'.
+        name (str): The exact name.
+        api_key (str, optional): Your Trello API key. Defaults to the TKEY environment variable.
+        token (str, optional): Your Trello token. Defaults to the TTOKEN environment variable.
+        db_path (str): Path of the SQLite index.
+
+    Returns:
+        str: The ID, or None if no such name exists. When several objects share the name, the
+        one listed first by Trello wins, as with a scan of the board.
+    """
+    sql = "SELECT object_id FROM NameIndex WHERE board_id = ? AND kind = ? AND name = ? ORDER BY position LIMIT 1"
+    refresh_board_index(board_id, api_key, token, db_path=db_path)
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(sql, (board_id, kind, name)).fetchone()
+        if row is None and _claim_miss_refresh(db_path, board_id):
+            # Replays the actions feed even if the index was refreshed a moment ago
+            refresh_board_index(board_id, api_key, token, max_age=0, db_path=db_path)
+            row = conn.execute(sql, (board_id, kind, name)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def get_names(board_id, kind, api_key=None, token=None, db_path=INDEX_DB):
+    """
+    Returns every indexed ID and name of one kind on a board.
+
+    Args:
+        board_id (str): The ID of the Trello board.
+        kind (str): 'card', 'list' or 'custom_field'.
+        api_key (str, optional): Your Trello API key. Defaults to the TKEY environment variable.
+        token (str, optional): Your Trello token. Defaults to the TTOKEN environment variable.
+        db_path (str): Path of the SQLite index.
+
+    Returns:
+        dict: Maps IDs to names.
+    """
+    refresh_board_index(board_id, api_key, token, db_path=db_path)
+    conn = _connect(db_path)
+    try:
+        return dict(conn.execute("SELECT object_id, name FROM NameIndex WHERE board_id = ? AND kind = ? "
+                                 "ORDER BY position", (board_id, kind)))
+    finally:
+        conn.close()
+
+
+def get_card_id(board_id, card_name, api_key=None, token=None):
+    """Returns the ID of the card with the given name on a board, or None."""
+    return lookup_id(board_id, CARD, card_name, api_key, token)
+
+
+def get_list_id(board_id, list_name, api_key=None, token=None):
+    """Returns the ID of the list with the given name on a board, or None."""
+    return lookup_id(board_id, LIST, list_name, api_key, token)
+
+
+def get_custom_field_id(board_id, field_name, api_key=None, token=None):
+    """Returns the ID of the custom field with the given name on a board, or None."""
+    return lookup_id(board_id, CUSTOM_FIELD, field_name, api_key, token)
+
+
+def get_custom_field_names(board_id, api_key=None, token=None):
+    """Returns a dictionary mapping the custom field IDs of a board to their names."""
+    return get_names(board_id, CUSTOM_FIELD, api_key, token)
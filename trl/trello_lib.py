@@ -2,7 +2,7 @@
 
 import os
 import argparse
-import requests
+import trello_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,7 +29,7 @@ def get_list_by_name(board_id, list_name):
     """
     try:
         url = get_request_url(f'boards/{board_id}/lists')
-        response = requests.get(url)
+        response = trello_client.get(url)
         response.raise_for_status()
         lists = response.json()
 
@@ -47,7 +47,7 @@ def get_top_card_in_list(list_id):
     """
     try:
         url = get_request_url(f'lists/{list_id}/cards')
-        response = requests.get(url)
+        response = trello_client.get(url)
         response.raise_for_status()
         cards = response.json()
 
@@ -64,7 +64,7 @@ def get_card_member_usernames(card_id):
     """
     try:
         url = get_request_url(f'cards/{card_id}/members')
-        response = requests.get(url)
+        response = trello_client.get(url)
         response.raise_for_status()
         members = response.json()
 
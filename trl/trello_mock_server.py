@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+A small in-memory stand-in for the Trello API, for testing and benchmarking offline.
+
+It answers the endpoints the helpers in this directory use: board cards, lists, custom
+fields, checklists and actions, card creation, comments, custom field items and /1/batch.
+Every response can be delayed to mimic network latency, and requests over Trello's limit of
+100 per 10 seconds per token can be refused with 429, as Trello does.
+
+Usage:
+    python trello_mock_server.py --port 8080 --latency 0.1
+    TRELLO_BASE_URL=http://127.0.0.1:8080/1 python some_script.py
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# Trello's limit per token
+RATE_LIMIT_REQUESTS = 100
+RATE_LIMIT_WINDOW = 10.0
+
+
+class MockTrello:
+    """In-memory board state shared by the request handlers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.cards = {}
+        self.lists = {}
+        self.custom_fields = {}
+        self.checklists = {}
+        self.actions = []
+
+    def new_id(self):
+        # Trello IDs are 24 hex digits and sort by creation time
+        return f"{next(self.ids):024x}"
+
+    def add_action(self, action_type, board_id, data):
+        action = {'id': self.new_id(), 'type': action_type, 'idBoard': board_id,
+                  'date': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                  'data': data}
+        self.actions.append(action)
+        return action
+
+
+class MockTrelloHandler(BaseHTTPRequestHandler):
+    state = None
+    latency = 0.0
+    rate_limit = False
+    request_times = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _params(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            if 'json' in (self.headers.get('Content-Type') or ''):
+                params.update(json.loads(body))
+            else:
+                params.update(parse_qsl(body))
+        return url.path.strip('/').split('/')[1:], params
+
+    def _throttled(self, token):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.state.lock:
+            times = self.request_times[token]
+            while times and now - times[0] > RATE_LIMIT_WINDOW:
+                times.popleft()
+            if len(times) >= RATE_LIMIT_REQUESTS:
+                return True
+            times.append(now)
+        return False
+
+    def _handle(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        parts, params = self._params()
+        if self._throttled(params.get('token')):
+            self._send(429, {'message': 'API_TOKEN_LIMIT_EXCEEDED'}, {'Retry-After': '1'})
+            return
+        try:
+            status, body = self.route(method, parts, params)
+        except KeyError:
+            status, body = 404, {'message': 'not found'}
+        self._send(status, body)
+
+    def _card(self, card, params):
+        card = dict(card)
+        if params.get('customFieldItems') != 'true':
+            card.pop('customFieldItems', None)
+        if params.get('checklists') == 'all':
+            card['checklists'] = [item for item in self.state.checklists.values() if item['idCard'] == card['id']]
+        return card
+
+    def route(self, method, parts, params):
+        state = self.state
+        if method == 'GET' and parts == ['batch']:
+            # Each URL is answered as if requested on its own
+            results = []
+            for url in params.get('urls', '').split(','):
+                url = urlsplit(url)
+                try:
+                    status, body = self.route('GET', url.path.strip('/').split('/'), dict(parse_qsl(url.query)))
+                except KeyError:
+                    status, body = 404, {'message': 'not found'}
+                results.append({str(status): body})
+            return 200, results
+        with state.lock:
+            if method == 'GET' and parts[0] == 'boards' and len(parts) in (3, 4):
+                board_id, resource = parts[1], parts[2]
+                if resource == 'cards':
+                    cards = [card for card in state.cards.values() if card['idBoard'] == board_id
+                             and (parts[3:] == ['all'] or not card['closed'])]
+                    if params.get('customFieldItems') != 'true':
+                        cards = [{k: v for k, v in card.items() if k != 'customFieldItems'} for card in cards]
+                    return 200, cards
+                if resource == 'lists':
+                    return 200, [item for item in state.lists.values() if item['idBoard'] == board_id]
+                if resource == 'customFields':
+                    return 200, [item for item in state.custom_fields.values() if item['idModel'] == board_id]
+                if resource == 'checklists':
+                    return 200, [item for item in state.checklists.values() if item['idBoard'] == board_id]
+                if resource == 'actions':
+                    actions = [action for action in state.actions if action['idBoard'] == board_id]
+                    if params.get('since'):
+                        actions = [action for action in actions if action['id'] > params['since']]
+                    if params.get('before'):
+                        actions = [action for action in actions if action['id'] < params['before']]
+                    if params.get('filter'):
+                        types = params['filter'].split(',')
+                        actions = [action for action in actions if action['type'] in types]
+                    return 200, actions[::-1][:int(params.get('limit', 50))]
+
+            if parts[0] == 'cards':
+                if method == 'POST' and len(parts) == 1:
+                    trello_list = state.lists.get(params.get('idList'))
+                    board_id = trello_list['idBoard'] if trello_list else 'board'
+                    card = {'id': state.new_id(), 'name': params.get('name', ''), 'desc': params.get('desc', ''),
+                            'idList': params.get('idList'), 'idBoard': board_id, 'closed': False,
+                            'customFieldItems': [],
+                            'dateLastActivity': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')}
+                    state.cards[card['id']] = card
+                    state.add_action('createCard', board_id, {'card': {'id': card['id'], 'name': card['name']}})
+                    return 200, card
+                card = state.cards[parts[1]]
+                if method == 'GET' and len(parts) == 2:
+                    return 200, self._card(card, params)
+                if parts[2:] == ['actions', 'comments'] and method == 'POST':
+                    action = state.add_action('commentCard', card['idBoard'],
+                                              {'text': params.get('text', ''), 'card': {'id': card['id']}})
+                    return 200, action
+                if parts[2:] == ['actions'] and method == 'GET':
+                    types = params.get('filter', 'commentCard').split(',')
+                    return 200, [action for action in state.actions[::-1] if action['type'] in types
+                                 and action['data'].get('card', {}).get('id') == card['id']]
+                if parts[2:] == ['customFieldItems'] and method == 'GET':
+                    return 200, card['customFieldItems']
+                if len(parts) == 5 and parts[2] == 'customField' and method == 'PUT':
+                    items = [item for item in card['customFieldItems'] if item['idCustomField'] != parts[3]]
+                    items.append({'id': state.new_id(), 'idCustomField': parts[3], 'idModel': card['id'],
+                                  'value': params.get('value')})
+                    card['customFieldItems'] = items
+                    return 200, items[-1]
+        return 404, {'message': 'not found'}
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+
+def start_server(port=0, latency=0.0, rate_limit=False, state=None):
+    """
+    Starts the mock server on a background thread.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free port (see server.server_address).
+        latency (float): Seconds to wait before answering each request.
+        rate_limit (bool): Refuse requests over 100 per 10 seconds per token with 429.
+        state (MockTrello, optional): Board state to serve. Defaults to an empty one.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it. Its state is
+        available as server.state.
+    """
+    handler = type('Handler', (MockTrelloHandler,), {
+        'state': state if state is not None else MockTrello(),
+        'latency': latency,
+        'rate_limit': rate_limit,
+        'request_times': defaultdict(deque),
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an in-memory mock of the Trello API.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--rate-limit", action="store_true", help="Refuse requests over Trello's limit with 429")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.rate_limit)
+    print(f"Mock Trello API at http://127.0.0.1:{server.server_address[1]}/1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
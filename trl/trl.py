@@ -2,6 +2,8 @@
 
 import os
 import requests
+import trello_client
+import trello_index
 import pandas as pd
 
 def get_card_id_by_name(card_name, board_id, api_key, token):
@@ -16,23 +18,10 @@ def get_card_id_by_name(card_name, board_id, api_key, token):
         str: The ID of the Trello card, if found; otherwise, None.
     """
     api_key = os.environ.get('TKEY')
-    api_token = os.environ.get('TTOKEN')
-
-    url = f"https://api.trello.com/1/boards/{board_id}/cards"
-    params = {
-        'key': api_key,
-        'token': token
-    }
 
+    # Answered from the local index of the board (see trello_index)
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        cards = response.json()
-
-        for card in cards:
-            if card['name'] == card_name:
-                return card['id']
-
+        return trello_index.get_card_id(board_id, card_name, api_key, token)
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {str(e)}")
 
@@ -55,7 +44,7 @@ def get_custom_fields_for_card(card_id, api_key, token):
     url = f"https://api.trello.com/1/cards/{card_id}/customFieldItems?key={api_key}&token={token}"
 
     # Send a GET request to the Trello API
-    response = requests.get(url)
+    response = trello_client.get(url)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -102,26 +91,11 @@ def get_custom_field_names(board_id, api_key, token):
     - custom_field_names (dict): A dictionary mapping idCustomField values to field names.
                                  Returns None if no custom field names are found or if an error occurs.
     """
-    # URL for the Trello API to get board custom fields
-    url = f"https://api.trello.com/1/boards/{board_id}/customFields?key={api_key}&token={token}"
-
-    # Send a GET request to the Trello API
-    response = requests.get(url)
-    
-    # Check if the request was successful
-    if response.status_code == 200:
-        custom_fields_data = response.json()
-
-        # Create a dictionary to store custom field names
-        custom_field_names = {}
-        
-        # Extract idCustomField and field name mapping
-        for field in custom_fields_data:
-            custom_field_names[field['id']] = field['name']
-        
-        return custom_field_names
-    else:
-        print("Error:", response.status_code)
+    # Answered from the local index of the board (see trello_index)
+    try:
+        return trello_index.get_custom_field_names(board_id, api_key, token)
+    except requests.exceptions.RequestException as e:
+        print("Error:", e)
         return None
 
 def query_df_by_field_name(field_name, custom_field_names, custom_fields_df):
@@ -239,7 +213,7 @@ def fetch_xlsx_attachment_url(card_id, api_key, token):
     }
 
     # Make the request to Trello API
-    response = requests.get(url, params=query)
+    response = trello_client.get(url, params=query)
 
     # Check for successful response
     if response.status_code == 200:
@@ -277,7 +251,7 @@ def get_xlsx_attachment_id(card_id, api_key, token):
     }
 
     # Make the API request
-    response = requests.get(attachments_url, params=params)
+    response = trello_client.get(attachments_url, params=params)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -310,7 +284,7 @@ def download_attachment_with_oauth(card_id, attachment_id, file_name, api_key, t
     }
 
     # Make the request
-    response = requests.get(url, headers=auth_header, stream=True)
+    response = trello_client.get(url, headers=auth_header, stream=True)
 
     # Check for successful response
     if response.status_code == 200:
@@ -322,21 +296,8 @@ def download_attachment_with_oauth(card_id, attachment_id, file_name, api_key, t
         print(f"Failed to download the file. Status code: {response.status_code}")
 
 def get_list_id(list_name, board_id, api_key, token):
-    url = f"https://api.trello.com/1/boards/{board_id}/lists"
-    querystring = {
-        'key': api_key,
-        'token': token
-    }
-    response = requests.get(url, params=querystring)
-    response.raise_for_status()
-    lists = response.json()
-    
-    for trello_list in lists:
-        if trello_list['name'] == list_name:
-            return trello_list['id']
-
-    # If the list is not found, return None
-    return None
+    # Answered from the local index of the board (see trello_index); None if the list is not found
+    return trello_index.get_list_id(board_id, list_name, api_key, token)
 
 def get_custom_field_id(board_id, field_name, api_key, token):
     """
@@ -351,23 +312,10 @@ def get_custom_field_id(board_id, field_name, api_key, token):
     Returns:
     - str: The ID of the custom field, or None if not found.
     """
-    # Endpoint to get all custom fields on a board
-    url = f"https://api.trello.com/1/boards/{board_id}/customFields"
-    params = {
-        'key': api_key,
-        'token': token
-    }
-
-    # Make the API request
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        custom_fields = response.json()
-
-        # Search for the custom field by name
-        for field in custom_fields:
-            if field['name'] == field_name:
-                return field['id']
-
-    # Return None if not found or if there's an error
-    return None
+    # Answered from the local index of the board (see trello_index)
+    try:
+        return trello_index.get_custom_field_id(board_id, field_name, api_key, token)
+    except requests.exceptions.RequestException:
+        # Return None if not found or if there's an error
+        return None
 